@@ -0,0 +1,561 @@
+"""
+Backend asyncio untuk regis_onu_zte (alternatif dari engine thread).
+
+- Satu event loop bisa menjalankan banyak OLT & port sekaligus
+- Tidak ada OS thread per session: channel paramiko dibaca lewat loop.add_reader()
+  (fallback ke executor terbatas kalau loop tidak mendukung, mis. Proactor di Windows)
+- Login / buka channel (blocking) dijalankan di ThreadPoolExecutor terbatas
+- Jeda antar batch / polling commit pakai asyncio.sleep, bukan thread yang tidur
+- Tulis SQLite (journal, result store, compact CSV) lewat satu thread writer (urutan FIFO),
+  event loop tidak menunggu disk
+- Session dihitung di session_budget() yang sama dengan engine thread & WriteCoordinator
+
+Pakai lewat cfg["engine"] = "async" di regis_onu_zte.main(), atau langsung:
+    asyncio.run(run_many([(csv_path, cfg, "pipeline"), ...]))
+"""
+import asyncio, functools, time
+from concurrent.futures import ThreadPoolExecutor
+
+import paramiko
+import metrics
+import transcript
+import regis_onu_zte as core
+from journal import get_journal, onu_key
+from onu_csv import group_by_port, read_onu_csv
+from regis_onu_zte import (CONFIG_IN_SYNC, CommitWatcher, ConfigPort, PromptTracker, RegisterPort, append_log,
+                           build_unreg_block, connection_manager, journal_id, load_status_map, olt_label,
+                           parse_running_config, pipeline_split, progress_dict, progress_lock, result_store,
+                           running_config_query, session_budget, split_by_prompt, _key_of)
+
+EXECUTOR_THREADS = 8     # thread untuk operasi blocking (login, buka channel)
+SLOT_POLL_SEC    = 0.2   # interval cek slot AdaptiveConcurrency (controller berbasis thread, loop tidak diblok)
+BUDGET_POLL_SEC  = 0.05  # interval cek session_budget saat slot terakhir dipakai session thread (mis. write)
+
+
+def _append_logs(rows):
+    for row in rows:
+        try:
+            append_log(row)
+        except Exception as e:
+            print(f"⚠️ Gagal catat hasil ONU {row['interface']}:{row['onu_id']}: {e}")
+
+
+async def gather_tasks(*aws):
+    """gather yang membatalkan task lain begitu satu gagal (tidak ada task yatim yang tetap jalan)."""
+    tasks = [asyncio.ensure_future(a) for a in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class AsyncShell:
+    """Satu channel shell ZTE yang dibaca secara async."""
+
+    def __init__(self, olt, chan):
+        self.olt = olt
+        self.chan = chan
+
+    async def read_until_prompt(self, prompts=1, timeout=core.PROMPT_TIMEOUT_SEC, sink=None):
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        try:
+            loop.add_reader(self.chan.fileno(), ready.set)
+        except NotImplementedError:
+            return await loop.run_in_executor(self.olt.engine.executor, core.read_until_prompt,
+                                              self.chan, prompts, timeout, sink)
+
+        tracker = PromptTracker(prompts, sink)
+        received = 0
+        try:
+            while True:
+                ready.clear()
+                while self.chan.recv_ready():
+                    data = self.chan.recv(65535)
+                    received += len(data)
+                    state = tracker.feed(data)
+                    if state == "more":
+                        self.chan.send(" ")
+                        core.more_prompt(self.chan)
+                    elif state == "done":
+                        return tracker.out, tracker.prompt
+                if self.chan.closed or self.chan.eof_received:
+                    return tracker.out, None
+                try:
+                    await asyncio.wait_for(ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return tracker.out, None
+        finally:
+            loop.remove_reader(self.chan.fileno())
+            metrics.BYTES_RECEIVED.inc(received, olt=self.chan.olt)
+
+    async def send_block(self, block, timeout=core.PROMPT_TIMEOUT_SEC, sink=None):
+        lines = [l for l in block.splitlines() if l.strip()]
+        if not lines:
+            return ""
+        while self.chan.recv_ready():
+            self.chan.recv(65535)
+        with metrics.PROMPT_WAIT_SECONDS.time(olt=self.chan.olt):
+            self.chan.send("\n".join(lines) + "\n")
+            out, prompt = await self.read_until_prompt(prompts=len(lines), timeout=timeout, sink=sink)
+        core.note_prompt(self.chan, prompt)
+        if prompt is None:
+            metrics.PROMPT_TIMEOUTS.inc(olt=self.chan.olt)
+        return out
+
+    async def enter_mode(self, target):
+        """Sama dengan core.enter_mode: hanya perintah pindah mode yang perlu, dalam satu read window."""
+        cmds = core.mode_commands(self.chan, target)
+        if cmds:
+            core.note_mode_commands(self.chan, cmds, await self.send_block("\n".join(cmds)))
+
+    async def enter_exec(self):
+        await self.enter_mode("exec")
+
+    async def enter_config(self):
+        await self.enter_mode("config")
+
+    def close(self):
+        if self.chan is None:
+            return
+        chan, self.chan = self.chan, None
+        try:
+            chan.close()
+        finally:
+            self.olt.manager.release()
+            self.olt.release()
+
+
+class AsyncOlt:
+    """
+    Per OLT: transport bersama (OltConnectionManager) + budget session.
+    - sem: antrian session di event loop ini (urut, tanpa polling)
+    - budget: session_budget() proses → ikut terhitung session thread (WriteCoordinator, engine thread)
+    """
+
+    def __init__(self, engine, cfg):
+        self.engine = engine
+        self.cfg = cfg
+        self.label = olt_label(cfg)
+        self.manager = connection_manager(cfg)
+        self.budget = session_budget(cfg)
+        self.sem = asyncio.Semaphore(int(cfg.get("max_sessions") or core.MAX_SESSIONS_PER_OLT))
+        self.board_lock = asyncio.Lock()  # pengganti OnuStateBoard.lock (per engine → per event loop)
+
+    def progress_key(self, interface):
+        """Kunci progress_dict: run_many ke beberapa OLT → 'host:port interface' supaya port senama tidak bentrok."""
+        return f"{self.label} {interface}" if self.engine.qualify_ports else interface
+
+    async def _acquire(self):
+        await self.sem.acquire()
+        try:
+            while not self.budget.acquire(blocking=False):
+                await asyncio.sleep(BUDGET_POLL_SEC)
+        except BaseException:
+            self.sem.release()
+            raise
+
+    def release(self):
+        self.budget.release()
+        self.sem.release()
+
+    async def open(self, retries=core.CONNECT_RETRIES):
+        olt = self.label
+        t0 = time.perf_counter()
+        with metrics.SSH_SESSION_WAIT_SECONDS.time(olt=olt):
+            await self._acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in range(1, retries + 1):
+                try:
+                    chan = await loop.run_in_executor(self.engine.executor, self.manager.open_shell)
+                    metrics.SSH_CONNECT_SECONDS.observe(time.perf_counter() - t0, olt=olt)
+                    return AsyncShell(self, chan)
+                except paramiko.SSHException as e:
+                    core.concurrency_controller(self.cfg).congestion("rejected")
+                    if attempt == retries:
+                        raise
+                    print(f"⚠️ Session ditolak OLT ({e}), coba lagi {attempt}/{retries - 1}...")
+                    await asyncio.sleep(attempt)
+        except BaseException:
+            self.release()
+            raise
+
+
+class AsyncEngine:
+    def __init__(self, executor_threads=EXECUTOR_THREADS, qualify_ports=False):
+        self.executor = ThreadPoolExecutor(max_workers=executor_threads, thread_name_prefix="olt-io")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="olt-db")
+        self.qualify_ports = qualify_ports
+        self._olts = {}
+
+    async def db(self, fn, *args):
+        """fn(*args) di thread writer; urut dengan log_results() sebelumnya (baca setelah tulis tetap konsisten)."""
+        return await asyncio.get_running_loop().run_in_executor(self.writer, functools.partial(fn, *args))
+
+    def log_results(self, rows):
+        """append_log beberapa row tanpa menunggu (thread writer, urutan tetap)."""
+        if rows:
+            self.writer.submit(_append_logs, rows)
+
+    def olt(self, cfg):
+        key = (cfg["host"], int(cfg.get("port", 22)))
+        if key not in self._olts:
+            self._olts[key] = AsyncOlt(self, cfg)
+        return self._olts[key]
+
+    def close(self):
+        self.writer.shutdown(wait=True)  # hasil yang masih antre tetap tertulis
+        self.executor.shutdown(wait=False)
+
+
+# -------------------- VERIFIKASI COMMIT OLT ------------------
+async def poll_commit(sh, watcher):
+    """Versi async dari CommitWatcher.poll(): show dibagi dengan port lain di OLT yang sama."""
+    board = core.onu_state_board(watcher.olt)
+    async with sh.olt.board_lock:
+        records = board.records_for(watcher.interface, watcher.since())
+        if records is None:
+            started, command, parser = time.time(), board.command(watcher.interface), core.OnuStateParser()
+            await sh.send_block(command, timeout=core.SHOW_TIMEOUT_SEC, sink=parser.feed)
+            records = board.publish(command, parser.close(), started,
+                                    complete=sh.chan.mode is not None).get(watcher.interface, [])
+    return watcher.ingest(records)
+
+
+async def wait_committed(sh, watcher, timeout=core.MAX_COMMIT_WAIT_SEC):
+    """Versi async dari CommitWatcher.wait(): polling adaptif, return begitu semua ID muncul."""
+    with metrics.COMMIT_WAIT_SECONDS.time(olt=watcher.olt, interface=watcher.interface):
+        return await _wait_committed(sh, watcher, timeout)
+
+
+async def _wait_committed(sh, watcher, timeout):
+    deadline = time.time() + timeout
+    while watcher.pending:
+        await poll_commit(sh, watcher)
+        delay = watcher.after_poll(deadline)
+        if delay is None:
+            break
+        await asyncio.sleep(delay)
+    watcher.report()
+    return watcher.committed()
+
+
+async def wait_until_committed(sh, interface, expected_ids, timeout=core.MAX_COMMIT_WAIT_SEC, on_commit=None):
+    """Versi async dari regis_onu_zte.wait_until_committed."""
+    watcher = CommitWatcher(interface, on_commit=on_commit, olt=sh.chan.olt)
+    watcher.expect(expected_ids)
+    return await wait_committed(sh, watcher, timeout)
+
+
+# ----------------------- PROSES INTI -------------------------
+async def process_register(olt, interface, rows, on_commit=None):
+    """
+    Versi async dari regis_onu_zte.process_register: bookkeeping yang sama (RegisterPort),
+    di sini hanya I/O — session, kirim block, poll commit, journal lewat thread writer.
+    """
+    cfg, db = olt.cfg, olt.engine.db
+    need_unreg = not await db(result_store().has_interface, interface)
+    journal, jid = get_journal(), journal_id(cfg)
+    port = RegisterPort(interface, rows, cfg, olt.engine.log_results, on_commit=on_commit,
+                        progress_key=olt.progress_key(interface))
+    sh = None
+    try:
+        sh = await olt.open()
+        await sh.enter_config()
+        if cfg.get("unreg_mode", core.UNREG_MODE) == "wipe":
+            wipe = build_unreg_block(interface, range(1, 129))
+            if need_unreg and await db(journal.done, jid, interface, "unreg", wipe):
+                print(f"📒 {interface}: wipe 1–128 sudah dijalankan run sebelumnya (journal), lewati")
+            elif need_unreg:
+                print(f"🚮 Menghapus seluruh ONU di {interface} (1–128)...")
+                entry = await db(journal.begin, jid, interface, "unreg", wipe)
+                out = await sh.send_block(wipe)
+                await db(journal.ack, entry)
+                core.mark_dirty(cfg)
+                transcript.log(jid, interface, f"UNREGISTER {interface} (1–128)", out, onus=range(1, 129))
+        else:
+            out = await sh.send_block(f"show running-config interface {interface}", timeout=core.SHOW_TIMEOUT_SEC)
+            to_delete = port.reconcile(out, drop_extra=need_unreg)
+            if to_delete:
+                block = build_unreg_block(interface, to_delete)
+                entry = await db(journal.begin, jid, interface, "unreg", block)
+                out = await sh.send_block(block)
+                await db(journal.ack, entry)
+                core.mark_dirty(cfg)
+                transcript.log(jid, interface, f"UNREGISTER {interface} ({', '.join(to_delete)})", out,
+                               onus=to_delete)
+
+        port.start(await db(journal.acked, jid, interface, "register"),
+                   await db(journal.unacked, jid, interface, "register"))
+
+        model = core.known_olt_model(cfg)
+        if port.to_send and model is None:
+            model = core.parse_olt_model(cfg, await sh.send_block("show version", timeout=core.SHOW_TIMEOUT_SEC))
+        port.start_pacer(model)
+
+        for batch, block, lines in port.batches():
+            entry = await db(journal.begin, jid, interface, "register", block, [onu_key(r) for r in batch])
+            t0 = time.perf_counter()
+            try:
+                out = await sh.send_block(block)
+                timed_out = len(split_by_prompt(out)) < lines
+                if not out.strip():
+                    raise Exception("Output kosong setelah kirim batch")
+            except Exception as e:
+                # sama dengan engine thread: session drop / tanpa output → reconnect & ulang batch ini
+                timed_out = True
+                print(f"⚠️ {interface}: batch {port.batch_no} gagal ({e}), reconnect & ulang...")
+                sh.close()
+                sh = await olt.open()
+                metrics.SSH_RECONNECTS.inc(olt=port.olt, interface=interface)
+                await sh.enter_config()
+                out = await sh.send_block(block)
+            elapsed = time.perf_counter() - t0
+            acks, errors = port.sent(batch, block, out)
+            await db(journal.ack, entry, acks)
+
+            if port.watcher.feedback_due(handoff=bool(on_commit)):
+                await poll_commit(sh, port.watcher)
+            delay = port.paced(elapsed, lines, errors, timed_out)
+            if delay:
+                await asyncio.sleep(delay)
+
+        expired = port.finish(await wait_committed(sh, port.watcher))
+        await db(journal.expire, jid, interface, "register", expired)
+    finally:
+        if sh:
+            sh.close()
+        port.close()
+
+
+async def process_config(olt, interface, rows, parallel_workers=None, source=None):
+    """
+    Versi async dari regis_onu_zte.process_config: bookkeeping yang sama (ConfigPort).
+    source: asyncio.Queue (mode pipeline) berisi row ter-commit, diakhiri None.
+    """
+    cfg, db = olt.cfg, olt.engine.db
+    journal, jid = get_journal(), journal_id(cfg)
+    port = ConfigPort(interface, cfg, olt.engine.log_results, await db(journal.acked, jid, interface, "config"),
+                      progress_key=olt.progress_key(interface))
+    if source is None:
+        to_config = port.select(rows, await db(load_status_map))
+        if not to_config:
+            return
+        work = asyncio.Queue()
+        for r in to_config:
+            work.put_nowait(r)
+        work.put_nowait(None)
+        total = len(to_config)
+    else:
+        work = source
+        total = len(rows)
+
+    # worker adaptif: session aktif dibatasi AdaptiveConcurrency per OLT (sama dengan engine thread)
+    parallel_workers = port.plan_workers(total, parallel_workers, pipeline=source is not None)
+    ctrl = port.ctrl
+
+    async def acquire_slot():
+        while not ctrl.try_acquire():
+            if core.cancelled(cfg):
+                return False
+            await asyncio.sleep(SLOT_POLL_SEC)
+        return True
+
+    async def worker(worker_id):
+        sh = None
+        slot = False
+
+        def close_session():
+            nonlocal sh, slot
+            if sh:
+                sh.close()
+                sh = None
+            if slot:
+                ctrl.release()
+                slot = False
+
+        async def send_batch(batch, title="CONFIG"):
+            nonlocal sh
+            running = None
+            if port.diff_mode:
+                running = parse_running_config(await sh.send_block(running_config_query(batch)))
+            lines, owners = port.batch_lines(batch, running)
+            if not lines:
+                return [CONFIG_IN_SYNC] * len(batch), []
+            block = "\n".join(lines)
+            entry = await db(journal.begin, jid, interface, "config", block, [onu_key(r) for r in batch])
+            t0 = time.perf_counter()
+            out = await sh.send_block(block)
+            outcome, suspects, acks, missing = port.batch_sent(batch, lines, owners, out,
+                                                               time.perf_counter() - t0, title, worker_id)
+            await db(journal.ack, entry, acks)
+            if missing:
+                sh.close()
+                sh = await olt.open()
+                metrics.SSH_RECONNECTS.inc(olt=port.olt, interface=interface)
+                await sh.enter_config()
+            elif any(status == "error" for status, _ in outcome):
+                await sh.enter_config()  # hanya kalau mode bergeser
+            return outcome, suspects
+
+        try:
+            stop = False
+            while not stop:
+                if core.cancelled(cfg):
+                    work.put_nowait(None)
+                    break
+                if work.empty() and sh is not None:
+                    close_session()  # jangan pegang slot budget selama menunggu commit
+                r = await work.get()
+                batch = []
+                while r is not None:
+                    batch.append(r)
+                    if len(batch) >= port.batch_size or work.empty():
+                        break
+                    r = work.get_nowait()
+                if r is None:
+                    work.put_nowait(None)
+                    stop = True
+                if not batch:
+                    break
+                batch = port.skip_journaled(batch)
+                if not batch:
+                    continue
+                if sh is None and ctrl and not slot:
+                    if not await acquire_slot():
+                        work.put_nowait(None)  # dibatalkan saat antri slot
+                        break
+                    slot = True
+                try:
+                    if sh is None:
+                        # gagal konek = batch ini error (tercatat), slot & session tetap dilepas di bawah
+                        sh = await olt.open()
+                        await sh.enter_config()
+                    outcome, suspects = await send_batch(batch)
+                    if suspects:
+                        again, _ = await send_batch([batch[i] for i in suspects], "RECHECK CONFIG")
+                        for i, res in zip(suspects, again):
+                            outcome[i] = res
+                except Exception as e:
+                    port.failed(batch, worker_id, e)
+                    outcome = [("error", f"Exception: {e}")] * len(batch)
+                    close_session()
+                port.record(batch, outcome)
+                if ctrl and ctrl.over_limit():
+                    close_session()  # batas session turun → antri slot lagi
+        finally:
+            close_session()
+
+    await gather_tasks(*(worker(i) for i in range(1, parallel_workers + 1)))
+    port.finish()
+    print(f"🎯 {interface}: {total} ONU selesai dikonfigurasi (async).")
+
+
+async def process_pipeline(olt, interface, rows, parallel_workers=None):
+    to_register, ready = pipeline_split(interface, rows, await olt.engine.db(load_status_map),
+                                        progress_key=olt.progress_key(interface))
+    if not to_register and not ready:
+        return
+    work = asyncio.Queue()
+    for r in ready:
+        work.put_nowait(r)
+
+    async def register():
+        try:
+            if to_register:
+                await process_register(olt, interface, to_register,
+                                       on_commit=lambda new: [work.put_nowait(r) for r in new])
+        finally:
+            work.put_nowait(None)
+
+    config_task = asyncio.create_task(process_config(olt, interface, to_register + ready, parallel_workers, work))
+    register_task = asyncio.create_task(register())
+    # config gagal → register ikut dihentikan (tidak ada yang mengonsumsi ONU ter-commit);
+    # register gagal → config tetap menyelesaikan ONU yang sudah ter-commit
+    config_task.add_done_callback(lambda t: t.cancelled() or t.exception() is None or register_task.cancel())
+    try:
+        await register_task
+    finally:
+        await config_task
+
+
+# --------------------------- MAIN ----------------------------
+async def run_port(olt, interface, rows, mode, status_map):
+    cfg = olt.cfg
+    core.check_cancel(cfg)
+    workers = int(cfg["config_workers"]) if str(cfg.get("config_workers", "")).isdigit() else None
+    if mode == "pipeline":
+        await process_pipeline(olt, interface, rows, parallel_workers=workers)
+        return
+    if mode in ["register", "full"]:
+        to_register = [r for r in rows if status_map.get(_key_of(r)) not in {"registered", "success"}]
+        if to_register:
+            await process_register(olt, interface, to_register)
+    if mode in ["config", "full"]:
+        to_config = [r for r in rows if status_map.get(_key_of(r)) != "success"]
+        await process_config(olt, interface, to_config, parallel_workers=workers)
+
+
+def _prepare(csv_path, cfg, mode):
+    """Blocking (baca & hash CSV, compile plan) → dijalankan di executor, bukan di event loop."""
+    cfg = core.with_plan(core.with_journal(cfg, csv_path), csv_path)
+    return cfg, group_by_port(read_onu_csv(csv_path, config=mode != "register"))
+
+
+async def run_job(engine, csv_path, cfg, mode="full"):
+    """Satu CSV (boleh multi-port) ke satu OLT; tiap port satu task, port gagal tidak menghentikan port lain."""
+    loop = asyncio.get_running_loop()
+    cfg, ports = await loop.run_in_executor(engine.executor, _prepare, csv_path, cfg, mode)
+
+    status_map = await engine.db(load_status_map)
+    olt = engine.olt(cfg)
+    with progress_lock:
+        for interface, rows in ports.items():
+            progress_dict[olt.progress_key(interface)] = {"done": 0, "total": len(rows), "status": "WAITING"}
+
+    results = await asyncio.gather(*(run_port(olt, i, rows, mode, status_map) for i, rows in ports.items()),
+                                   return_exceptions=True)
+    errors = {i: e for i, e in zip(ports, results) if isinstance(e, BaseException)}
+    for interface, e in errors.items():
+        print(f"❌ {interface} gagal: {e}")
+        with progress_lock:
+            progress_dict.setdefault(olt.progress_key(interface), {})["status"] = \
+                "CANCELLED" if isinstance(e, core.JobCancelled) else "ERROR"
+    await loop.run_in_executor(engine.executor, core.finish_writes, cfg)
+    await loop.run_in_executor(engine.executor, transcript.flush)
+    await engine.db(result_store().compact)  # setelah semua hasil yang antre di thread writer
+    stopped = [i for i, e in errors.items() if isinstance(e, core.JobCancelled)]
+    if stopped:
+        raise core.JobCancelled(f"Job dibatalkan ({len(stopped)}/{len(ports)} port berhenti di tengah)")
+    if errors:
+        raise RuntimeError(f"{len(errors)}/{len(ports)} port gagal: " +
+                           "; ".join(f"{i}: {e}" for i, e in errors.items()))
+    return "done"
+
+
+async def run_many(jobs, executor_threads=EXECUTOR_THREADS):
+    """
+    jobs: list (csv_path, cfg, mode) — boleh ke banyak OLT, semua dalam satu event loop.
+    Lebih dari satu OLT → progress_dict dikunci 'host:port interface' (lihat AsyncOlt.progress_key).
+    """
+    engine = AsyncEngine(executor_threads, qualify_ports=len({olt_label(cfg) for _, cfg, _ in jobs}) > 1)
+    try:
+        return await asyncio.gather(*(run_job(engine, *job) for job in jobs), return_exceptions=True)
+    finally:
+        engine.close()
+
+
+def main(csv_path, cfg, mode="full"):
+    """Pengganti regis_onu_zte.main() dengan backend asyncio."""
+    print(f"🟢 MAIN (async) DIPANGGIL: mode={mode}, file={csv_path}")
+    engine = AsyncEngine()
+    try:
+        result = asyncio.run(run_job(engine, csv_path, cfg, mode))
+    finally:
+        engine.close()
+    print("🎉 Semua proses selesai.")
+    return result
@@ -0,0 +1,142 @@
+"""
+Benchmark end-to-end regis_onu_zte.main() terhadap zte_simulator (tanpa OLT asli).
+
+- CSV dibuat otomatis: 128 ONU per port (32 → 1 port, 1024 → 8 port)
+- Tiap ukuran jalan di folder sementara sendiri (hasil_registrasi/transcripts tidak tercampur)
+- Laporan: ONU/menit + wall time per fase (register, config, total)
+
+Contoh:
+    python benchmark.py --sizes 32,128,1024 --latency 0.01 --commit-delay 3
+    python benchmark.py --sizes 128 --mode full --engine async --out bench.csv
+"""
+import argparse, csv, os, tempfile, threading, time
+from collections import Counter
+
+import regis_onu_zte as core
+from zte_simulator import ZteSimulator
+
+ONU_PER_PORT = 128
+CSV_HEADER = ["interface", "onu_id", "sn", "name", "description", "profile", "username", "password",
+              "vlan_inet", "vlan_hotspot", "wifi_ssid"]
+
+
+def make_csv(path, n):
+    """CSV dummy n ONU, port gpon-olt_1/2/1, 1/2/2, ... masing-masing maks 128 ONU."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(CSV_HEADER)
+        for k in range(n):
+            port, onu_id = divmod(k, ONU_PER_PORT)
+            w.writerow([f"gpon-olt_1/2/{port + 1}", onu_id + 1, f"ZTEG{k + 1:08X}", f"Cust {k + 1}",
+                        f"G{k + 1}", "10M", f"user{k + 1}", "pw", 130, 131, f"ssid{k + 1}"])
+
+
+class PhaseClock:
+    """Catat kapan semua ONU selesai register (mode pipeline: fase overlap, dibaca dari progress_dict)."""
+
+    def __init__(self, total):
+        self.total = total
+        self.register_done = None
+        self._stop = threading.Event()
+
+    def _registered(self):
+        with core.progress_lock:
+            return sum(p.get("registered", 0) for p in core.progress_dict.values())
+
+    def run(self, start):
+        while not self._stop.wait(0.2):
+            if self.register_done is None and self._registered() >= self.total:
+                self.register_done = time.time() - start
+
+    def stop(self):
+        self._stop.set()
+
+
+def run_size(n, args):
+    sim = ZteSimulator(cmd_latency=args.latency, commit_delay=args.commit_delay, write_delay=args.write_delay,
+                       error_rate=args.error_rate, max_sessions=args.olt_sessions,
+                       cpu=args.olt_cpu, seed=1).start()
+    cfg = sim.cfg(max_sessions=args.max_sessions, engine=args.engine, auto_write=args.auto_write)
+    cwd = os.getcwd()
+    work = tempfile.mkdtemp(prefix=f"bench{n}_")
+    os.chdir(work)
+    core.progress_dict.clear()
+    phases = {}
+    try:
+        make_csv("onu.csv", n)
+        t0 = time.time()
+        if args.mode == "pipeline":
+            clock = PhaseClock(n)
+            threading.Thread(target=clock.run, args=(t0,), daemon=True).start()
+            core.main("onu.csv", cfg, mode="pipeline")
+            clock.stop()
+            phases["register"] = clock.register_done
+        else:
+            core.main("onu.csv", cfg, mode="register")
+            phases["register"] = time.time() - t0
+            t1 = time.time()
+            core.main("onu.csv", cfg, mode="config")
+            phases["config"] = time.time() - t1
+        phases["total"] = time.time() - t0
+        statuses = Counter(r["status"] for r in core.result_store().rows())
+    finally:
+        os.chdir(cwd)
+        sim.stop()
+
+    return {
+        "onus": n,
+        "engine": args.engine,
+        "mode": args.mode,
+        "register_sec": round(phases["register"], 1) if phases.get("register") else "",
+        "config_sec": round(phases["config"], 1) if phases.get("config") else "",
+        "total_sec": round(phases["total"], 1),
+        "onu_per_min": round(statuses["success"] * 60 / phases["total"], 1),
+        "success": statuses["success"],
+        "error": statuses["error"],
+        "pending": statuses["pending"] + statuses["registered"],
+        "logins": sim.state.stats["logins"],
+        "commands": sim.state.stats["commands"],
+        "workdir": work,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark registrasi ONU terhadap simulator ZTE")
+    ap.add_argument("--sizes", default="32,128,1024", help="jumlah ONU, pisahkan koma")
+    ap.add_argument("--mode", default="pipeline", choices=["pipeline", "full"],
+                    help="full = register lalu config (fase terpisah)")
+    ap.add_argument("--engine", default="thread", choices=["thread", "async"])
+    ap.add_argument("--max-sessions", type=int, default=core.MAX_SESSIONS_PER_OLT)
+    ap.add_argument("--auto-write", action="store_true")
+    ap.add_argument("--latency", type=float, default=0.005, help="latency simulator per perintah (detik)")
+    ap.add_argument("--commit-delay", type=float, default=3.0)
+    ap.add_argument("--write-delay", type=float, default=1.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--olt-sessions", type=int, default=0, help="batas session di sisi simulator (0 = bebas)")
+    ap.add_argument("--olt-cpu", type=int, default=0, help="perintah paralel di sisi simulator (0 = bebas)")
+    ap.add_argument("--out", help="append hasil ke CSV ini (untuk banding antar perubahan)")
+    args = ap.parse_args()
+
+    results = []
+    for n in (int(x) for x in args.sizes.split(",")):
+        print(f"\n🏁 Benchmark {n} ONU ({args.mode}, {args.engine})...")
+        results.append(run_size(n, args))
+
+    print("\n📊 Hasil benchmark")
+    print(f"{'ONU':>6} {'register':>9} {'config':>8} {'total':>8} {'ONU/min':>8} {'ok':>5} {'err':>4} {'pend':>5} {'login':>5}")
+    for r in results:
+        print(f"{r['onus']:>6} {r['register_sec']!s:>9} {r['config_sec']!s:>8} {r['total_sec']:>8} "
+              f"{r['onu_per_min']:>8} {r['success']:>5} {r['error']:>4} {r['pending']:>5} {r['logins']:>5}")
+
+    if args.out:
+        new = not os.path.exists(args.out)
+        with open(args.out, "a", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(results[0]))
+            if new:
+                w.writeheader()
+            w.writerows(results)
+        print(f"💾 Hasil ditambahkan ke {args.out}")
+
+
+if __name__ == "__main__":
+    main()
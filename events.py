@@ -0,0 +1,51 @@
+"""
+Event bus in-process untuk push progress ke browser (Server-Sent Events).
+
+- publish(kind, data) dipanggil engine: "progress" (per port), "onu" (status ONU), "phase"
+- tiap client SSE punya queue sendiri lewat subscribe(); publish tidak pernah blocking
+- client yang terlalu lambat (queue penuh) dikosongkan lalu dapat event "resync"
+  → endpoint kirim snapshot ulang, tidak ada update yang hilang diam-diam
+"""
+import json, queue, threading
+
+SUBSCRIBER_QUEUE = 1000
+
+
+class EventBus:
+    def __init__(self, max_queue=SUBSCRIBER_QUEUE):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subs = set()
+
+    def subscribe(self):
+        q = queue.Queue(self.max_queue)
+        with self._lock:
+            self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subs.discard(q)
+
+    def publish(self, kind, data):
+        with self._lock:
+            subs = list(self._subs)
+        for q in subs:
+            try:
+                q.put_nowait((kind, data))
+            except queue.Full:
+                # client tertinggal jauh → buang antrian, minta snapshot ulang
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait(("resync", {}))
+
+
+def sse(kind, data):
+    """Format satu event SSE."""
+    return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+bus = EventBus()
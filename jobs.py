@@ -0,0 +1,418 @@
+"""
+Job queue persisten untuk registrasi ONU (dipakai web UI & executor).
+
+- jobs.db (SQLite WAL): antrian job, status/fase, progress per port, snapshot metrics
+- Web (boleh gunicorn banyak worker) hanya submit / baca / cancel lewat JobStore
+- Executor (proses terpisah: `python jobs.py`) mengambil job, satu proses anak per job
+- Satu OLT hanya dikerjakan satu job pada satu waktu (mutual exclusion di claim_next)
+- Cancel: flag di DB → proses job berhenti rapi di batas batch; dipaksa berhenti setelah
+  CANCEL_GRACE_SEC
+- Executor restart: job 'running' yang prosesnya sudah mati dikembalikan ke 'queued'
+  (ONU yang sudah sukses otomatis dilewati saat dijalankan ulang)
+
+Jalankan executor:
+    python jobs.py                 # loop executor
+    python jobs.py run <job_id>    # (internal) proses anak untuk satu job
+"""
+import json, os, queue, sqlite3, subprocess, sys, threading, time, uuid
+
+JOBS_DB             = "jobs.db"
+EXECUTOR_MAX_JOBS   = 4      # job paralel (pasti beda OLT)
+EXECUTOR_POLL_SEC   = 1      # interval cek antrian / cancel
+CANCEL_GRACE_SEC    = 30     # tunggu berhenti rapi sebelum proses job di-terminate
+PROGRESS_FLUSH_SEC  = 0.3    # progress proses job ditulis ke DB paling cepat tiap N detik
+FEED_POLL_SEC       = 0.5    # interval JobFeed (web) membaca perubahan dari DB
+
+ACTIVE = ("queued", "running")
+METRICS_RETIRED = "_retired"   # job_id di job_metrics: total counter/histogram semua job yang sudah berhenti
+
+
+def new_job_id():
+    return uuid.uuid4().hex[:12]
+
+
+def olt_key(cfg):
+    return f"{cfg['host']}:{int(cfg.get('port', 22))}"
+
+
+class JobStore:
+    """Akses jobs.db; aman dipakai banyak thread & banyak proses."""
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id          TEXT PRIMARY KEY,
+                olt         TEXT NOT NULL,
+                csv_path    TEXT NOT NULL,
+                mode        TEXT NOT NULL,
+                cfg         TEXT NOT NULL,
+                status      TEXT NOT NULL,
+                phase       TEXT,
+                error       TEXT,
+                cancel      INTEGER NOT NULL DEFAULT 0,
+                pid         INTEGER,
+                created_at  REAL NOT NULL,
+                started_at  REAL,
+                finished_at REAL,
+                version     INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_version ON jobs(version);
+            CREATE TABLE IF NOT EXISTS progress (
+                job_id    TEXT NOT NULL,
+                interface TEXT NOT NULL,
+                data      TEXT NOT NULL,
+                version   INTEGER NOT NULL,
+                PRIMARY KEY (job_id, interface)
+            );
+            CREATE INDEX IF NOT EXISTS progress_version ON progress(version);
+            CREATE TABLE IF NOT EXISTS job_metrics (
+                job_id TEXT PRIMARY KEY,
+                data   TEXT NOT NULL
+            );
+        """)
+
+    # ---------------- internal ----------------
+    def _write(self, fn):
+        """Jalankan fn(db) dalam satu transaksi tulis (BEGIN IMMEDIATE)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._db)
+                self._db.execute("COMMIT")
+                return result
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _next_version(db, table):
+        return db.execute(f"SELECT COALESCE(MAX(version), 0) + 1 FROM {table}").fetchone()[0]
+
+    def _update(self, db, job_id, **fields):
+        fields["version"] = self._next_version(db, "jobs")
+        sets = ", ".join(f"{k}=?" for k in fields)
+        return db.execute(f"UPDATE jobs SET {sets} WHERE id=?", (*fields.values(), job_id)).rowcount
+
+    @staticmethod
+    def _public(row):
+        """Row job tanpa cfg (password OLT tidak ikut keluar ke web)."""
+        job = dict(row)
+        job.pop("cfg", None)
+        return job
+
+    def _retire_metrics(self, db, job_id):
+        """
+        Snapshot metrics job yang berhenti (finish/cancel/recover) dilebur ke row METRICS_RETIRED
+        lalu row job dihapus → job_metrics tetap (job running + 1) row, counter di /metrics tidak turun.
+        """
+        import metrics
+        row = db.execute("SELECT data FROM job_metrics WHERE job_id=?", (job_id,)).fetchone()
+        if not row:
+            return
+        old = db.execute("SELECT data FROM job_metrics WHERE job_id=?", (METRICS_RETIRED,)).fetchone()
+        merged = metrics.merge_snapshots(json.loads(old["data"]) if old else {}, json.loads(row["data"]))
+        db.execute("INSERT OR REPLACE INTO job_metrics VALUES (?,?)", (METRICS_RETIRED, json.dumps(merged)))
+        db.execute("DELETE FROM job_metrics WHERE job_id=?", (job_id,))
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    # ---------------- web ----------------
+    def submit(self, job_id, csv_path, cfg, mode="pipeline"):
+        def fn(db):
+            db.execute("INSERT INTO jobs (id, olt, csv_path, mode, cfg, status, phase, created_at, version) "
+                       "VALUES (?,?,?,?,?,?,?,?,?)",
+                       (job_id, olt_key(cfg), csv_path, mode, json.dumps(cfg), "queued", "queued",
+                        time.time(), self._next_version(db, "jobs")))
+        self._write(fn)
+        return job_id
+
+    def get(self, job_id):
+        rows = self._read("SELECT * FROM jobs WHERE id=?", (job_id,))
+        return self._public(rows[0]) if rows else None
+
+    def list(self, limit=20):
+        return [self._public(r) for r in self._read("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))]
+
+    def queue_position(self, job_id):
+        """Jumlah job aktif di OLT yang sama yang masuk lebih dulu (harus selesai sebelum job ini jalan)."""
+        job = self._read("SELECT olt, created_at FROM jobs WHERE id=?", (job_id,))
+        if not job:
+            return None
+        return self._read("SELECT COUNT(*) FROM jobs WHERE status IN ('queued','running') AND olt=? AND created_at < ?",
+                          (job[0]["olt"], job[0]["created_at"]))[0][0]
+
+    def cancel(self, job_id):
+        """queued → langsung cancelled; running → minta berhenti. Return status baru (None kalau tidak aktif)."""
+        def fn(db):
+            row = db.execute("SELECT status FROM jobs WHERE id=?", (job_id,)).fetchone()
+            if not row or row["status"] not in ACTIVE:
+                return None
+            if row["status"] == "queued":
+                self._update(db, job_id, status="cancelled", phase="cancelled", finished_at=time.time(), cfg="{}")
+                self._retire_metrics(db, job_id)
+                return "cancelled"
+            self._update(db, job_id, cancel=1, phase="cancelling")
+            return "cancelling"
+        return self._write(fn)
+
+    def progress(self, job_id):
+        return {r["interface"]: json.loads(r["data"])
+                for r in self._read("SELECT interface, data FROM progress WHERE job_id=?", (job_id,))}
+
+    def progress_since(self, version):
+        rows = self._read("SELECT job_id, interface, data, version FROM progress WHERE version > ? "
+                          "ORDER BY version", (version,))
+        return [(r["job_id"], r["interface"], json.loads(r["data"]), r["version"]) for r in rows]
+
+    def jobs_since(self, version):
+        return [self._public(r) for r in self._read("SELECT * FROM jobs WHERE version > ? ORDER BY version",
+                                                    (version,))]
+
+    def versions(self):
+        rows = self._read("SELECT (SELECT COALESCE(MAX(version), 0) FROM jobs), "
+                          "(SELECT COALESCE(MAX(version), 0) FROM progress)")
+        return tuple(rows[0])
+
+    def metrics_snapshots(self):
+        # urut waktu tulis (REPLACE = rowid baru) → untuk gauge, snapshot terbaru yang menang
+        return [json.loads(r["data"]) for r in self._read("SELECT data FROM job_metrics ORDER BY rowid")]
+
+    # ---------------- executor ----------------
+    def claim_next(self):
+        """
+        Ambil job queued tertua yang OLT-nya tidak sedang dikerjakan job lain.
+        pid diisi set_pid() setelah proses anak jalan; selama masih kosong recover() menganggap job mati.
+        """
+        def fn(db):
+            row = db.execute("""
+                SELECT * FROM jobs j WHERE status='queued'
+                AND NOT EXISTS (SELECT 1 FROM jobs r WHERE r.status='running' AND r.olt=j.olt)
+                ORDER BY created_at LIMIT 1""").fetchone()
+            if not row:
+                return None
+            self._update(db, row["id"], status="running", phase="starting", pid=None, started_at=time.time())
+            return dict(row)
+        return self._write(fn)
+
+    def load(self, job_id):
+        """Job lengkap termasuk cfg (hanya untuk proses job)."""
+        rows = self._read("SELECT * FROM jobs WHERE id=?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def set_pid(self, job_id, pid):
+        """PID proses anak job (yang dicek recover(), bukan PID executor)."""
+        self._write(lambda db: self._update(db, job_id, pid=pid))
+
+    def set_phase(self, job_id, phase):
+        self._write(lambda db: self._update(db, job_id, phase=phase))
+
+    def finish(self, job_id, status, error=None):
+        # cfg (berisi password OLT) dihapus begitu job selesai
+        def fn(db):
+            self._update(db, job_id, status=status, phase=status, error=error, finished_at=time.time(), cfg="{}")
+            self._retire_metrics(db, job_id)
+        self._write(fn)
+
+    def cancel_requested(self, job_id):
+        rows = self._read("SELECT cancel FROM jobs WHERE id=?", (job_id,))
+        return bool(rows and rows[0]["cancel"])
+
+    def write_progress(self, job_id, ports):
+        def fn(db):
+            version = self._next_version(db, "progress")
+            for interface, data in ports.items():
+                db.execute("INSERT INTO progress VALUES (?,?,?,?) ON CONFLICT(job_id, interface) "
+                           "DO UPDATE SET data=excluded.data, version=excluded.version",
+                           (job_id, interface, json.dumps(data), version))
+                version += 1
+        self._write(fn)
+
+    def write_metrics(self, job_id, snapshot):
+        # hanya selama job running: tulisan telat setelah finish() tidak menghidupkan lagi row yang sudah dilebur
+        self._write(lambda db: db.execute(
+            "INSERT OR REPLACE INTO job_metrics SELECT ?, ? WHERE EXISTS "
+            "(SELECT 1 FROM jobs WHERE id=? AND status='running')", (job_id, json.dumps(snapshot), job_id)))
+
+    def recover(self):
+        """Executor baru start: job 'running' yang proses anaknya (kolom pid) sudah tidak ada → antri lagi."""
+        def fn(db):
+            stale = [r["id"] for r in db.execute("SELECT id, pid FROM jobs WHERE status='running'")
+                     if not _pid_alive(r["pid"])]
+            for job_id in stale:
+                self._update(db, job_id, status="queued", phase="queued (resume)", pid=None)
+                self._retire_metrics(db, job_id)  # proses baru mulai dari counter 0
+            return stale
+        return self._write(fn)
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ------------------------- EXECUTOR -------------------------
+def run_executor(max_jobs=EXECUTOR_MAX_JOBS, path=JOBS_DB):
+    """Loop executor: ambil job dari antrian, satu proses anak per job."""
+    store = JobStore(path)
+    resumed = store.recover()
+    if resumed:
+        print(f"🔁 {len(resumed)} job yang terputus dikembalikan ke antrian: {', '.join(resumed)}")
+    print(f"🧵 Executor jalan (maks {max_jobs} job paralel, 1 job per OLT)")
+
+    running = {}     # job_id → (Popen, waktu cancel diminta)
+    while True:
+        for job_id, (proc, cancel_at) in list(running.items()):
+            if proc.poll() is not None:
+                job = store.get(job_id)
+                if job and job["status"] == "running":
+                    store.finish(job_id, "error", error=f"Proses job berhenti (exit code {proc.returncode})")
+                del running[job_id]
+            elif store.cancel_requested(job_id):
+                if cancel_at is None:
+                    running[job_id] = (proc, time.time())
+                elif time.time() - cancel_at > CANCEL_GRACE_SEC:
+                    print(f"⛔ Job {job_id} tidak berhenti dalam {CANCEL_GRACE_SEC}s, terminate.")
+                    proc.terminate()
+                    proc.wait()
+                    store.finish(job_id, "cancelled", error="Dihentikan paksa setelah cancel")
+                    del running[job_id]
+
+        while len(running) < max_jobs:
+            job = store.claim_next()
+            if not job:
+                break
+            print(f"🚀 Job {job['id']} ({job['olt']}) mulai")
+            try:
+                proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "run", job["id"], path])
+            except OSError as e:
+                store.finish(job["id"], "error", error=f"Gagal menjalankan proses job: {e}")
+                continue
+            store.set_pid(job["id"], proc.pid)
+            running[job["id"]] = (proc, None)
+
+        time.sleep(EXECUTOR_POLL_SEC)
+
+
+def run_job(job_id, path=JOBS_DB):
+    """Proses anak: jalankan satu job; progress & metrics dialirkan ke jobs.db."""
+    import metrics
+    import regis_onu_zte as core
+    from events import bus
+
+    store = JobStore(path)
+    job = store.load(job_id)
+    cfg = json.loads(job["cfg"])
+    cancel = threading.Event()
+    cfg["cancel"] = cancel
+    cfg["journal_id"] = job_id  # job di-resume executor → lanjut dari command journal job ini
+
+    sub = bus.subscribe()
+    done = threading.Event()
+
+    def pump():
+        """Gabungkan event progress lokal → tulis ke DB tiap PROGRESS_FLUSH_SEC; cek flag cancel."""
+        pending, last_flush, last_cancel_check = {}, 0.0, 0.0
+        while True:
+            try:
+                kind, data = sub.get(timeout=PROGRESS_FLUSH_SEC)
+                if kind == "progress":
+                    data = dict(data)
+                    pending[data.pop("interface")] = data
+                elif kind == "resync":
+                    with core.progress_lock:
+                        pending.update({k: dict(v) for k, v in core.progress_dict.items()})
+            except queue.Empty:
+                pass
+            now = time.time()
+            if pending and (now - last_flush >= PROGRESS_FLUSH_SEC or done.is_set()):
+                store.write_progress(job_id, pending)
+                store.write_metrics(job_id, metrics.snapshot())
+                pending, last_flush = {}, now
+            if now - last_cancel_check >= EXECUTOR_POLL_SEC:
+                last_cancel_check = now
+                if store.cancel_requested(job_id):
+                    cancel.set()
+            if done.is_set() and sub.empty() and not pending:
+                return
+
+    pumper = threading.Thread(target=pump, daemon=True)
+    pumper.start()
+    status, error = "done", None
+    try:
+        store.set_phase(job_id, job["mode"])
+        core.main(job["csv_path"], cfg, mode=job["mode"])
+    except core.JobCancelled as e:
+        status, error = "cancelled", str(e)
+    except Exception as e:
+        status, error = "error", str(e)
+    finally:
+        done.set()
+        pumper.join(10)
+        bus.unsubscribe(sub)
+        store.write_metrics(job_id, metrics.snapshot())
+        store.finish(job_id, status, error)
+    print(f"🏁 Job {job_id}: {status}" + (f" ({error})" if error else ""))
+
+
+# ------------------------- WEB FEED -------------------------
+class JobFeed:
+    """
+    Satu thread per proses web: baca perubahan jobs.db / result store lalu publish
+    ke event bus lokal → semua client SSE di proses ini (berapapun jumlahnya).
+    """
+
+    def __init__(self, store, result_version, interval=FEED_POLL_SEC):
+        self.store = store
+        self.result_version = result_version   # callable → version result store
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        from events import bus
+        job_v, prog_v = self.store.versions()
+        res_v = self.result_version()
+        while True:
+            time.sleep(self.interval)
+            try:
+                for job in self.store.jobs_since(job_v):
+                    bus.publish("job", job)
+                    job_v = max(job_v, job["version"])
+                for job_id, interface, data, version in self.store.progress_since(prog_v):
+                    bus.publish("progress", {"job": job_id, "interface": interface, **data})
+                    prog_v = max(prog_v, version)
+                v = self.result_version()
+                if v != res_v:
+                    res_v = v
+                    bus.publish("onu", {"version": v})
+            except sqlite3.Error as e:
+                print(f"⚠️ JobFeed: {e}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "run":
+        run_job(sys.argv[2], *sys.argv[3:4])
+    else:
+        run_executor()
@@ -0,0 +1,127 @@
+"""
+Write-ahead journal perintah per job (journal.db, SQLite WAL).
+
+- begin(): dicatat SEBELUM block dikirim (state 'sent'), berisi hash block & ONU di dalamnya
+- ack(): setelah prompt kembali, dengan hasil per ONU dari output OLT (state 'acked')
+- run berikutnya dengan journal_id yang sama (job id, atau OLT + hash CSV) memakai
+  done() / acked() untuk lanjut dari block berikutnya tanpa kirim ulang
+- expire(): ONU yang ternyata tidak commit dikeluarkan dari journal → dikirim ulang run berikutnya
+- block 'sent' tanpa ack = terputus di tengah kiriman, tidak pernah dianggap selesai
+- append-only: entry baru menimpa status ONU dari entry lama (urut id)
+"""
+import hashlib, json, os, sqlite3, threading, time
+
+JOURNAL_DB        = "journal.db"
+JOURNAL_KEEP_DAYS = 14      # entry lebih tua dari ini dibuang saat journal dibuka
+
+
+def onu_key(row):
+    """Kunci ONU di journal: onu_id + SN (ID yang dipakai ulang untuk SN lain = ONU lain)."""
+    return f"{row['onu_id'].strip()}|{row['sn'].strip()}"
+
+
+def block_hash(block):
+    lines = [l.strip() for l in block.splitlines() if l.strip()]
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+
+def csv_journal_id(cfg, csv_path):
+    """journal_id untuk run tanpa job id: OLT + isi CSV (CSV sama ke OLT sama = lanjutan run yang sama)."""
+    h = hashlib.sha1()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return f"{cfg['host']}:{int(cfg.get('port', 22))}:{h.hexdigest()[:16]}"
+
+
+class CommandJournal:
+    def __init__(self, path=JOURNAL_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        # synchronous=NORMAL di WAL: aman kalau proses mati / di-kill (kasus deploy, VPN putus)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id        INTEGER PRIMARY KEY,
+                journal   TEXT NOT NULL,
+                interface TEXT NOT NULL,
+                kind      TEXT NOT NULL,
+                hash      TEXT NOT NULL,
+                onus      TEXT NOT NULL,
+                state     TEXT NOT NULL,
+                results   TEXT,
+                sent_at   REAL NOT NULL,
+                acked_at  REAL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lookup ON entries(journal, interface, kind)")
+        self._db.execute("DELETE FROM entries WHERE sent_at < ?", (time.time() - JOURNAL_KEEP_DAYS * 86400,))
+
+    def begin(self, journal, interface, kind, block, onus=()):
+        """Catat block yang akan dikirim. Return id entry untuk ack()."""
+        with self._lock:
+            return self._db.execute(
+                "INSERT INTO entries (journal, interface, kind, hash, onus, state, sent_at) VALUES (?,?,?,?,?,?,?)",
+                (journal, interface, kind, block_hash(block), json.dumps(list(onus)), "sent", time.time())
+            ).lastrowid
+
+    def ack(self, entry_id, results=None):
+        """Prompt kembali untuk block ini; results = {onu_key: status} hasil output OLT."""
+        with self._lock:
+            self._db.execute("UPDATE entries SET state='acked', results=?, acked_at=? WHERE id=?",
+                             (json.dumps(results or {}), time.time(), entry_id))
+
+    def done(self, journal, interface, kind, block):
+        """Block yang sama persis sudah di-ack di journal ini?"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM entries WHERE journal=? AND interface=? AND kind=? AND hash=? AND state='acked'",
+                (journal, interface, kind, block_hash(block))).fetchone() is not None
+
+    def acked(self, journal, interface, kind):
+        """{onu_key: status} terakhir dari block yang sudah di-ack (ONU yang di-expire tidak ikut)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, results FROM entries WHERE journal=? AND interface=? AND kind=? "
+                "AND state IN ('acked','expired') ORDER BY id", (journal, interface, kind)).fetchall()
+        status = {}
+        for state, results in rows:
+            for key, st in json.loads(results or "{}").items():
+                if state == "expired":
+                    status.pop(key, None)
+                else:
+                    status[key] = st
+        return status
+
+    def unacked(self, journal, interface, kind):
+        """Jumlah block yang terkirim tapi tidak pernah di-ack (proses mati di tengah kiriman)."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM entries WHERE journal=? AND interface=? AND kind=? AND state='sent'",
+                (journal, interface, kind)).fetchone()[0]
+
+    def expire(self, journal, interface, kind, keys):
+        """Keluarkan ONU dari hasil journal (mis. tidak pernah commit) → dikirim ulang di run berikutnya."""
+        keys = list(keys)
+        if not keys:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO entries (journal, interface, kind, hash, onus, state, results, sent_at, acked_at) "
+                "VALUES (?,?,?,?,?,?,?,?,?)",
+                (journal, interface, kind, "", json.dumps(keys), "expired",
+                 json.dumps({k: "expired" for k in keys}), time.time(), time.time()))
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path=JOURNAL_DB):
+    """Satu CommandJournal per file per proses."""
+    path = os.path.abspath(path)
+    with _journals_lock:
+        if path not in _journals:
+            _journals[path] = CommandJournal(path)
+        return _journals[path]
@@ -0,0 +1,216 @@
+"""
+Metrics format Prometheus (text exposition 0.0.4) tanpa dependensi tambahan.
+
+- Counter / Gauge / Histogram dengan label (olt, interface, ...)
+- Semua metric terdaftar di REGISTRY, dirender oleh render() untuk endpoint /metrics
+- Aman dipanggil dari banyak thread (satu lock per metric)
+- snapshot() → state JSON-able; proses job mengirimnya ke web lewat jobs.db,
+  render(snapshots) menjumlahkannya dengan nilai lokal
+"""
+import threading, time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REGISTRY = []
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _fmt_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(l, "")) for l in self.labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(k), self._copy(v)] for k, v in self._values.items()]
+
+    def render(self, snapshots=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = {k: self._copy(v) for k, v in self._values.items()}
+        for snap in snapshots:
+            for key, v in snap.get(self.name, []):
+                key = tuple(key)
+                values[key] = self._merge(values[key], v) if key in values else self._copy(v)
+        return lines + self._render_items(sorted(values.items()))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def _copy(v):
+        return v
+
+    @staticmethod
+    def _merge(a, b):
+        return a + b
+
+    def _render_items(self, items):
+        return [f"{self.name}{_fmt_labels(self.labels, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @staticmethod
+    def _copy(v):
+        return v
+
+    @staticmethod
+    def _merge(a, b):
+        return b  # gauge tidak dijumlah: snapshot yang dibaca terakhir yang dipakai
+
+    def _render_items(self, items):
+        return [f"{self.name}{_fmt_labels(self.labels, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    @staticmethod
+    def _copy(v):
+        return [list(v[0]), v[1], v[2]]
+
+    @staticmethod
+    def _merge(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def _render_items(self, items):
+        lines = []
+        for key, (counts, total, n) in items:
+            acc = 0
+            for b, c in zip(self.buckets, counts):
+                acc += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, ('le', _fmt_value(b)))} {acc}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {n}")
+        return lines
+
+
+def snapshot():
+    """State semua metric proses ini: {nama: [[label_values, value], ...]}."""
+    return {m.name: m.snapshot() for m in REGISTRY}
+
+
+def merge_snapshots(a, b):
+    """
+    Gabung dua snapshot() jadi satu: counter & histogram dijumlah, gauge dibuang
+    (gauge job yang sudah berhenti basi, tidak boleh ikut dirender lagi).
+    """
+    by_name = {m.name: m for m in REGISTRY}
+    out = {}
+    for snap in (a, b):
+        for name, items in snap.items():
+            m = by_name.get(name)
+            if m is None or m.kind == "gauge":
+                continue
+            values = out.setdefault(name, {})
+            for key, v in items:
+                key = tuple(key)
+                values[key] = m._merge(values[key], v) if key in values else m._copy(v)
+    return {name: [[list(k), v] for k, v in values.items()] for name, values in out.items()}
+
+
+def render(snapshots=()):
+    out = []
+    for m in REGISTRY:
+        out += m.render(snapshots)
+    return "\n".join(out) + "\n"
+
+
+# ------------------------- METRIC ENGINE -------------------------
+SSH_CONNECT_SECONDS = Histogram("olt_ssh_connect_seconds", "Waktu buka session shell (termasuk tunggu slot)", ["olt"])
+SSH_SESSION_WAIT_SECONDS = Histogram("olt_session_wait_seconds", "Waktu tunggu slot session budget per OLT", ["olt"])
+SSH_LOGINS = Counter("olt_ssh_logins_total", "Login SSH baru (transport) ke OLT", ["olt"])
+SSH_RECONNECTS = Counter("olt_reconnects_total", "Reconnect session karena drop/flush", ["olt", "interface"])
+BYTES_RECEIVED = Counter("olt_bytes_received_total", "Byte output CLI yang diterima", ["olt"])
+PROMPT_WAIT_SECONDS = Histogram("olt_prompt_wait_seconds", "Waktu kirim block sampai prompt terakhir kembali", ["olt"])
+PROMPT_TIMEOUTS = Counter("olt_prompt_timeouts_total", "Block yang prompt-nya tidak kembali (timeout)", ["olt"])
+ONU_STATE_SHOWS = Counter("onu_state_shows_total", "'show gpon onu state' yang dikirim (scope=port/olt)",
+                          ["olt", "scope"])
+ONU_PHASE = Gauge("onu_phase_state", "Jumlah ONU per phase state (snapshot 'show gpon onu state' terakhir)",
+                  ["olt", "interface", "phase"])
+MODE_COMMANDS = Counter("olt_mode_commands_total", "Perintah pindah mode/paging (enable, terminal length, "
+                        "configure terminal, end)", ["olt"])
+MORE_PROMPTS = Counter("olt_more_prompts_total", "'--More--' yang harus dijawab (paging masih aktif)", ["olt"])
+CLI_ERRORS = Counter("olt_cli_errors_total", "Baris %Error/Invalid dari OLT", ["olt", "interface"])
+REGISTER_BATCH_SIZE = Gauge("olt_register_batch_size", "Ukuran batch register berikutnya (RegisterPacer)",
+                            ["olt", "interface"])
+COMMIT_LATENCY_SECONDS = Histogram("onu_commit_latency_seconds", "Waktu kirim registrasi sampai ONU muncul",
+                                   ["olt", "interface"])
+COMMIT_WAIT_SECONDS = Histogram("onu_commit_wait_seconds", "Lama menunggu commit satu port", ["olt", "interface"])
+ONU_CONFIG_SECONDS = Histogram("onu_config_seconds", "Waktu config per ONU (batch dibagi rata)", ["olt", "interface"])
+CONFIG_LINES = Counter("onu_config_lines_total",
+                       "Baris config ONU: sent = dikirim, skipped = sudah ada di running-config (mode diff)",
+                       ["olt", "interface", "result"])
+ONU_CONFIG = Counter("onu_config_total", "Hasil config per ONU", ["olt", "interface", "status"])
+CONFIG_CONCURRENCY = Gauge("olt_config_concurrency", "Batas session config adaptif (AIMD) per OLT", ["olt"])
+CONFIG_CONCURRENCY_CHANGES = Counter("olt_config_concurrency_changes_total",
+                                     "Keputusan AIMD: up = naik, lainnya = alasan turun", ["olt", "reason"])
+OLT_WRITES = Counter("olt_writes_total", "'write' ke flash per OLT menurut pemicu (idle, max_age, commit_lag, "
+                     "flush) atau failed", ["olt", "reason"])
+OLT_WRITE_SECONDS = Histogram("olt_write_seconds", "Lama satu 'write' (termasuk buka session)", ["olt"])
+RESULT_WRITE_SECONDS = Histogram("result_store_write_seconds", "Waktu append_log (termasuk tunggu lock store)",
+                                 ["interface"])
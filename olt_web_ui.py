@@ -1,15 +1,27 @@
-from flask import Flask, request, render_template_string, jsonify
-import threading, os, csv
-from regis_onu_zte import progress_dict, main as run_regis_main
+from flask import Flask, Response, request, render_template_string, jsonify
+import hashlib, os, queue, subprocess, sys
+import metrics
+import transcript
+from events import bus, sse
+from jobs import JobFeed, JobStore, new_job_id
+from onu_csv import CsvError, group_by_port, read_onu_csv
+from plan import load_or_compile, render as render_plan
+from regis_onu_zte import result_store
+from result_store import FIELDNAMES
 
 app = Flask(__name__)
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-LOG_CSV = "hasil_registrasi.csv"
 
-# 🔹 status global proses (register/config/done)
-current_phase = {"phase": "idle"}
+SSE_PING_SEC = 15   # komentar keep-alive supaya proxy tidak menutup stream
+RESULTS_PER_PAGE = 100
+RESULTS_MAX_PER_PAGE = 1000
+SNAPSHOT_JOBS = 10  # job terakhir yang dikirim di snapshot SSE
+
+# 🔹 job & progress ada di jobs.db → sama untuk semua worker gunicorn
+job_store = JobStore()
+job_feed = JobFeed(job_store, lambda: result_store().version())
 
 
 @app.route("/")
@@ -104,6 +116,15 @@ def index():
         tr:nth-child(even) { background: #181818; }
         #status { margin-top: 15px; font-weight: bold; }
 
+        .results-toolbar { display:flex; gap:10px; align-items:center; }
+        .results-toolbar select, .results-toolbar input { width:auto; flex:1; }
+        .results-toolbar button { width:auto; padding:9px 14px; }
+        #dryRunBtn { margin-top:8px; background:#2a2a2a; border:1px solid var(--border); }
+        #pager-info { font-size:13px; color:#aaa; white-space:nowrap; }
+        select {
+          padding: 9px; font-size: 14px; border-radius: 6px;
+          border: 1px solid var(--border); background: #181818; color: var(--text);
+        }
         #results-area{
           margin-top:10px;
           max-height:500px;
@@ -121,6 +142,8 @@ def index():
           position:sticky; top:0;
           background:#2b2b2b; color:#fff;
         }
+        #results-area tr[data-key] { cursor:pointer; }
+        #transcript-area { display:none; max-height:400px; overflow:auto; text-align:left; font-size:12px; }
         footer {
           text-align: center;
           color: #777;
@@ -159,11 +182,11 @@ def index():
           <input type="text" name="vlan_prefix" placeholder="vlan" required>
         </div>
         <div>
-        <label>Worker Mode</label>
-          <input type="text" value="Auto (1 for Register, 2 for Config)" readonly>
+          <label>Max SSH Session / OLT</label>
+          <input type="number" name="max_sessions" value="4" min="1" required>
         </div>
         <div  class="full-width">
-          <label>File CSV ONU (1 port saja)</label>
+          <label>File CSV ONU (boleh multi-port)</label>
           <input type="file" name="file" accept=".csv" required>
         </div>
         <div  class="full-width">
@@ -172,13 +195,29 @@ def index():
             Jalankan <b>write</b> otomatis setelah registrasi (commit konfigurasi)
           </label>
         </div>
+        <div  class="full-width">
+          <label>
+            <input type="checkbox" name="unreg_wipe" value="true" style="width:auto;vertical-align:middle;margin-right:6px;">
+            Hapus total ONU port baru (<b>no onu 1–128</b>) — default: hanya hapus/daftar ONU yang berbeda
+          </label>
+        </div>
+        <div  class="full-width">
+          <label>
+            <input type="checkbox" name="config_diff" value="true" style="width:auto;vertical-align:middle;margin-right:6px;">
+            Config hanya baris yang <b>beda</b> dari running-config ONU (cepat untuk port yang sudah sebagian terpasang)
+          </label>
+        </div>
         <div class="full-width">
           <button type="submit">🚀 Upload & Jalankan</button>
+          <button type="button" id="dryRunBtn">🔍 Dry-run (lihat plan)</button>
         </div>
       </form>
 
       <div id="status"></div>
+      <pre id="plan-area" style="display:none;max-height:400px;overflow:auto;text-align:left;"></pre>
       <hr>
+      <h3>🗂️ Job</h3>
+      <table id="jobs-table"><tr><th>Job</th><th>OLT</th><th>Status</th><th>Fase</th><th>Dibuat</th><th></th></tr></table>
       <div id="progress-area"></div>
       <hr>
       <div class="legend">
@@ -189,7 +228,21 @@ def index():
 
       <hr>
       <h3>📘 Hasil Registrasi</h3>
+      <div class="results-toolbar">
+        <select id="filter-status">
+          <option value="">Semua status</option>
+          <option value="pending">pending</option>
+          <option value="registered">registered</option>
+          <option value="success">success</option>
+          <option value="error">error</option>
+        </select>
+        <input type="text" id="filter-iface" placeholder="Filter interface, mis. gpon-olt_1/2/6">
+        <button type="button" id="page-prev">◀</button>
+        <span id="pager-info"></span>
+        <button type="button" id="page-next">▶</button>
+      </div>
       <div id="results-area"></div>
+      <pre id="transcript-area"></pre>
 
       <footer>
         <p>© 2025 <a href="https://dasaria.id" target="_blank">Dasaria Development Team</a> — All rights reserved.</p>
@@ -197,6 +250,14 @@ def index():
       </footer>
 
       <script>
+      // ❌ Error CSV: semua baris yang tidak valid ditampilkan sekaligus (textContent, nilai CSV tidak di-render HTML)
+      function showError(data) {
+        const area = document.getElementById("plan-area");
+        document.getElementById("status").innerHTML = data.error;
+        area.textContent = (data.errors || []).join("\n");
+        area.style.display = data.errors ? "block" : "none";
+      }
+
       document.getElementById("uploadForm").addEventListener("submit", async function(e) {
         e.preventDefault();
         const form = e.target;
@@ -206,7 +267,7 @@ def index():
           const res = await fetch("/upload", { method: "POST", body: formData });
           const data = await res.json();
           if (data.error) {
-            document.getElementById("status").innerHTML = data.error;
+            showError(data);
           } else {
             document.getElementById("status").innerHTML = data.success;
           }
@@ -215,42 +276,230 @@ def index():
         }
       });
 
-      async function refreshProgress() {
-        const res = await fetch('/progress');
+      // 🔍 Dry-run: compile plan dari CSV tanpa konek ke OLT
+      document.getElementById("dryRunBtn").addEventListener("click", async function() {
+        const formData = new FormData(document.getElementById("uploadForm"));
+        const area = document.getElementById("plan-area");
+        document.getElementById("status").innerHTML = "⏳ Compile plan...";
+        try {
+          const res = await fetch("/plan", { method: "POST", body: formData });
+          const data = await res.json();
+          if (data.error) {
+            showError(data);
+            return;
+          }
+          const s = data.summary;
+          document.getElementById("status").innerHTML =
+            `📋 Plan ${s.key.slice(0, 12)} (${data.cached ? "cache" : "baru"}): ` +
+            `${Object.keys(s.ports).length} port, ${s.onus} ONU, ${s.lines} baris perintah`;
+          area.textContent = data.text;
+          area.style.display = "block";
+        } catch (err) {
+          document.getElementById("status").innerHTML = "❌ Gagal compile plan: " + err;
+        }
+      });
+
+      // 🔴 Push via Server-Sent Events: hanya perubahan yang dikirim server
+      const ports = {};
+      const COLS = {{ fieldnames|tojson }};
+
+      function statusColor(status) {
+        status = (status || "").toLowerCase();
+        return status === "pending" ? "var(--wait)"
+             : (status === "registered" || status === "success") ? "var(--success)"
+             : status === "error" ? "#f44336" : "var(--text)";
+      }
+
+      const jobs = {};
+
+      function renderJob(job) {
+        jobs[job.id] = job;
+        const table = document.getElementById("jobs-table");
+        let tr = table.querySelector(`tr[data-job="${job.id}"]`);
+        if (!tr) {
+          tr = table.insertRow(1);  // job terbaru di atas
+          tr.dataset.job = job.id;
+          for (let i = 0; i < 6; i++) tr.insertCell(-1);
+        }
+        const active = job.status === "queued" || job.status === "running";
+        tr.cells[0].textContent = job.id;
+        tr.cells[1].textContent = job.olt;
+        tr.cells[2].textContent = job.status;
+        tr.cells[3].textContent = job.error ? `${job.phase} — ${job.error}` : job.phase;
+        tr.cells[4].textContent = new Date(job.created_at * 1000).toLocaleString();
+        tr.cells[5].innerHTML = active ? `<button type="button" onclick="cancelJob('${job.id}')">Batal</button>` : "";
+      }
+
+      async function cancelJob(id) {
+        if (!confirm(`Batalkan job ${id}? ONU yang sudah dikirim tetap tercatat, bisa di-resume.`)) return;
+        const res = await fetch(`/jobs/${id}/cancel`, { method: "POST" });
         const data = await res.json();
-        let html = "";
-        for (const [port, v] of Object.entries(data)) {
-          const pct = (v.total ? (v.done / v.total * 100) : 0).toFixed(0);
-          html += `<div><b>${port}</b> - ${v.status} (${v.done}/${v.total})</div>
-                   <div class='bar'><div class='fill' style='width:${pct}%; background:var(--accent);'></div></div>`;
+        document.getElementById("status").textContent = data.error || `⛔ Job ${id}: ${data.status}`;
+      }
+
+      function renderPort(v) {
+        const key = `${v.job}:${v.interface}`;
+        let el = ports[key];
+        if (!el) {
+          el = document.createElement("div");
+          el.innerHTML = "<div class='label'></div><div class='bar'><div class='fill' style='background:var(--accent);'></div></div>";
+          document.getElementById("progress-area").appendChild(el);
+          ports[key] = el;
         }
-        document.getElementById("progress-area").innerHTML = html;
-        setTimeout(refreshProgress, 2000);
+        const done = v.done || 0, total = v.total || 0;
+        const reg = v.registered !== undefined ? `, registered ${v.registered}` : "";
+        const sess = v.workers ? `, ${v.workers} session config` : "";
+        const olt = jobs[v.job] ? jobs[v.job].olt : "";
+        el.querySelector(".label").innerHTML =
+          `<b>${v.interface}</b> <small>${olt} · job ${v.job}</small> - ${v.status} (${done}/${total}${reg}${sess})`;
+        el.querySelector(".fill").style.width = (total ? (done / total * 100) : 0).toFixed(0) + "%";
+      }
+
+      // 📘 Tabel hasil: halaman dari /results (JSON), lalu hanya delta since=version
+      const view = { page: 1, perPage: 100, status: "", iface: "", version: 0, total: 0, pages: 1 };
+      let deltaTimer = null;
+
+      function rowKey(row) { return [row.interface, row.onu_id, row.sn].join("|"); }
+
+      function fillRow(tr, row) {
+        tr.dataset.key = rowKey(row);
+        COLS.forEach((c, i) => {
+          const td = tr.cells[i] || tr.insertCell(-1);
+          td.textContent = row[c];
+          if (c === "status") {
+            td.style.color = statusColor(row[c]);
+            td.style.fontWeight = "bold";
+          }
+        });
       }
 
-      async function loadResults() {
-        const scroller = document.getElementById("results-area");
-        const prevTop = scroller.scrollTop;
-        const prevHeight = scroller.scrollHeight;
-        const atBottom = prevTop + scroller.clientHeight >= prevHeight - 5;
+      function resultsQuery(extra) {
+        const q = new URLSearchParams(extra);
+        if (view.status) q.set("status", view.status);
+        if (view.iface) q.set("interface", view.iface);
+        return "/results?" + q.toString();
+      }
 
-        const res = await fetch("/results", { cache: "no-store" });
-        const html = await res.text();
-        scroller.innerHTML = html;
+      function renderPager() {
+        document.getElementById("pager-info").textContent =
+          `Hal ${view.page}/${view.pages} — ${view.total} ONU`;
+      }
 
-        const newHeight = scroller.scrollHeight;
-        if (atBottom) scroller.scrollTop = scroller.scrollHeight;
-        else scroller.scrollTop = prevTop + (newHeight - prevHeight);
+      async function loadPage() {
+        const res = await fetch(resultsQuery({ page: view.page, per_page: view.perPage }));
+        const data = await res.json();
+        view.version = data.version;
+        view.total = data.total;
+        view.pages = Math.max(1, Math.ceil(data.total / view.perPage));
+
+        const area = document.getElementById("results-area");
+        if (!data.rows.length) {
+          area.innerHTML = "<i>Belum ada hasil registrasi.</i>";
+        } else {
+          const table = document.createElement("table");
+          table.innerHTML = "<tr>" + COLS.map(h => `<th>${h}</th>`).join("") + "</tr>";
+          data.rows.forEach(row => fillRow(table.insertRow(-1), row));
+          area.replaceChildren(table);
+        }
+        renderPager();
+      }
 
-        setTimeout(loadResults, 5000);
+      async function applyDelta() {
+        deltaTimer = null;
+        let more = true;
+        while (more) {
+          const res = await fetch(resultsQuery({ since: view.version, per_page: 1000 }));
+          const data = await res.json();
+          if (data.total !== view.total) {
+            // ada ONU baru / keluar dari filter → urutan halaman berubah, ambil ulang halaman ini
+            return loadPage();
+          }
+          const table = document.querySelector("#results-area table");
+          for (const row of data.rows) {
+            const tr = table && table.querySelector(`tr[data-key="${CSS.escape(rowKey(row))}"]`);
+            if (tr) fillRow(tr, row);  // row di halaman lain cukup dilewati
+          }
+          view.version = data.version;
+          more = data.more;
+        }
       }
 
-      refreshProgress();
-      loadResults();
+      function scheduleDelta() {
+        if (!deltaTimer) deltaTimer = setTimeout(applyDelta, 500);
+      }
+
+      document.getElementById("filter-status").addEventListener("change", e => {
+        view.status = e.target.value; view.page = 1; loadPage();
+      });
+      document.getElementById("filter-iface").addEventListener("change", e => {
+        view.iface = e.target.value.trim(); view.page = 1; loadPage();
+      });
+      // 🪵 Klik baris hasil → transcript CLI ONU tsb (dari index transcript, tanpa scan log)
+      document.getElementById("results-area").addEventListener("click", async e => {
+        const tr = e.target.closest("tr[data-key]");
+        if (!tr) return;
+        const [iface, onuId] = tr.dataset.key.split("|");
+        const area = document.getElementById("transcript-area");
+        const res = await fetch("/transcript?" + new URLSearchParams({ interface: iface, onu_id: onuId }));
+        const data = await res.json();
+        area.textContent = `🪵 ${iface}:${onuId}\n` + (data.entries.length
+          ? data.entries.map(x => `[job ${x.job}]${x.text}`).join("")
+          : "Belum ada transcript untuk ONU ini.");
+        area.style.display = "block";
+      });
+      document.getElementById("page-prev").addEventListener("click", () => {
+        if (view.page > 1) { view.page--; loadPage(); }
+      });
+      document.getElementById("page-next").addEventListener("click", () => {
+        if (view.page < view.pages) { view.page++; loadPage(); }
+      });
+
+      function connectEvents() {
+        const es = new EventSource("/events");
+        es.addEventListener("snapshot", e => {
+          const data = JSON.parse(e.data);
+          const table = document.getElementById("jobs-table");
+          while (table.rows.length > 1) table.deleteRow(1);
+          document.getElementById("progress-area").innerHTML = "";
+          for (const k in ports) delete ports[k];
+          data.jobs.slice().reverse().forEach(renderJob);
+          for (const job of data.jobs) {
+            if (job.status !== "queued" && job.status !== "running" && job !== data.jobs[0]) continue;
+            for (const [port, v] of Object.entries(data.progress[job.id] || {})) {
+              renderPort({job: job.id, interface: port, ...v});
+            }
+          }
+          loadPage();  // (re)connect: ambil ulang halaman supaya tidak ada ONU yang terlewat
+        });
+        es.addEventListener("job", e => renderJob(JSON.parse(e.data)));
+        es.addEventListener("progress", e => renderPort(JSON.parse(e.data)));
+        es.addEventListener("onu", scheduleDelta);
+      }
+
+      connectEvents();
       </script>
     </body>
     </html>
-    """)
+    """, fieldnames=FIELDNAMES)
+
+
+def csv_error(e):
+    """CsvError → 400 dengan semua baris yang tidak valid."""
+    errors = [f"baris {line}: {msg}" for line, msg in e.errors]
+    if e.total > len(errors):
+        errors.append(f"... dan {e.total - len(errors)} error lain")
+    return jsonify({"error": f"❌ CSV tidak valid ({e.total} error), perbaiki lalu upload ulang.", "errors": errors}), 400
+
+
+def form_int(name, label, default, lo=1, hi=None):
+    """Field angka dari form (kosong → default). ValueError berisi pesan untuk user kalau tidak valid."""
+    raw = (request.form.get(name) or "").strip()
+    if not raw:
+        return default
+    if not raw.isdigit() or int(raw) < lo or (hi is not None and int(raw) > hi):
+        limit = f"{lo}–{hi}" if hi is not None else f"minimal {lo}"
+        raise ValueError(f"❌ {label} '{raw}' tidak valid (angka {limit}).")
+    return int(raw)
 
 
 @app.route("/upload", methods=["POST"])
@@ -258,85 +507,193 @@ def upload():
     file = request.files.get("file")
     if not file:
         return jsonify({"error": "❌ Tidak ada file diupload."}), 400
-
-    path = os.path.join(UPLOAD_FOLDER, "data_onu.csv")
+    try:
+        olt_port = form_int("olt_port", "Port OLT", 22, hi=65535)
+        max_sessions = form_int("max_sessions", "Max session", 4)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job_id = new_job_id()
+    path = os.path.join(UPLOAD_FOLDER, f"{job_id}.csv")  # file per job, upload lain tidak menimpa
     file.save(path)
 
-    # ✅ Validasi hanya 1 port di CSV
-    with open(path, newline="", encoding="utf-8") as f:
-        reader = list(csv.DictReader(f))
-    ports = {r["interface"].strip() for r in reader if r.get("interface")}
-    if len(ports) != 1:
-        return jsonify({
-            "error": f"❌ File harus berisi 1 port saja, ditemukan {len(ports)} port: {', '.join(ports)}"
-        }), 400
-        
+    try:
+        ports = sorted(group_by_port(read_onu_csv(path)))  # validasi streaming satu pass
+    except CsvError as e:
+        os.remove(path)
+        return csv_error(e)
+    if not ports:
+        os.remove(path)
+        return jsonify({"error": "❌ CSV tidak berisi interface."}), 400
+
     auto_write = request.form.get("auto_write") == "true"
     
     olt_config = {
         "host": request.form.get("olt_host"),
-        "port": int(request.form.get("olt_port")),
+        "port": olt_port,
         "user": request.form.get("olt_user"),
         "pass": request.form.get("olt_pass"),
         "vlan_prefix": request.form.get("vlan_prefix"),
         "max_workers": 1,
+        "max_sessions": max_sessions,
         "auto_write": auto_write,
+        "unreg_mode": "wipe" if request.form.get("unreg_wipe") == "true" else "reconcile",
+        "config_mode": "diff" if request.form.get("config_diff") == "true" else "full",
     }
 
-    def threaded_run():
-        try:
-            current_phase["phase"] = "register"
-            run_regis_main(path, olt_config, mode="register")
-            current_phase["phase"] = "config"
-            run_regis_main(path, olt_config, mode="config")
-            current_phase["phase"] = "done"
-        except Exception as e:
-            current_phase["phase"] = f"error: {e}"
-
-    t = threading.Thread(target=threaded_run, daemon=True)
-    t.start()
+    # register & config berjalan overlap (pipeline), dieksekusi oleh executor (jobs.py)
+    job_store.submit(job_id, path, olt_config, mode="pipeline")
+    ahead = job_store.queue_position(job_id)
+    queued = f" Menunggu {ahead} job lain di antrian." if ahead else ""
     return jsonify({
-        "success": f"✅ File diterima. Menjalankan registrasi untuk {list(ports)[0]} di OLT {olt_config['host']}."
+        "job": job_id,
+        "success": f"✅ Job {job_id} diterima: {len(ports)} port ({', '.join(ports)}) di OLT {olt_config['host']}.{queued}"
     })
 
 
+@app.route("/plan", methods=["POST"])
+def dry_run_plan():
+    """Dry-run: compile plan dari CSV + parameter form, tanpa konek ke OLT (plan ikut di-cache)."""
+    file = request.files.get("file")
+    if not file:
+        return jsonify({"error": "❌ Tidak ada file diupload."}), 400
+    path = os.path.join(UPLOAD_FOLDER, f"plan_{new_job_id()}.csv")
+    file.save(path)
+    try:
+        plan, cached = load_or_compile(path, {"vlan_prefix": request.form.get("vlan_prefix", "")})
+    except CsvError as e:
+        return csv_error(e)
+    finally:
+        os.remove(path)
+    if not plan.ports:
+        return jsonify({"error": "❌ CSV tidak berisi interface."}), 400
+    return jsonify({"summary": plan.summary(), "cached": cached, "text": "\n".join(render_plan(plan))})
+
+
+@app.route("/transcript")
+def transcript_view():
+    """Transcript CLI satu port / ONU (?interface=&onu_id=[&job=]) dari index transcripts/, entry terbaru di akhir."""
+    interface = request.args.get("interface", "").strip()
+    if not interface:
+        return jsonify({"error": "❌ Parameter interface wajib."}), 400
+    entries = transcript.read(interface, request.args.get("onu_id") or None, request.args.get("job") or None,
+                              limit=request.args.get("limit", transcript.TRANSCRIPT_READ_LIMIT, type=int))
+    return jsonify({"interface": interface, "entries": entries})
+
+
+def _latest_job_id():
+    jobs = job_store.list(1)
+    return jobs[0]["id"] if jobs else None
+
+
 @app.route("/progress")
 def progress():
-    return jsonify(progress_dict)
+    """Progress per port satu job (?job=, default job terbaru) — format sama seperti dulu."""
+    job_id = request.args.get("job") or _latest_job_id()
+    return jsonify(job_store.progress(job_id) if job_id else {})
 
 
-@app.route("/results")
-def results():
-    if not os.path.exists(LOG_CSV):
-        return "<i>Belum ada hasil registrasi.</i>"
+@app.route("/jobs")
+def jobs_list():
+    return jsonify(job_store.list(request.args.get("limit", 20, type=int)))
+
+
+@app.route("/jobs/<job_id>")
+def job_detail(job_id):
+    job = job_store.get(job_id)
+    if not job:
+        return jsonify({"error": "Job tidak ditemukan"}), 404
+    return jsonify({**job, "progress": job_store.progress(job_id)})
 
-    with open(LOG_CSV, newline="", encoding="utf-8") as f:
-        rows = [r for r in csv.DictReader(f) if r]  # skip baris kosong
 
-    if not rows:
-        return "<i>Belum ada hasil registrasi.</i>"
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    status = job_store.cancel(job_id)
+    if status is None:
+        return jsonify({"error": "Job tidak aktif / tidak ditemukan"}), 409
+    return jsonify({"job": job_id, "status": status})
 
-    html = "<table><tr>" + "".join([f"<th>{h}</th>" for h in rows[0].keys()]) + "</tr>"
 
-    for r in rows:
-        if not r:  # skip baris kosong/null
-            continue
-        status = (r.get("status") or "").lower()  # aman walau None
-        color = (
-            "var(--wait)" if status == "pending"
-            else "var(--success)" if status in ["registered", "success"]
-            else "#f44336" if status == "error"
-            else "var(--text)"
-        )
-        html += "<tr>" + "".join([
-            f"<td style='color:{color};font-weight:bold'>{v}</td>" if k == "status" else f"<td>{v}</td>"
-            for k, v in r.items()
-        ]) + "</tr>"
+@app.route("/events")
+def events():
+    """
+    Server-Sent Events: snapshot awal, lalu hanya perubahan:
+    job (status/fase), progress (per job & port), onu (result store berubah).
+    Sumbernya jobs.db lewat JobFeed — satu thread pembaca per proses web.
+    """
+    job_feed.ensure_started()
 
-    html += "</table>"
-    return html
+    def snapshot():
+        jobs = job_store.list(SNAPSHOT_JOBS)
+        return sse("snapshot", {"jobs": jobs, "progress": {j["id"]: job_store.progress(j["id"]) for j in jobs}})
 
+    def stream():
+        q = bus.subscribe()
+        try:
+            yield snapshot()
+            while True:
+                try:
+                    kind, data = q.get(timeout=SSE_PING_SEC)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield snapshot() if kind == "resync" else sse(kind, data)
+        finally:
+            bus.unsubscribe(q)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    # metrics dari proses job (executor) digabung lewat snapshot di jobs.db
+    return Response(metrics.render(job_store.metrics_snapshots()), mimetype="text/plain; version=0.0.4")
+
+
+def results_etag(version, **query):
+    """ETag /results: version store + hash query (halaman/filter beda → ETag beda)."""
+    q = "&".join(f"{k}={'' if v is None else v}" for k, v in sorted(query.items()))
+    return f"{version}-{hashlib.sha1(q.encode()).hexdigest()[:12]}"
+
+
+@app.route("/results")
+def results():
+    """
+    JSON hasil registrasi (tabel dirender di browser):
+    - ?page=&per_page=      paging server-side (urut port/ONU)
+    - ?status=&interface=   filter
+    - ?since=<version>      hanya row yang berubah sejak version tsb (urut version),
+                            "more": true → ambil lagi dengan since=version balasan;
+                            "total" tetap jumlah row yang cocok filter
+    - ETag = version result store + query ternormalisasi (page/per_page/since/filter);
+      If-None-Match sama persis → 304 tanpa body
+    """
+    store = result_store()
+    per_page = min(max(request.args.get("per_page", RESULTS_PER_PAGE, type=int), 1), RESULTS_MAX_PER_PAGE)
+    page = max(request.args.get("page", 1, type=int), 1)
+    since = request.args.get("since", type=int)
+    status = (request.args.get("status") or "").lower() or None
+    interface = request.args.get("interface") or None
+
+    # version dibaca sebelum query: paling buruk body lebih baru dari ETag → request berikutnya ambil ulang
+    etag = results_etag(store.version(), page=page if since is None else 1, per_page=per_page,
+                        since=since, status=status, interface=interface)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "no-cache"})
+
+    offset = 0 if since is not None else (page - 1) * per_page
+    data = store.query(status=status, interface=interface, since=since, offset=offset, limit=per_page)
+    resp = jsonify({**data, "page": page, "per_page": per_page})
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=True, use_reloader=False)
+    # mode dev: executor ikut dijalankan; production jalankan `python jobs.py` sebagai service sendiri
+    executor = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.py")])
+    try:
+        app.run(host="0.0.0.0", port=8000, debug=True, use_reloader=False, threaded=True)
+    finally:
+        executor.terminate()
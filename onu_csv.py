@@ -0,0 +1,145 @@
+"""
+Ingest CSV ONU: validasi streaming satu pass → record ringkas OnuRow (__slots__).
+
+- Dicek sekaligus, semua error dilaporkan bersama (CsvError.errors = [(baris, pesan)]):
+  kolom wajib, interface gpon-olt_x/y/z, onu_id angka 1–128, ID & SN ganda, VLAN 1–4094
+- Nilai di-strip sekali di sini → builder perintah tidak strip/parse ulang per kirim
+- OnuRow tetap bisa dibaca seperti dict (row["sn"], row.get("name", "")) → engine, journal,
+  result store & plan memakai record yang sama
+- Baris yang seluruh kolomnya kosong dilewati
+"""
+import csv, operator, re
+
+ONU_ID_MAX = 128
+VLAN_MIN, VLAN_MAX = 1, 4094
+MAX_REPORTED_ERRORS = 100   # error yang dicantumkan di pesan (jumlah total tetap dihitung)
+
+FIELDS = ("interface", "onu_id", "sn", "name", "description", "profile",
+          "username", "password", "vlan_inet", "vlan_hotspot", "wifi_ssid")
+REQUIRED_COLUMNS = ("interface", "onu_id", "sn")
+CONFIG_COLUMNS = ("profile", "username", "password", "vlan_inet", "vlan_hotspot", "wifi_ssid")
+VLAN_COLUMNS = ("vlan_inet", "vlan_hotspot")
+
+INTERFACE_RE = re.compile(r"^gpon-olt_\d+/\d+/\d+$")
+
+
+class OnuRow:
+    """Satu ONU dari CSV (nilai sudah di-strip & tervalidasi); `line` = nomor baris di file."""
+    __slots__ = FIELDS + ("line",)
+
+    def __init__(self, values, line):
+        (self.interface, self.onu_id, self.sn, self.name, self.description, self.profile,
+         self.username, self.password, self.vlan_inet, self.vlan_hotspot, self.wifi_ssid) = values
+        self.line = line
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    def __repr__(self):
+        return f"OnuRow({self.interface}:{self.onu_id} {self.sn})"
+
+
+class CsvError(ValueError):
+    def __init__(self, errors, total=None):
+        self.errors = errors
+        self.total = total or len(errors)
+        lines = [f"baris {line}: {msg}" if line else msg for line, msg in errors]
+        more = f"\n... dan {self.total - len(errors)} error lain" if self.total > len(errors) else ""
+        super().__init__(f"CSV tidak valid ({self.total} error):\n" + "\n".join(lines) + more)
+
+
+_ONU_IDS = frozenset(str(i) for i in range(1, ONU_ID_MAX + 1))
+_VLANS = frozenset(str(i) for i in range(VLAN_MIN, VLAN_MAX + 1))
+
+
+def iter_onu_rows(f, config=True):
+    """
+    Generator OnuRow dari file CSV yang sudah dibuka; validasi berjalan bersamaan.
+    - config=True: kolom config (profile, username, ..., wifi_ssid) juga wajib
+    CsvError di akhir (setelah seluruh file dibaca) kalau ada error.
+    """
+    reader = csv.reader(f)
+    header = [h.strip().lower() for h in next(reader, [])]
+    required = REQUIRED_COLUMNS + (CONFIG_COLUMNS if config else ())
+    missing = [c for c in required if c not in header]
+    if missing:
+        raise CsvError([(1, f"kolom wajib tidak ada: {', '.join(missing)}")])
+    width = len(header)
+    # kolom opsional yang tidak ada → index `width` (sel kosong tambahan di tiap baris)
+    pick = operator.itemgetter(*[header.index(c) if c in header else width for c in FIELDS])
+    pad = [""] * (width + 1)
+    config_cells = operator.itemgetter(*[FIELDS.index(c) for c in CONFIG_COLUMNS]) if config else None
+    check_vlan = [(c, FIELDS.index(c)) for c in VLAN_COLUMNS if c in header]
+    check_config = [(c, FIELDS.index(c)) for c in CONFIG_COLUMNS] if config else []
+
+    errors, total = [], 0
+    seen_id, seen_sn, good_iface = {}, {}, set()
+
+    def error(line, msg):
+        nonlocal total
+        total += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append((line, msg))
+
+    for line, raw in enumerate(reader, start=2):
+        if len(raw) == width:
+            raw.append("")
+        else:
+            raw = (raw + pad)[:width] + [""]
+        values = list(map(str.strip, pick(raw)))
+        if not any(values):
+            continue
+        interface, onu_id, sn = values[0], values[1], values[2]
+        bad = total
+        if interface not in good_iface:
+            if INTERFACE_RE.match(interface):
+                good_iface.add(interface)
+            else:
+                error(line, f"interface '{interface}' bukan format gpon-olt_x/y/z")
+        if onu_id not in _ONU_IDS:
+            if onu_id.isdigit() and str(int(onu_id)) in _ONU_IDS:
+                onu_id = values[1] = str(int(onu_id))  # '007' → '7' (sama dengan ID di output OLT)
+            else:
+                error(line, f"onu_id '{onu_id}' harus angka 1–{ONU_ID_MAX}")
+                onu_id = None
+        if sn:
+            first = seen_sn.setdefault(sn.upper(), line)
+            if first != line:
+                error(line, f"SN {sn} ganda (sudah di baris {first})")
+        else:
+            error(line, "sn kosong")
+        if onu_id and interface in good_iface:
+            first = seen_id.setdefault((interface, onu_id), line)
+            if first != line:
+                error(line, f"onu_id {onu_id} di {interface} ganda (sudah di baris {first})")
+        if config_cells and not all(config_cells(values)):
+            for col, i in check_config:
+                if not values[i]:
+                    error(line, f"{col} kosong")
+        for col, i in check_vlan:
+            if values[i] and values[i] not in _VLANS:
+                error(line, f"{col} '{values[i]}' bukan VLAN {VLAN_MIN}–{VLAN_MAX}")
+        if total == bad and not errors:
+            yield OnuRow(values, line)
+
+    if errors:
+        raise CsvError(errors, total)
+
+
+def read_onu_csv(csv_path, config=True):
+    """CSV → [OnuRow] (urutan file). CsvError berisi semua error kalau ada yang tidak valid."""
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        return list(iter_onu_rows(f, config))
+
+
+def group_by_port(rows):
+    """[OnuRow] → {interface: [OnuRow]} (urutan port & ONU sesuai CSV)."""
+    ports = {}
+    for r in rows:
+        ports.setdefault(r.interface, []).append(r)
+    return ports
@@ -0,0 +1,212 @@
+"""
+Plan compiler: CSV + cfg → plan perintah per port yang diserialisasi & di-cache.
+
+- Plan = per port, per ONU (urutan CSV): block register & block config, tiap block berisi
+  baris perintah + jumlah prompt yang diharapkan (1 per baris)
+- Content-addressed: key = sha256(format plan + isi CSV + parameter yang memengaruhi perintah),
+  disimpan di plans/<key>.json → run ulang / retry memakai plan yang sama, tidak dibangun ulang
+- Register tetap dikirim per batch adaptif (RegisterPacer): plan menyimpan baris per ONU,
+  batch = "interface X" + baris ONU + "exit"
+- Rahasia (password PPPoE) tidak ikut disimpan: di plan tertulis <secret:password>, diisi dari
+  row CSV saat block dikirim → file plan & tampilan dry-run tidak berisi password
+- Plan yang tidak dipakai lebih dari PLAN_KEEP_DAYS (dan plan format lama) dihapus saat compile
+- Dry-run tanpa konek ke OLT:
+    python plan.py data_onu.csv --vlan-prefix vlan              # tampilkan seluruh perintah
+    python plan.py data_onu.csv --vlan-prefix vlan --summary    # ringkasan per port
+    python plan.py baru.csv --vlan-prefix vlan --diff lama.csv  # beda perintah per ONU
+"""
+import argparse, difflib, hashlib, json, os, sys, threading, time
+
+from onu_csv import FIELDS, CsvError, OnuRow, read_onu_csv
+from result_store import key_of
+
+PLAN_FORMAT    = 3          # naikkan kalau template perintah (build_config_block dll.) berubah → cache lama tidak dipakai
+PLAN_DIR       = "plans"
+PLAN_KEEP_DAYS = 14
+SECRET_FIELDS  = ("password",)
+SECRET_MARKS   = {f: f"<secret:{f}>" for f in SECRET_FIELDS}
+
+
+def _csv_digest(csv_path):
+    h = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def plan_params(cfg):
+    """Bagian cfg yang mengubah perintah (kredensial / host tidak ikut → plan bisa dipakai di OLT lain)."""
+    return {"vlan_prefix": cfg.get("vlan_prefix", ""), "onu_type": cfg.get("onu_type", "ALL")}
+
+
+def plan_key(csv_digest, params):
+    raw = json.dumps({"format": PLAN_FORMAT, "csv": csv_digest, "params": params}, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class Plan:
+    def __init__(self, data):
+        self.data = data
+        self.key = data["key"]
+        self._units = {(iface, u["onu_id"], u["sn"]): u
+                       for iface, units in data["ports"].items() for u in units}
+
+    def _lines(self, row, phase):
+        unit = self._units.get(key_of(row))
+        if not unit:
+            return None
+        return [_fill(line, row) if "<secret:" in line else line for line in unit[phase]["lines"]]
+
+    def register_lines(self, row):
+        """Baris register ONU ini dari plan (None kalau ONU tidak ada di plan)."""
+        return self._lines(row, "register")
+
+    def config_lines(self, row):
+        return self._lines(row, "config")
+
+    @property
+    def ports(self):
+        return self.data["ports"]
+
+    def summary(self):
+        ports = {iface: {"onus": len(units),
+                         "register_lines": sum(u["register"]["prompts"] for u in units),
+                         "config_lines": sum(u["config"]["prompts"] for u in units)}
+                 for iface, units in self.ports.items()}
+        return {"key": self.key, "params": self.data["params"], "ports": ports,
+                "onus": sum(p["onus"] for p in ports.values()),
+                "lines": sum(p["register_lines"] + p["config_lines"] for p in ports.values())}
+
+
+def _fill(line, row):
+    """Penanda <secret:field> → nilai asli dari row CSV (saat block dikirim)."""
+    for field, mark in SECRET_MARKS.items():
+        line = line.replace(mark, row.get(field) or "")
+    return line
+
+
+def _redacted(row):
+    """Salinan OnuRow dengan field rahasia diganti penanda (yang disimpan di plan)."""
+    return OnuRow([SECRET_MARKS.get(f) or getattr(row, f) for f in FIELDS], row.line)
+
+
+def compile_plan(csv_path, cfg, digest=None):
+    """Bangun plan dari CSV memakai builder yang sama dengan engine (hasil identik dengan kiriman)."""
+    import regis_onu_zte as core
+
+    params = plan_params(cfg)
+    digest = digest or _csv_digest(csv_path)
+    ports = {}
+    for r in read_onu_csv(csv_path, config=False):  # CsvError kalau CSV tidak valid
+        reg = core.register_lines(r, onu_type=params["onu_type"])
+        conf = core.config_lines(_redacted(r), params["vlan_prefix"])
+        ports.setdefault(r.interface, []).append({
+            "onu_id": r.onu_id, "sn": r.sn, "name": r.name,
+            "register": {"lines": reg, "prompts": len(reg)},
+            "config": {"lines": conf, "prompts": len(conf)},
+        })
+    return Plan({"format": PLAN_FORMAT, "key": plan_key(digest, params), "csv_sha256": digest,
+                 "params": params, "created_at": time.time(), "ports": ports})
+
+
+def purge(plan_dir=PLAN_DIR, keep_days=PLAN_KEEP_DAYS):
+    """Hapus plan yang tidak dipakai > keep_days & plan format lama (bisa berisi password polos)."""
+    cutoff = time.time() - keep_days * 86400
+    head = f'{{"format": {PLAN_FORMAT},'.encode()  # json.dump plan.data: key "format" selalu pertama
+    for fn in os.listdir(plan_dir) if os.path.isdir(plan_dir) else []:
+        path = os.path.join(plan_dir, fn)
+        try:
+            if fn.endswith(".tmp"):
+                stale = os.path.getmtime(path) < time.time() - 3600  # sisa proses yang mati saat menulis
+            else:
+                with open(path, "rb") as f:
+                    stale = os.path.getmtime(path) < cutoff or f.read(len(head)) != head
+            if stale:
+                os.remove(path)
+        except OSError:
+            continue  # dihapus / diganti proses lain
+
+
+def load_or_compile(csv_path, cfg, plan_dir=PLAN_DIR):
+    """Plan dari cache plans/<key>.json; compile & simpan kalau belum ada. Return (plan, dari_cache)."""
+    digest = _csv_digest(csv_path)
+    key = plan_key(digest, plan_params(cfg))
+    path = os.path.join(plan_dir, f"{key}.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            plan = Plan(json.load(f))
+        try:
+            os.utime(path)  # masih dipakai → tidak ikut di-purge
+        except OSError:
+            pass
+        return plan, True
+    plan = compile_plan(csv_path, cfg, digest)
+    purge(plan_dir)
+    os.makedirs(plan_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # unik per proses & thread (run_many)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(plan.data, f)
+    os.replace(tmp, path)  # atomic: proses lain tidak pernah membaca plan setengah jadi
+    return plan, False
+
+
+def render(plan, port=None):
+    """Plan → baris teks (header per port/ONU) untuk dry-run & diff."""
+    for iface, units in plan.ports.items():
+        if port and iface != port:
+            continue
+        yield f"## {iface} ({len(units)} ONU)"
+        for u in units:
+            yield f"# ONU {iface}:{u['onu_id']} {u['sn']} {u['name']}".rstrip()
+            yield "#   register (dalam batch 'interface {}' ... 'exit'):".format(iface)
+            for line in u["register"]["lines"]:
+                yield f"    {line}"
+            yield "#   config:"
+            for line in u["config"]["lines"]:
+                yield f"    {line}"
+
+
+def diff(old, new, port=None):
+    """Unified diff perintah dua plan (hanya bagian yang berubah + konteks)."""
+    return difflib.unified_diff(list(render(old, port)), list(render(new, port)),
+                                fromfile=f"plan {old.key[:12]}", tofile=f"plan {new.key[:12]}", lineterm="")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile / dry-run plan registrasi ONU (tanpa konek ke OLT)")
+    ap.add_argument("csv")
+    ap.add_argument("--vlan-prefix", required=True)
+    ap.add_argument("--onu-type", default="ALL")
+    ap.add_argument("--port", help="hanya tampilkan satu interface")
+    ap.add_argument("--summary", action="store_true", help="ringkasan per port saja")
+    ap.add_argument("--diff", metavar="CSV_LAMA", help="bandingkan dengan plan dari CSV lain")
+    a = ap.parse_args()
+
+    cfg = {"vlan_prefix": a.vlan_prefix, "onu_type": a.onu_type}
+    try:
+        plan, cached = load_or_compile(a.csv, cfg)
+        old = load_or_compile(a.diff, cfg)[0] if a.diff else None
+    except CsvError as e:
+        raise SystemExit(f"❌ {e}")
+    info = plan.summary()
+    print(f"# plan {plan.key} ({'cache' if cached else 'baru'}) — {len(info['ports'])} port, "
+          f"{info['onus']} ONU, {info['lines']} baris perintah", file=sys.stderr)
+
+    if old:
+        changed = False
+        for line in diff(old, plan, a.port):
+            changed = True
+            print(line)
+        if not changed:
+            print("# tidak ada perbedaan perintah", file=sys.stderr)
+    elif a.summary:
+        for iface, p in info["ports"].items():
+            print(f"{iface}: {p['onus']} ONU, register {p['register_lines']} baris, config {p['config_lines']} baris")
+    else:
+        for line in render(plan, a.port):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
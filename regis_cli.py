@@ -0,0 +1,289 @@
+"""
+Runner headless (tanpa Web UI) untuk migrasi massal: banyak CSV ke banyak OLT sekaligus.
+
+- Inventory OLT (CSV): name,host,port,user,pass,vlan_prefix,max_sessions
+  [,onu_type,auto_write,unreg_mode,config_mode,engine]
+  kolom pass kosong → env OLT_PASS_<NAME> lalu OLT_PASS (password tidak perlu ditulis di file)
+- Daftar CSV:
+    --manifest manifest.csv   kolom csv,olt[,mode] (path csv relatif terhadap manifest)
+    --dir folder/             folder/<nama_olt>/*.csv
+- Process pool: satu proses per OLT (semua OLT jalan paralel), CSV satu OLT dijalankan
+  berurutan; session SSH di dalam proses dibatasi max_sessions OLT tsb
+- Output tiap OLT ke <log-dir>/<nama_olt>.log; terminal hanya ringkasan gabungan
+- SIGINT/SIGTERM → semua OLT berhenti rapi di batas batch (sisa CSV dilewati)
+- Exit code 0 kalau semua ONU sukses (CSV mode register: cukup registered), 1 kalau ada
+  error/pending/CSV gagal (untuk cron)
+
+Contoh (cron malam):
+    python -m regis_cli --inventory olt_inventory.csv --dir migrasi/
+    python -m regis_cli --inventory olt_inventory.csv --manifest malam_ini.csv --mode full
+    python -m regis_cli --inventory olt_inventory.csv --dir migrasi/ --dry-run
+"""
+import argparse, csv, multiprocessing as mp, os, queue, re, signal, sys, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+CLI_LOG_DIR       = "cli_logs"
+SUMMARY_EVERY_SEC = 15      # ringkasan gabungan dicetak tiap N detik
+MODES             = ("pipeline", "full", "register", "config")
+
+_events = None   # queue event worker → proses utama (diisi initializer)
+_stop = None     # mp.Event: diset proses utama saat SIGINT/SIGTERM
+
+
+# ------------------------- INPUT -------------------------
+def _env_name(name):
+    return "OLT_PASS_" + re.sub(r"\W", "_", name).upper()
+
+
+def load_inventory(path):
+    """Inventory CSV → {nama_olt: cfg} (format cfg sama seperti dari Web UI)."""
+    import regis_onu_zte as core
+
+    olts = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            name = (r.get("name") or "").strip()
+            if not name:
+                continue
+            password = (r.get("pass") or "").strip() or os.environ.get(_env_name(name)) or os.environ.get("OLT_PASS")
+            if not password:
+                raise SystemExit(f"❌ Password OLT {name} kosong (isi kolom pass / env {_env_name(name)} / OLT_PASS)")
+            olts[name] = {
+                "host": r["host"].strip(),
+                "port": int(r.get("port") or 22),
+                "user": r["user"].strip(),
+                "pass": password,
+                "vlan_prefix": (r.get("vlan_prefix") or "").strip(),
+                "max_workers": 1,
+                "max_sessions": int(r.get("max_sessions") or core.MAX_SESSIONS_PER_OLT),
+                "onu_type": (r.get("onu_type") or "").strip() or "ALL",
+                "auto_write": (r.get("auto_write") or "").strip().lower() in ("1", "true", "yes", "y"),
+                "unreg_mode": (r.get("unreg_mode") or "").strip() or core.UNREG_MODE,
+                "config_mode": (r.get("config_mode") or "").strip() or core.CONFIG_MODE,
+            }
+            if (r.get("engine") or "").strip():
+                olts[name]["engine"] = r["engine"].strip()
+    return olts
+
+
+def load_manifest(path, default_mode):
+    """manifest.csv (csv,olt[,mode]) → [(nama_olt, csv_path, mode)] sesuai urutan file."""
+    base = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            if not (r.get("csv") or "").strip():
+                continue
+            items.append((r["olt"].strip(), os.path.join(base, r["csv"].strip()),
+                          (r.get("mode") or "").strip() or default_mode))
+    return items
+
+
+def scan_dir(path, default_mode):
+    """folder/<nama_olt>/*.csv → [(nama_olt, csv_path, mode)], urut nama file."""
+    items = []
+    for name in sorted(os.listdir(path)):
+        sub = os.path.join(path, name)
+        if os.path.isdir(sub):
+            items += [(name, os.path.join(sub, fn), default_mode)
+                      for fn in sorted(os.listdir(sub)) if fn.lower().endswith(".csv")]
+    return items
+
+
+def csv_keys(csv_path, mode):
+    """Kunci ONU satu CSV (sekaligus validasi; CsvError kalau tidak valid)."""
+    from onu_csv import read_onu_csv
+    from result_store import key_of
+
+    return [key_of(r) for r in read_onu_csv(csv_path, config=mode != "register")]
+
+
+# ------------------------- WORKER (satu proses per OLT) -------------------------
+def _init_worker(events, stop):
+    global _events, _stop
+    _events, _stop = events, stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C ditangani proses utama → _stop
+
+
+def run_olt(name, cfg, jobs, log_dir):
+    """Jalankan semua CSV satu OLT berurutan. Return {csv_path: (status, error)}."""
+    import regis_onu_zte as core
+
+    os.makedirs(log_dir, exist_ok=True)
+    log = open(os.path.join(log_dir, f"{name}.log"), "a", encoding="utf-8", buffering=1)
+    sys.stdout = sys.stderr = log
+    results = {}
+    try:
+        for csv_path, mode in jobs:
+            if _stop.is_set():
+                results[csv_path] = ("skipped", "dihentikan sebelum mulai")
+                continue
+            print(f"\n===== {time.strftime('%Y-%m-%d %H:%M:%S')} {csv_path} (mode={mode}) =====")
+            _events.put(("start", name, csv_path))
+            t0 = time.time()
+            status, error = "done", None
+            try:
+                core.main(csv_path, dict(cfg, cancel=_stop), mode=mode)
+            except core.JobCancelled as e:
+                status, error = "cancelled", str(e)
+            except Exception as e:
+                status, error = "error", str(e)
+            results[csv_path] = (status, error)
+            _events.put(("done", name, csv_path, status, error, time.time() - t0))
+    finally:
+        log.close()
+    return results
+
+
+# ------------------------- PROSES UTAMA -------------------------
+class Summary:
+    """Ringkasan gabungan semua OLT dari result store (dipakai bersama semua proses)."""
+
+    def __init__(self, items):
+        """Baca & validasi semua CSV di proses utama dulu → error semua file dilaporkan sebelum OLT mana pun jalan."""
+        from onu_csv import CsvError
+
+        self.keys, bad = {}, []
+        register, configure = set(), set()
+        for name, csv_path, mode in items:
+            try:
+                keys = csv_keys(csv_path, mode)
+            except (CsvError, OSError) as e:
+                bad.append(f"❌ {csv_path}: {e}")
+                continue
+            self.keys.setdefault(name, []).extend(keys)
+            (register if mode == "register" else configure).update(keys)
+        # target ONU dari CSV mode register cukup 'registered' (kecuali ONU yang sama juga ada di CSV mode lain)
+        self.register_only = register - configure
+        if bad:
+            raise SystemExit("\n".join(bad))
+        self.csv_total = len(items)
+        self.csv_done = Counter()
+
+    def counts(self):
+        """
+        Jumlah status ONU per OLT + total. Key tambahan "unfinished" (tidak ikut dijumlah sebagai ONU):
+        pending, atau 'registered' yang masih harus di-config (CSV mode full/config/pipeline).
+        """
+        import regis_onu_zte as core
+
+        status = core.result_store().status_map()
+        per_olt = {}
+        for name, keys in self.keys.items():
+            c = per_olt[name] = Counter(status.get(k, "pending") for k in keys)
+            c["unfinished"] = c["pending"] + sum(1 for k in keys
+                                                 if status.get(k) == "registered" and k not in self.register_only)
+        return per_olt, sum(per_olt.values(), Counter())
+
+    @staticmethod
+    def onus(c):
+        return sum(v for k, v in c.items() if k != "unfinished")
+
+    def line(self, started):
+        _, total = self.counts()
+        onus = self.onus(total)
+        return (f"📊 {int(time.time() - started)}s | CSV {sum(self.csv_done.values())}/{self.csv_total} | "
+                f"ONU {total['success']}/{onus} sukses, {total['error']} error, "
+                f"{total['registered']} registered, {total['pending']} pending")
+
+
+def dry_run(olts, items):
+    """Tampilkan pembagian CSV per OLT + ringkasan plan, tanpa konek ke OLT."""
+    from plan import load_or_compile
+
+    for name in sorted({n for n, _, _ in items}):
+        cfg = olts[name]
+        print(f"🖧 {name} ({cfg['host']}:{cfg['port']}, max {cfg['max_sessions']} session)")
+        for n, csv_path, mode in items:
+            if n != name:
+                continue
+            info = load_or_compile(csv_path, cfg)[0].summary()
+            print(f"   {csv_path} [{mode}] → {len(info['ports'])} port, {info['onus']} ONU, "
+                  f"{info['lines']} baris perintah (plan {info['key'][:12]})")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Registrasi ONU massal tanpa Web UI (satu proses per OLT)")
+    ap.add_argument("--inventory", required=True, help="CSV inventory OLT")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--manifest", help="CSV manifest: csv,olt[,mode]")
+    src.add_argument("--dir", help="folder berisi <nama_olt>/*.csv")
+    ap.add_argument("--mode", default="pipeline", choices=MODES, help="mode default per CSV")
+    ap.add_argument("--max-olts", type=int, default=0, help="OLT paralel maksimal (0 = semua)")
+    ap.add_argument("--log-dir", default=CLI_LOG_DIR)
+    ap.add_argument("--dry-run", action="store_true", help="tampilkan rencana tanpa konek ke OLT")
+    a = ap.parse_args(argv)
+
+    olts = load_inventory(a.inventory)
+    items = load_manifest(a.manifest, a.mode) if a.manifest else scan_dir(a.dir, a.mode)
+    unknown = sorted({n for n, _, _ in items if n not in olts})
+    if unknown:
+        raise SystemExit(f"❌ OLT tidak ada di inventory: {', '.join(unknown)}")
+    bad_modes = sorted({m for _, _, m in items if m not in MODES})
+    if bad_modes:
+        raise SystemExit(f"❌ Mode tidak dikenal: {', '.join(bad_modes)}")
+    if not items:
+        print("❌ Tidak ada CSV untuk dijalankan.")
+        return 1
+    summary = Summary(items)  # validasi semua CSV (berhenti di sini kalau ada yang tidak valid)
+    if a.dry_run:
+        dry_run(olts, items)
+        return 0
+
+    per_olt = {}
+    for name, csv_path, mode in items:
+        per_olt.setdefault(name, []).append((csv_path, mode))
+    workers = min(len(per_olt), a.max_olts or len(per_olt))
+    print(f"🚀 {len(items)} CSV ke {len(per_olt)} OLT ({workers} proses paralel), log per OLT di {a.log_dir}/")
+
+    ctx = mp.get_context("spawn")  # proses bersih: tanpa thread/transport SSH warisan dari proses utama
+    events, stop = ctx.Queue(), ctx.Event()
+
+    def request_stop(signum, frame):
+        if not stop.is_set():
+            print("⛔ Berhenti: menunggu semua OLT selesai di batas batch...")
+            stop.set()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    started = time.time()
+    results = {}
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(events, stop)) as pool:
+        futures = {pool.submit(run_olt, name, olts[name], jobs, a.log_dir): name for name, jobs in per_olt.items()}
+        last_line = 0.0
+        while not all(f.done() for f in futures):
+            try:
+                ev = events.get(timeout=1)
+            except queue.Empty:
+                ev = None
+            if ev and ev[0] == "start":
+                print(f"▶️ {ev[1]}: {ev[2]}")
+            elif ev and ev[0] == "done":
+                _, name, csv_path, status, error, secs = ev
+                summary.csv_done[name] += 1
+                icon = {"done": "✅", "cancelled": "⛔"}.get(status, "❌")
+                print(f"{icon} {name}: {csv_path} {status} ({secs:.0f}s)" + (f" — {error}" if error else ""))
+            if time.time() - last_line >= SUMMARY_EVERY_SEC:
+                last_line = time.time()
+                print(summary.line(started))
+        for f, name in futures.items():
+            try:
+                results.update({(name, p): r for p, r in f.result().items()})
+            except Exception as e:  # proses worker mati (mis. di-kill)
+                results.update({(name, p): ("error", f"proses OLT berhenti: {e}") for p, _ in per_olt[name]})
+
+    per_olt_counts, total = summary.counts()
+    print(f"\n🏁 Selesai dalam {time.time() - started:.0f}s")
+    for name in sorted(per_olt_counts):
+        c = per_olt_counts[name]
+        failed = [p for (n, p), (st, _) in results.items() if n == name and st != "done"]
+        print(f"   {name}: {c['success']}/{summary.onus(c)} sukses, {c['error']} error, "
+              f"{c['unfinished']} belum selesai" + (f", {len(failed)} CSV tidak selesai" if failed else ""))
+    print(summary.line(started))
+    failed_csv = any(st != "done" for st, _ in results.values())
+    return 1 if failed_csv or total["error"] or total["unfinished"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
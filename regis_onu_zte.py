@@ -1,143 +1,861 @@
-import csv, os, time, threading, re
+import csv, json, os, time, threading, re, socket, queue
+from collections import Counter, namedtuple
 import paramiko
+import metrics
+import transcript
+from events import bus
+from journal import csv_journal_id, get_journal, onu_key
+from onu_csv import group_by_port, read_onu_csv
+from plan import load_or_compile
+from result_store import FIELDNAMES, get_store, key_of as _key_of
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ===================== KONFIGURASI DASAR =====================
-SEND_DELAY_SEC        = 0.1      # jeda antar baris command
-READ_WINDOW_SEC       = 1       # waktu baca tiap baris
+PROMPT_TIMEOUT_SEC    = 10       # max diam (tanpa data) saat menunggu prompt
+SHOW_TIMEOUT_SEC      = 20       # timeout untuk perintah show
+WRITE_TIMEOUT_SEC     = 30       # 'write' ke flash bisa >10 detik
+WRITE_IDLE_SEC        = 20       # tidak ada perubahan config selama ini → write (jendela idle)
+WRITE_MAX_DIRTY_SEC   = 300      # perubahan tertua belum tersimpan selama ini → write walau OLT masih sibuk
+WRITE_RETRY_SEC       = 30       # write gagal → coba lagi setelah jeda ini
 LOG_CSV               = "hasil_registrasi.csv"
+PROBE_CACHE           = "olt_probe.json"  # hostname / model / paging per OLT, dipakai ulang antar proses job
+PROBE_TTL_SEC         = 86400    # probe lebih tua dari ini diulang (mis. upgrade firmware)
+
+BATCH_SIZE            = 32       # ukuran batch register awal, lalu diatur RegisterPacer
+REGISTER_BATCH_MIN    = 8        # batch register terkecil saat OLT lambat
+REGISTER_BATCH_STEP   = 8        # tambahan ukuran batch setelah batch yang sehat
+REGISTER_BATCH_MAX    = {        # batas atas batch register per model OLT
+    "C300": 32, "C320": 32,
+    "C600": 64, "C610": 64, "C620": 64, "C650": 64,
+}
+REGISTER_BATCH_MAX_DEFAULT = 32  # model tidak dikenal → sama dengan batch lama
+REGISTER_DELAY_STEP_SEC = 0.5    # jeda pertama saat OLT mulai lambat (lalu ×2)
+REGISTER_DELAY_MAX_SEC  = 8      # jeda antar batch terlama
+REGISTER_COMMIT_LAG_SEC = 30     # ONU terkirim belum muncul selama ini → OLT tertinggal commit
+REGISTER_FLUSH_EVERY  = 96       # commit tertinggal → write dipercepat (WriteCoordinator), maks tiap N ONU
+CONFIG_BATCH_SIZE     = 8        # jumlah ONU per kiriman config (1 = per ONU seperti dulu)
+MAX_COMMIT_WAIT_SEC   = 210      # max tunggu commit (termasuk re-check)
+COMMIT_POLL_MIN_SEC   = 1        # interval polling commit awal / setelah ada progres
+COMMIT_POLL_MAX_SEC   = 10       # batas backoff polling kalau commit macet
+COMMIT_POLL_BACKOFF   = 1.5
+ONU_STATE_SHARED_PORTS = 2      # ≥ sekian port polling commit bersamaan → satu 'show gpon onu state' OLT-wide
+COMMIT_EVENTS_CSV     = "commit_events.csv"  # latency commit per ONU
+MAX_SESSIONS_PER_OLT  = 4        # batas session SSH bersamaan per OLT (semua port)
+CONFIG_WORKERS_START  = 2        # session config awal per OLT, lalu diatur AIMD (lihat AdaptiveConcurrency)
+AIMD_LATENCY_FACTOR   = 2.0      # latency per perintah > N × baseline → OLT mulai berat
+AIMD_ERROR_RATE       = 0.1      # fraksi baris %Error per kiriman yang dianggap overload
+AIMD_DECREASE         = 0.5      # faktor pengali batas session saat overload
+AIMD_COOLDOWN_SEC     = 5        # maks satu kali turun per jendela (satu kejadian → satu kali turun)
+CONNECT_RETRIES       = 3        # percobaan buka session kalau ditolak OLT
+KEEPALIVE_SEC         = 15       # keepalive transport SSH bersama
+TRANSPORT_IDLE_SEC    = 60       # transport ditutup kalau idle selama ini
+UNREG_MODE            = "reconcile"  # "reconcile" = diff tabel ONU vs CSV, "wipe" = no onu 1–128
+CONFIG_MODE           = "full"   # "full" = kirim block lengkap, "diff" = hanya baris yang beda dari running-config
+CONFIG_REPLACE_FIRST  = ("service-port",)  # baris beda nilai yang harus di-"no" dulu sebelum dikirim ulang
+# Format tampilan running-config OLT yang beda dari perintah yang dikirim → disamakan sebelum dibandingkan
+CONFIG_SHOW_FORMATS = [
+    # 'tcont 1 name T1 profile 10M' (nama otomatis di beberapa firmware) = 'tcont 1 profile 10M'
+    (re.compile(r"^(tcont \d+) name \S+ (profile \S+)$"), r"\1 \2"),
+    # 'gemport 1 name G1 unicast tcont 1 dir both' (C300 v1.x) = 'gemport 1 tcont 1'
+    (re.compile(r"^(gemport \d+)(?: name \S+)?(?: unicast)? (tcont \d+)(?: dir both)?$"), r"\1 \2"),
+]
+# nilai rahasia: running-config menampilkannya tersamar/terenkripsi → yang dibandingkan hanya bagian lain baris
+# (mode, username, vlan); 'password xxx' disamakan jadi 'password *' di kedua sisi
+CONFIG_SECRET_RE = re.compile(r"\b(password) \S+")
+CONFIG_RESEND_SECRETS = False  # True (atau cfg["config_resend_secrets"]) → baris berisi password selalu dikirim
+
+
+class PortProgress(dict):
+    """Progress satu port; setiap perubahan field langsung dipublish ke event bus (SSE)."""
+
+    def __init__(self, interface, data):
+        super().__init__(data)
+        self.interface = interface
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        bus.publish("progress", {"interface": self.interface, **self})
+
+
+class ProgressDict(dict):
+    """progress_dict[interface] = {...} otomatis dibungkus PortProgress + dipublish."""
+
+    def __setitem__(self, interface, data):
+        super().__setitem__(interface, PortProgress(interface, data))
+        bus.publish("progress", {"interface": interface, **data})
 
-BATCH_SIZE            = 32       # jumlah ONU per batch
-BATCH_DELAY_SEC       = 2        # jeda antar batch
-MAX_COMMIT_WAIT_SEC   = 180      # max tunggu commit
-COMMIT_POLL_SEC       = 10       # interval polling commit
 
 progress_lock = threading.Lock()
-progress_dict = {}
+progress_dict = ProgressDict()
 # =============================================================
 
 
+# ------------------------ PEMBATALAN -------------------------
+class JobCancelled(Exception):
+    """Job dibatalkan operator (cfg["cancel"] berupa threading.Event yang di-set)."""
+
+
+def cancelled(cfg):
+    ev = cfg.get("cancel")
+    return ev is not None and ev.is_set()
+
+
+def check_cancel(cfg):
+    """Dipanggil di batas batch/port: berhenti rapi tanpa memotong block di tengah."""
+    if cancelled(cfg):
+        raise JobCancelled("Job dibatalkan")
+
+
 # ---------------------- UTIL LOG / CSV -----------------------
-def _key_of(row):
-    return (row.get("interface","").strip(),
-            row.get("onu_id","").strip(),
-            row.get("sn","").strip())
-
-def load_status_map(log_path: str):
-    status_map = {}
-    if not os.path.exists(log_path):
-        return status_map
-    with open(log_path, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            status_map[_key_of(row)] = row.get("status","").lower()
-    return status_map
-
-def append_log(lock, path, row_dict):
-    with lock:
-        rows = []
-        if os.path.exists(path):
-            with open(path, newline="", encoding="utf-8") as f:
-                rows = list(csv.DictReader(f))
-
-        updated = False
-        for r in rows:
-            if _key_of(r) == (_key_of(row_dict)):
-                r.update(row_dict)
-                updated = True
-                break
-
-        if not updated:
-            rows.append(row_dict)
-
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            fieldnames = ["interface", "onu_id", "sn", "name", "status", "message"]
-            w = csv.DictWriter(f, fieldnames=fieldnames)
-            w.writeheader()
-            w.writerows(rows)
-            f.flush()
+def result_store():
+    return get_store(LOG_CSV)
+
+def load_status_map(log_path: str = LOG_CSV):
+    return get_store(log_path).status_map()
+
+def append_log(row_dict, path=LOG_CSV):
+    with metrics.RESULT_WRITE_SECONDS.time(interface=row_dict.get("interface", "")):
+        get_store(path).upsert(row_dict)
+    bus.publish("onu", {k: str(row_dict.get(k, "") or "") for k in FIELDNAMES})
+
+def append_logs(rows, path=LOG_CSV):
+    for row in rows:
+        append_log(row, path)
+
+def result_rows(rows, status, message):
+    """Row hasil (append_log) untuk beberapa ONU dengan status & pesan yang sama."""
+    return [{"interface": r["interface"], "onu_id": r["onu_id"].strip(), "sn": r["sn"],
+             "name": r.get("name", ""), "status": status, "message": message} for r in rows]
 
 
 # ---------------------- SSH / CLI HELPER ---------------------
-def ssh_connect(cfg):
-    cli = paramiko.SSHClient()
-    cli.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    cli.connect(cfg["host"], port=cfg["port"], username=cfg["user"], password=cfg["pass"], look_for_keys=False)
-    sh = cli.invoke_shell()
-    time.sleep(0.5)
-    if sh.recv_ready():
-        _ = sh.recv(65535)
-    return cli, sh
-
-
-def send_block(shell, block, delay=0.3, read_window=3):
-    if not block.endswith("\n"):
-        block += "\n"
-    shell.send(block)
-    time.sleep(delay)
-    out = []
-    end = time.time() + read_window
-    last_data = time.time()
-
-    while time.time() < end:
-        time.sleep(0.1)
-        while shell.recv_ready():
-            chunk = shell.recv(65535).decode(errors="ignore")
-            out.append(chunk)
-            last_data = time.time()
-            if "#" in chunk:
-                return "".join(out)
-        if time.time() - last_data > 0.8:  # tidak ada data baru → lanjut
-            break
-    return "".join(out)
+# Prompt ZTE: ZXAN#, ZXAN(config)#, ZXAN(config-if)#, ZXAN(gpon-onu-mng)#
+PROMPT_RE = re.compile(r"^([\w.\-]+)(\([^()\r\n]*\))?#")
+PROMPT_END_RE = re.compile(r"^([\w.\-]+)(\([^()\r\n]*\))?#[ \t]*$")
+MORE_RE = re.compile(r"-+ ?More ?-+")
+ERROR_RE = re.compile(r"%\s*Error|Invalid")
+ONU_SECTION_RE = re.compile(r"^(interface|pon-onu-mng)\s+(gpon-onu_\S+)$")
+
+
+_budget_lock = threading.Lock()
+_session_budgets = {}
+
+
+def olt_label(cfg):
+    """Label OLT untuk metrics (host:port, sama dengan kunci session budget)."""
+    return f"{cfg['host']}:{int(cfg.get('port', 22))}"
+
+
+def journal_id(cfg):
+    """Kunci command journal run ini (diisi main: job id atau OLT + hash CSV)."""
+    return cfg.get("journal_id") or olt_label(cfg)
+
+
+def with_journal(cfg, csv_path):
+    """cfg + journal_id; run ulang CSV yang sama ke OLT yang sama melanjutkan journal yang sama."""
+    if cfg.get("journal_id"):
+        return cfg
+    return dict(cfg, journal_id=csv_journal_id(cfg, csv_path))
+
+
+def with_plan(cfg, csv_path):
+    """cfg + plan hasil compile (cache plans/<key>.json); retry / run ulang CSV sama tidak compile ulang."""
+    if cfg.get("plan"):
+        return cfg
+    plan, cached = load_or_compile(csv_path, cfg)
+    print(f"📋 Plan {plan.key[:12]} ({'cache' if cached else 'compile baru'})")
+    return dict(cfg, plan=plan)
+
+
+def session_budget(cfg):
+    """
+    Semaphore global per OLT (host:port) untuk membatasi total session SSH
+    dari semua port & worker di proses ini. Batas diambil dari cfg["max_sessions"]
+    saat OLT pertama kali dipakai.
+    """
+    key = (cfg["host"], int(cfg.get("port", 22)))
+    with _budget_lock:
+        if key not in _session_budgets:
+            limit = int(cfg.get("max_sessions") or MAX_SESSIONS_PER_OLT)
+            _session_budgets[key] = threading.BoundedSemaphore(limit)
+        return _session_budgets[key]
+
+
+class AdaptiveConcurrency:
+    """
+    Batas session config aktif per OLT (semua port), diatur AIMD dari feedback tiap kiriman:
+    - sehat (tanpa timeout, %Error ≤ AIMD_ERROR_RATE, latency per perintah ≤ AIMD_LATENCY_FACTOR × baseline)
+      → naik +1/limit, ≈ +1 session setelah semua session aktif mengirim satu kali
+    - overload (prompt timeout, reconnect, session ditolak, latency / %Error tinggi)
+      → limit × AIMD_DECREASE (min 1), maks sekali per AIMD_COOLDOWN_SEC
+    - batas atas = ceiling; worker di atas batas melepas session & antri slot lagi
+    """
+
+    def __init__(self, label, ceiling, start=CONFIG_WORKERS_START):
+        self.label = label
+        self.ceiling = max(1, ceiling)
+        self.limit = float(min(start, self.ceiling))
+        self.active = 0
+        self.baseline = None  # latency per perintah terbaik yang pernah terlihat
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        metrics.CONFIG_CONCURRENCY.set(self.current, olt=label)
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    def try_acquire(self):
+        with self._cond:
+            if self.active < int(self.limit):
+                self.active += 1
+                return True
+            return False
+
+    def acquire(self, cfg=None):
+        """Tunggu slot session config. False kalau job dibatalkan selama menunggu."""
+        with self._cond:
+            while self.active >= int(self.limit):
+                if cancelled(cfg):
+                    return False
+                self._cond.wait(1)
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def over_limit(self):
+        with self._cond:
+            return self.active > int(self.limit)
+
+    def record(self, seconds, commands, errors=0, timeout=False):
+        """Feedback satu kiriman: durasi sampai prompt terakhir, jumlah baris, baris %Error, prompt hilang."""
+        per_cmd = seconds / max(1, commands)
+        with self._cond:
+            # baseline naik pelan supaya satu sampel kebetulan cepat tidak mengunci baseline selamanya
+            self.baseline = per_cmd if self.baseline is None else min(per_cmd, self.baseline * 1.005)
+            if timeout:
+                reason = "timeout"
+            elif errors / max(1, commands) > AIMD_ERROR_RATE:
+                reason = "error"
+            elif per_cmd > self.baseline * AIMD_LATENCY_FACTOR:
+                reason = "latency"
+            else:
+                reason = None
+        if reason:
+            self.congestion(reason)
+        else:
+            self._increase()
+
+    def congestion(self, reason):
+        """Sinyal overload dari luar record() (reconnect, session ditolak)."""
+        with self._cond:
+            now = time.time()
+            if now - self._last_decrease < AIMD_COOLDOWN_SEC:
+                return
+            self._last_decrease = now
+            before = self.current
+            self.limit = max(1.0, self.limit * AIMD_DECREASE)
+            changed = self.current != before
+        metrics.CONFIG_CONCURRENCY_CHANGES.inc(olt=self.label, reason=reason)
+        if changed:
+            metrics.CONFIG_CONCURRENCY.set(self.current, olt=self.label)
+            print(f"📉 {self.label}: session config {before} → {self.current} ({reason})")
+
+    def _increase(self):
+        with self._cond:
+            before = self.current
+            self.limit = min(float(self.ceiling), self.limit + 1 / self.limit)
+            changed = self.current != before
+            if changed:
+                self._cond.notify_all()
+        if changed:
+            metrics.CONFIG_CONCURRENCY_CHANGES.inc(olt=self.label, reason="up")
+            metrics.CONFIG_CONCURRENCY.set(self.current, olt=self.label)
+            print(f"📈 {self.label}: session config {before} → {self.current}")
+
+
+_controllers = {}
+
+
+def concurrency_controller(cfg):
+    """
+    AdaptiveConcurrency per OLT di proses ini. Ceiling = cfg["config_workers_max"]
+    (default & maksimal = max_sessions, karena tiap session config memakai slot budget).
+    """
+    key = (cfg["host"], int(cfg.get("port", 22)))
+    with _budget_lock:
+        if key not in _controllers:
+            max_sessions = int(cfg.get("max_sessions") or MAX_SESSIONS_PER_OLT)
+            ceiling = min(int(cfg.get("config_workers_max") or max_sessions), max_sessions)
+            _controllers[key] = AdaptiveConcurrency(olt_label(cfg), ceiling)
+        return _controllers[key]
+
+
+class WriteCoordinator:
+    """
+    Satu 'write' (simpan config ke flash) per OLT untuk semua port & job di proses ini.
+    - mark_dirty(): dipanggil setelah block yang mengubah config di-ack, tidak pernah blok
+    - write dijalankan thread latar di session sendiri saat: idle WRITE_IDLE_SEC, perubahan
+      tertua > WRITE_MAX_DIRTY_SEC, request() (mis. commit tertinggal), atau flush() di akhir job
+    - session lain tetap jalan selama write; tidak ada reconnect
+    - perubahan yang masuk selama write berjalan tetap dirty untuk write berikutnya
+    """
+
+    def __init__(self, cfg):
+        # hanya data koneksi: cfg job (cancel, plan) tidak ikut, coordinator dipakai banyak job
+        self.cfg = {k: cfg[k] for k in ("host", "port", "user", "pass", "max_sessions") if k in cfg}
+        self.label = olt_label(cfg)
+        self._cond = threading.Condition()
+        self._gen = 0            # naik setiap mark_dirty()
+        self._saved = 0          # gen yang sudah tersimpan ke flash
+        self._first_dirty = None
+        self._last_dirty = None
+        self._requested = None   # alasan write dipercepat
+        self._writing = False
+        self._failed_at = 0.0
+        self._thread = None
+
+    @property
+    def dirty(self):
+        return self._gen != self._saved
+
+    def mark_dirty(self):
+        with self._cond:
+            now = time.time()
+            if not self.dirty:
+                self._first_dirty = now
+            self._gen += 1
+            self._last_dirty = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def request(self, reason):
+        """Minta write secepatnya (tetap satu write untuk semua yang meminta)."""
+        with self._cond:
+            if self.dirty:
+                self._requested = reason
+                self._cond.notify_all()
+
+    def flush(self, timeout=WRITE_TIMEOUT_SEC * 3):
+        """Akhir job: write kalau masih ada perubahan & tunggu tersimpan. Return False kalau gagal/timeout."""
+        with self._cond:
+            target, started = self._gen, time.time()
+            if self._saved >= target:
+                return True
+            self._requested = "flush"
+            self._failed_at = 0.0  # akhir job tidak menunggu jeda retry
+            self._cond.notify_all()
+            while self._saved < target:
+                if self._failed_at > started or time.time() - started > timeout:
+                    return False
+                self._cond.wait(1)
+            return True
+
+    def _due(self, now):
+        if not self.dirty or self._writing:
+            return None
+        if now - self._failed_at < WRITE_RETRY_SEC:
+            return None
+        if self._requested:
+            return self._requested
+        if now - self._last_dirty >= WRITE_IDLE_SEC:
+            return "idle"
+        if now - self._first_dirty >= WRITE_MAX_DIRTY_SEC:
+            return "max_age"
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                reason = self._due(time.time())
+                while reason is None:
+                    self._cond.wait(1)
+                    reason = self._due(time.time())
+                self._requested = None
+                self._writing = True
+                target, started = self._gen, time.time()
+            ok = self._write(reason)
+            with self._cond:
+                self._writing = False
+                if ok:
+                    self._saved = max(self._saved, target)
+                    if self.dirty:
+                        self._first_dirty = started  # perubahan selama write: umur dihitung dari mulai write
+                else:
+                    self._failed_at = time.time()
+                self._cond.notify_all()
+
+    def _write(self, reason):
+        print(f"💾 {self.label}: write ({reason})...")
+        t0 = time.perf_counter()
+        try:
+            cli, sh = ssh_connect(self.cfg)
+        except Exception as e:
+            print(f"❌ {self.label}: gagal buka session untuk write ({e})")
+            metrics.OLT_WRITES.inc(olt=self.label, reason="failed")
+            return False
+        try:
+            enter_exec(sh)
+            out = send_block(sh, "write", timeout=WRITE_TIMEOUT_SEC)
+        except Exception as e:
+            out = f"{e}"
+        finally:
+            cli.close()
+        transcript.log(self.label, "write", f"WRITE {self.label} ({reason})", out)
+        ok = bool(split_by_prompt(out)) and not ERROR_RE.search(out)
+        metrics.OLT_WRITES.inc(olt=self.label, reason=reason if ok else "failed")
+        if ok:
+            metrics.OLT_WRITE_SECONDS.observe(time.perf_counter() - t0, olt=self.label)
+            print(f"✅ {self.label}: konfigurasi tersimpan ke flash.")
+        else:
+            print(f"⚠️ {self.label}: write gagal, dicoba lagi dalam {WRITE_RETRY_SEC}s.")
+        return ok
+
+
+_writers = {}
+
+
+def write_coordinator(cfg):
+    key = (cfg["host"], int(cfg.get("port", 22)))
+    with _budget_lock:
+        if key not in _writers:
+            _writers[key] = WriteCoordinator(cfg)
+        return _writers[key]
+
+
+def mark_dirty(cfg):
+    """Config OLT berubah (block di-ack); dicatat hanya kalau auto_write aktif."""
+    if cfg.get("auto_write"):
+        write_coordinator(cfg).mark_dirty()
+
+
+def finish_writes(cfg):
+    """Akhir job: satu write untuk semua perubahan yang belum tersimpan (atau pesan mode manual)."""
+    if not cfg.get("auto_write"):
+        print("⚠️ 'write' dilewati (manual mode). Jalankan 'write' di CLI OLT setelah verifikasi.")
+        return
+    if not write_coordinator(cfg).flush():
+        print("⚠️ Write akhir job gagal/timeout. Jalankan 'write' di CLI OLT secara manual.")
+
+
+class OltConnectionManager:
+    """
+    Satu transport SSH (TCP + key exchange + login) per OLT, dipakai bersama semua worker.
+    - tiap worker dapat channel shell sendiri lewat open_shell()
+    - keepalive + health check; login ulang hanya kalau transport benar-benar mati
+    - transport ditutup kalau tidak ada channel selama TRANSPORT_IDLE_SEC
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._client = None
+        self._channels = 0
+        self._idle_timer = None
+
+    def _transport(self):
+        """Transport yang masih hidup; login ulang kalau mati. Dipanggil dengan _lock dipegang."""
+        t = self._client.get_transport() if self._client else None
+        if t is not None and t.is_active():
+            return t
+        if self._client:
+            self._client.close()
+            self._client = None
+        cli = paramiko.SSHClient()
+        cli.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        cli.connect(self.cfg["host"], port=self.cfg["port"], username=self.cfg["user"],
+                    password=self.cfg["pass"], look_for_keys=False)
+        cli.get_transport().set_keepalive(KEEPALIVE_SEC)
+        self._client = cli
+        self.logins += 1
+        metrics.SSH_LOGINS.inc(olt=olt_label(self.cfg))
+        return cli.get_transport()
+
+    def open_shell(self):
+        with self._lock:
+            if self._idle_timer:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            try:
+                chan = self._transport().open_session(timeout=PROMPT_TIMEOUT_SEC)
+            except paramiko.ChannelException:
+                raise  # transport sehat, OLT menolak channel baru
+            except (paramiko.SSHException, EOFError, OSError):
+                if self._client is None:
+                    raise  # login baru yang gagal (host tidak bisa dihubungi / auth) → error aslinya
+                # transport kelihatan aktif tapi koneksi sudah putus → login ulang sekali
+                self._client.close()
+                self._client = None
+                chan = self._transport().open_session(timeout=PROMPT_TIMEOUT_SEC)
+            self._channels += 1
+
+        chan.olt = olt_label(self.cfg)  # label metrics untuk send_block/read_until_prompt
+        try:
+            chan.get_pty()
+            chan.invoke_shell()
+            _, prompt = read_until_prompt(chan)  # buang banner sampai prompt pertama
+            note_prompt(chan, prompt)
+            if prompt:
+                update_probe(chan.olt, hostname=PROMPT_RE.match(prompt).group(1))
+        except Exception:
+            chan.close()
+            self.release()
+            raise
+        return chan
+
+    def release(self):
+        """Dipanggil saat satu channel ditutup."""
+        with self._lock:
+            self._channels -= 1
+            if self._channels == 0 and self._client is not None:
+                self._idle_timer = threading.Timer(TRANSPORT_IDLE_SEC, self._close_if_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    def _close_if_idle(self):
+        with self._lock:
+            if self._channels == 0 and self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+_managers = {}
+
+
+def connection_manager(cfg):
+    key = (cfg["host"], int(cfg.get("port", 22)), cfg["user"])
+    with _budget_lock:
+        if key not in _managers:
+            _managers[key] = OltConnectionManager(cfg)
+        return _managers[key]
+
+
+class OltLease:
+    """
+    Pengganti SSHClient untuk caller: close() menutup channel milik worker ini
+    dan melepas slot session budget. Transport SSH tetap hidup untuk worker lain.
+    """
+
+    def __init__(self, manager, channel, budget):
+        self._manager = manager
+        self._channel = channel
+        self._budget = budget
+        self._closed = False
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._channel.close()
+        finally:
+            self._manager.release()
+            self._budget.release()
+
+
+def ssh_connect(cfg, retries=CONNECT_RETRIES):
+    olt = olt_label(cfg)
+    t0 = time.perf_counter()
+    budget = session_budget(cfg)
+    with metrics.SSH_SESSION_WAIT_SECONDS.time(olt=olt):
+        budget.acquire()  # tunggu slot kalau OLT sudah penuh session
+    manager = connection_manager(cfg)
+    try:
+        for attempt in range(1, retries + 1):
+            try:
+                sh = manager.open_shell()
+                metrics.SSH_CONNECT_SECONDS.observe(time.perf_counter() - t0, olt=olt)
+                return OltLease(manager, sh, budget), sh
+            except paramiko.SSHException as e:
+                # OLT kadang masih menghitung session lama yang baru ditutup → tolak sebentar
+                concurrency_controller(cfg).congestion("rejected")
+                if attempt == retries:
+                    raise
+                print(f"⚠️ Session ditolak OLT ({e}), coba lagi {attempt}/{retries - 1}...")
+                time.sleep(attempt)
+    except Exception:
+        budget.release()
+        raise
+
+
+class PromptTracker:
+    """
+    Hitung prompt ZTE dari output yang masuk sedikit-sedikit.
+    Dipakai reader sync (read_until_prompt) dan async (async_engine).
+    feed() return: "more" → kirim spasi ('--More--'), "done" → prompt terakhir sudah muncul.
+    """
+
+    def __init__(self, prompts=1, sink=None):
+        self.prompts = prompts
+        self.sink = sink     # callable(teks): baris lengkap diteruskan begitu masuk (parser streaming)
+        self.out = ""
+        self.prompt = None
+        self._seen = 0       # jumlah prompt di baris yang sudah lengkap
+        self._scanned = 0    # posisi awal baris yang belum dihitung
+
+    def feed(self, data):
+        self.out += data.decode(errors="ignore").replace("\x08", "")
+
+        # hitung prompt di baris yang sudah lengkap (prompt + echo perintah)
+        last_nl = self.out.rfind("\n") + 1
+        if last_nl > self._scanned:
+            chunk = self.out[self._scanned:last_nl]
+            for line in chunk.splitlines():
+                if PROMPT_RE.match(line.strip("\r ")):
+                    self._seen += 1
+            self._scanned = last_nl
+            if self.sink:
+                self.sink(chunk)
+
+        tail = self.out[last_nl:]
+        if MORE_RE.search(tail):
+            self.out = self.out[:last_nl]  # buang marker '--More--'
+            return "more"
+
+        m = PROMPT_END_RE.match(tail.strip("\r "))
+        if m and self._seen + 1 >= self.prompts:
+            self.prompt = m.group(0).strip()
+            return "done"
+        return None
+
+
+def read_until_prompt(shell, prompts=1, timeout=PROMPT_TIMEOUT_SEC, sink=None):
+    """
+    Expect-style reader: baca output sampai prompt ke-`prompts` muncul di akhir buffer.
+    - recv() blocking dengan timeout, tanpa sleep-polling
+    - timeout dihitung sejak data terakhir diterima (output panjang tetap aman)
+    - '--More--' otomatis dijawab spasi
+    - sink: menerima baris lengkap selama output masih mengalir (lihat PromptTracker)
+    Return (output, prompt_terakhir) — prompt None kalau timeout / channel tertutup.
+    """
+    tracker = PromptTracker(prompts, sink)
+    shell.settimeout(timeout)
+    received = 0
+
+    try:
+        while True:
+            try:
+                data = shell.recv(65535)
+            except socket.timeout:
+                return tracker.out, None
+            if not data:
+                return tracker.out, None
+            received += len(data)
+            state = tracker.feed(data)
+            if state == "more":
+                shell.send(" ")
+                more_prompt(shell)
+            elif state == "done":
+                return tracker.out, tracker.prompt
+    finally:
+        metrics.BYTES_RECEIVED.inc(received, olt=getattr(shell, "olt", ""))
+
+
+def more_prompt(shell):
+    """'--More--' muncul: paging ternyata masih aktif → dimatikan lagi di enter_exec/enter_config berikutnya."""
+    shell.paging_off = False
+    metrics.MORE_PROMPTS.inc(olt=getattr(shell, "olt", ""))
+
+
+def send_block(shell, block, timeout=PROMPT_TIMEOUT_SEC, sink=None):
+    """
+    Kirim block perintah lalu tunggu sampai prompt untuk baris terakhir kembali.
+    Baris kosong dibuang supaya jumlah prompt yang ditunggu = jumlah baris.
+    """
+    lines = [l for l in block.splitlines() if l.strip()]
+    if not lines:
+        return ""
+
+    # sisa output lama (mis. setelah timeout) jangan ikut terhitung sebagai prompt
+    while shell.recv_ready():
+        shell.recv(65535)
+
+    olt = getattr(shell, "olt", "")
+    with metrics.PROMPT_WAIT_SECONDS.time(olt=olt):
+        shell.send("\n".join(lines) + "\n")
+        out, prompt = read_until_prompt(shell, prompts=len(lines), timeout=timeout, sink=sink)
+    note_prompt(shell, prompt)
+    if prompt is None:
+        metrics.PROMPT_TIMEOUTS.inc(olt=olt)
+    return out
+
+
+def split_by_prompt(out):
+    """
+    Pecah output send_block per perintah: segmen ke-i = output sebelum prompt ke-i
+    (echo + respon perintah ke-i). Jumlah segmen < jumlah baris → prompt tidak kembali.
+    """
+    segments, cur = [], []
+    for line in out.splitlines():
+        if PROMPT_RE.match(line.strip("\r ")):
+            segments.append(cur)
+            cur = [line]
+        else:
+            cur.append(line)
+    return segments
+
+
+# ------------------- MODE CLI & PROBE OLT --------------------
+_probes = None
+_probe_lock = threading.Lock()
+
+
+def _read_probes():
+    try:
+        with open(PROBE_CACHE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def olt_probe(label):
+    """Hasil probe OLT (host:port) yang masih berlaku: {"hostname", "model", "paging"}; {} kalau belum."""
+    global _probes
+    with _probe_lock:
+        if _probes is None:
+            _probes = _read_probes()
+        p = _probes.get(label, {})
+        return dict(p) if time.time() - p.get("at", 0) < PROBE_TTL_SEC else {}
+
+
+def update_probe(label, **fields):
+    """Simpan hasil probe (hanya kalau berubah) ke memori & PROBE_CACHE (atomic, digabung dengan proses lain)."""
+    global _probes
+    with _probe_lock:
+        if _probes is None:
+            _probes = _read_probes()
+        p = _probes.get(label, {})
+        if time.time() - p.get("at", 0) < PROBE_TTL_SEC and all(p.get(k) == v for k, v in fields.items()):
+            return
+        _probes = {**_read_probes(), **_probes}
+        p = dict(_probes.get(label, {}) if time.time() - p.get("at", 0) < PROBE_TTL_SEC else {}, **fields)
+        p["at"] = time.time()
+        _probes[label] = p
+        tmp = f"{PROBE_CACHE}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_probes, f)
+            os.replace(tmp, PROBE_CACHE)
+        except OSError as e:
+            print(f"⚠️ Gagal simpan {PROBE_CACHE}: {e}")
+
+
+def prompt_mode(prompt):
+    """'ZXAN#' → "exec", 'ZXAN(config)#' → "config", sub-mode lain → "sub", None kalau bukan prompt."""
+    m = PROMPT_RE.match(prompt or "")
+    if not m:
+        return None
+    if not m.group(2):
+        return "exec"
+    return "config" if m.group(2) == "(config)" else "sub"
+
+
+def note_prompt(shell, prompt):
+    """Catat mode CLI session dari prompt terakhir (None = tidak jelas, mis. timeout)."""
+    shell.mode = prompt_mode(prompt)
+
+
+def mode_commands(shell, target):
+    """
+    Perintah minimal dari mode sekarang (prompt terakhir) ke target "exec" / "config":
+    - mode tidak diketahui → urutan lengkap (enable, terminal length 0, configure terminal)
+    - paging dimatikan sekali per session, dilewati kalau OLT menolak 'terminal length 0'
+    """
+    mode = getattr(shell, "mode", None)
+    paging_ok = olt_probe(getattr(shell, "olt", "")).get("paging", True)
+    paging = [] if getattr(shell, "paging_off", False) or not paging_ok else ["terminal length 0"]
+    if target == "config" and mode == "config" and not paging:
+        return []
+    if target == "exec" and mode == "exec":
+        return paging
+    cmds = {None: ["enable"], "exec": []}.get(mode, ["end"]) + paging
+    return cmds + (["configure terminal"] if target == "config" else [])
+
+
+def note_mode_commands(shell, cmds, out):
+    """Setelah mode_commands dikirim: catat apakah paging sudah mati (dan apakah OLT mendukungnya)."""
+    olt = getattr(shell, "olt", "")
+    metrics.MODE_COMMANDS.inc(len(cmds), olt=olt)
+    if "terminal length 0" not in cmds:
+        return
+    i = cmds.index("terminal length 0")
+    segments = split_by_prompt(out)
+    if i >= len(segments):
+        return  # prompt tidak kembali → status paging tidak jelas, coba lagi di enter berikutnya
+    ok = not any(ERROR_RE.search(l) for l in segments[i][1:])  # segmen ke-i = echo + respon perintah ke-i
+    shell.paging_off = ok
+    update_probe(olt, paging=ok)
+
+
+def enter_mode(shell, target):
+    cmds = mode_commands(shell, target)
+    if cmds:
+        note_mode_commands(shell, cmds, send_block(shell, "\n".join(cmds)))  # satu read window
 
 
 def enter_exec(shell):
-    send_block(shell, "enable")
-    send_block(shell, "terminal length 0")
+    enter_mode(shell, "exec")
+
 
 def enter_config(shell):
-    send_block(shell, "enable")
-    send_block(shell, "configure terminal")
-    time.sleep(0.2)
+    enter_mode(shell, "config")
 
 
 # ----------------- BLOCK BUILDER (REGISTER/CONFIG) -----------
-def build_register_block(rows, onu_type="ALL"):
+def register_lines(row, onu_type="ALL"):
+    """Baris registrasi satu ONU (di dalam mode 'interface gpon-olt_x'); row = OnuRow (sudah di-strip)."""
+    onu_id = row["onu_id"]
+    sn = row["sn"]
+    name = row["name"]
+    lines = [f"onu {onu_id} type {onu_type} sn {sn}"]
+    if name:
+        lines.append(f"name {onu_id} {name}")  # opsional: kalau mau kasih label nama
+    return lines
+
+
+def build_register_block(rows, onu_type="ALL", plan=None):
     """
     Membangun perintah registrasi ONU berdasarkan daftar CSV.
-    Asumsi: ONU sudah dihapus sebelumnya (no onu 1–128 dilakukan di awal).
+    Asumsi: ID yang dipakai sudah kosong (hasil reconcile/unreg di awal process_register).
+    - plan: baris per ONU diambil dari plan hasil compile (plan.py), fallback build langsung
     """
     if not rows:
         return ""
 
-    interface = rows[0]["interface"].strip()
+    interface = rows[0]["interface"]
     cmds = [f"interface {interface}"]
 
     for r in rows:
-        onu_id = r["onu_id"].strip()
-        sn = r["sn"].strip()
-        name = r.get("name", "")
-        cmds.append(f"onu {onu_id} type {onu_type} sn {sn}")
-        if name:
-            cmds.append(f"name {onu_id} {name}")  # opsional: kalau mau kasih label nama
+        cmds += (plan and plan.register_lines(r)) or register_lines(r, onu_type)
 
     cmds.append("exit")
     return "\n".join(cmds)
 
 
+def onu_interface(row):
+    """gpon-olt_1/2/6 + onu_id 5 → gpon-onu_1/2/6:5"""
+    return f"gpon-onu_{row['interface'].split('_')[1]}:{row['onu_id']}"
+
+
 def build_config_block(row, vlan_prefix):
-    interface = row["interface"].strip()
-    onu_id = row["onu_id"].strip()
-    name = row.get("name","").strip().replace(" ", "_")
-    desc = row.get("description","").strip()
-    profile = row.get("profile","").strip()
-    username = row.get("username","").strip()
-    password = row.get("password","").strip()
-    vlan_inet = row.get("vlan_inet","").strip()
-    vlan_hot  = row.get("vlan_hotspot","").strip()
-    ssid = row.get("wifi_ssid","").strip()
-
-    onu_iface = f"gpon-onu_{interface.split('_')[1]}:{onu_id}"
+    """Block config satu ONU; row = OnuRow (nilai sudah di-strip & divalidasi onu_csv)."""
+    name = row["name"].replace(" ", "_")
+    desc = row["description"]
+    profile = row["profile"]
+    username = row["username"]
+    password = row["password"]
+    vlan_inet = row["vlan_inet"]
+    vlan_hot  = row["vlan_hotspot"]
+    ssid = row["wifi_ssid"]
+
+    onu_iface = onu_interface(row)
     vlan_prof = f"{vlan_prefix}{vlan_inet}"
 
     return f"""
@@ -163,423 +881,1198 @@ exit
 """.strip()+"\n"
 
 
-# -------------------- VERIFIKASI COMMIT OLT ------------------
-def parse_onu_ids_from_show(output: str) -> set:
+def config_lines(row, vlan_prefix):
+    """Block config satu ONU sebagai list baris (tanpa baris kosong) — 1 baris = 1 prompt."""
+    return [l for l in build_config_block(row, vlan_prefix).splitlines() if l.strip()]
+
+
+def running_config_query(rows):
+    """Perintah baca running-config semua ONU di rows — dikirim sekaligus (satu read window)."""
+    cmds = []
+    for r in rows:
+        onu_iface = onu_interface(r)
+        cmds += [f"show running-config interface {onu_iface}", f"show onu running config {onu_iface}"]
+    return "\n".join(cmds)
+
+
+def normalize_config_line(line):
+    """Satu baris config → bentuk pembanding: spasi berlebih dibuang + format tampilan OLT (CONFIG_SHOW_FORMATS)."""
+    line = " ".join(line.split())
+    for pattern, repl in CONFIG_SHOW_FORMATS:
+        line = pattern.sub(repl, line)
+    return CONFIG_SECRET_RE.sub(r"\1 *", line)
+
+
+def parse_running_config(out):
     """
-    Parse hasil 'show gpon onu state gpon-olt_x/x/x' dari OLT ZTE.
-    Akan menangkap pola seperti:
-        1/2/6:1
-        1/2/6:128
+    Output running-config → {(section, gpon-onu_x:y): [baris]}, section "interface" / "pon-onu-mng".
+    - baris dinormalisasi (normalize_config_line) supaya bisa dibanding dengan block yang dikirim
+    - section ditutup '!' (termasuk '!<...>') / '$' / 'end' / prompt; ONU yang tidak ada (%Error) tidak punya entry
     """
-    ids = set()
-    clean = output.replace("\r", "").replace("\t", " ")
-    lines = clean.splitlines()
+    model, cur = {}, None
+    for raw in out.splitlines():
+        line = normalize_config_line(raw)
+        if PROMPT_RE.match(line) or line.startswith("!") or line in ("$", "end", "exit"):
+            cur = None
+            continue
+        m = ONU_SECTION_RE.match(line)
+        if m:
+            cur = model.setdefault((m.group(1), m.group(2)), [])
+        elif cur is not None and line:
+            cur.append(line)
+    return model
 
-    # Regex cocok untuk pola '1/2/6:128' dst.
-    pattern = re.compile(r"\b\d+/\d+/\d+:(\d+)\b")
 
+def config_delta(lines, running, resend_secrets=False):
+    """
+    Block config satu ONU dikurangi baris yang sudah ada di running-config.
+    Return baris yang perlu dikirim (header section + baris kurang/beda + exit); [] = sudah sesuai.
+    - baris berisi password dibandingkan tanpa nilai password (tidak terbaca dari OLT) → ganti password
+      saja tidak terdeteksi; resend_secrets=True → baris tsb selalu dikirim ulang
+    """
+    delta, header, have, body = [], None, [], []
     for line in lines:
-        m = pattern.search(line)
+        norm = normalize_config_line(line)
+        m = ONU_SECTION_RE.match(norm)
         if m:
-            ids.add(m.group(1))
+            header, have, body = line, running.get((m.group(1), m.group(2)), []), []
+        elif norm == "exit" and header:
+            if body:
+                delta += [header] + body + [line]
+            header = None
+        elif resend_secrets and CONFIG_SECRET_RE.search(line):
+            body.append(line)
+        elif norm not in have:
+            words = norm.split()
+            if words[0] in CONFIG_REPLACE_FIRST and any(l.split()[:2] == words[:2] for l in have):
+                body.append(f"no {' '.join(words[:2])}")  # nilai beda → hapus dulu, OLT menolak timpa
+            body.append(line)
+    return delta
+
+
+def build_config_batch(rows, vlan_prefix, plan=None, running=None, resend_secrets=False):
+    """
+    Gabung block config beberapa ONU jadi satu kiriman.
+    Return (lines, owners): owners[i] = index row pemilik lines[i].
+    - plan: block per ONU diambil dari plan hasil compile (plan.py), fallback build langsung
+    - running: hasil parse_running_config → hanya baris yang kurang/beda (ONU yang sudah
+      sesuai tidak punya baris sama sekali); resend_secrets lihat config_delta
+    """
+    lines, owners = [], []
+    for idx, r in enumerate(rows):
+        block = (plan and plan.config_lines(r)) or config_lines(r, vlan_prefix)
+        if running is not None:
+            block = config_delta(block, running, resend_secrets)
+        lines += block
+        owners += [idx] * len(block)
+    return lines, owners
+
+
+def attribute_config_output(lines, owners, out):
+    """
+    Petakan output batch config ke ONU & perintah asalnya.
+    Return (results, suspects):
+    - results : index row → (status, message); message berisi perintah pertama
+                yang gagal + pesan OLT, atau perintah yang prompt-nya tidak kembali
+    - suspects: row error setelah row error pertama — bisa jadi cuma ikut gagal
+                karena mode CLI bergeser (mis. 'interface gpon-onu_x' ditolak),
+                layak diulang sekali setelah mode dikembalikan
+    """
+    segments = split_by_prompt(out)
+    results = {}
+    for i, (cmd, idx) in enumerate(zip(lines, owners)):
+        if idx in results:
+            continue
+        if i >= len(segments):
+            results[idx] = ("error", f"No prompt after '{cmd.strip()}'")
+            continue
+        err = next((l.strip() for l in segments[i][1:] if ERROR_RE.search(l)), None)
+        if err:
+            results[idx] = ("error", f"'{cmd.strip()}' → {err}")
+    failed = sorted(results)
+    for idx in set(owners):
+        results.setdefault(idx, ("success", "Configured OK"))
+    return results, failed[1:]
+
+
+REGISTER_LINE_RE = re.compile(r"(?:onu|name)\s+(\d+)\b")
+
+
+def attribute_register_output(block, out):
+    """
+    Hasil per ONU dari output block register (untuk ack journal):
+    onu_id → "ok" / "error" (baris %Error atau prompt tidak kembali di perintah ONU tsb).
+    """
+    lines = [l.strip() for l in block.splitlines() if l.strip()]
+    segments = split_by_prompt(out)
+    result = {}
+    for i, line in enumerate(lines):
+        m = REGISTER_LINE_RE.match(line)
+        if not m:
+            continue
+        ok = i < len(segments) and not any(ERROR_RE.search(l) for l in segments[i][1:])
+        result[m.group(1)] = "ok" if ok and result.get(m.group(1), "ok") == "ok" else "error"
+    return result
+
+
+# -------------------- VERIFIKASI COMMIT OLT ------------------
+# baris tabel: '1/2/6:1   enable   enable   working   1(GPON)' (awalan non-digit, mis. sisa '--More--', diabaikan)
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")   # kursor/erase setelah '--More--' dijawab
+ONU_STATE_RE = re.compile(r"^[^\d\n]*(\d+)/(\d+)/(\d+):(\d+)[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)(?:[ \t]+(\S+))?", re.M)
+
 
-    return ids
+class OnuState(namedtuple("OnuState", "shelf slot port onu_id admin omcc phase channel")):
+    """Satu baris 'show gpon onu state': posisi (int) + admin/OMCC/phase state & channel (str)."""
+    __slots__ = ()
 
+    @property
+    def interface(self):
+        return f"gpon-olt_{self.shelf}/{self.slot}/{self.port}"
 
-def send_block(shell, block, delay=SEND_DELAY_SEC, read_window=READ_WINDOW_SEC):
+
+class OnuStateParser:
     """
-    Kirim perintah ke OLT (dengan dukungan auto-scroll '--More--').
-    Akan terus menekan 'spasi' sampai semua output tampil.
+    Parser streaming 'show gpon onu state' (per interface maupun OLT-wide tanpa filter).
+    - feed(teks): potongan output apa adanya (baris boleh terpotong) → OnuState baru dari baris lengkap
+    - close(): proses sisa baris terakhir, return semua record
+    Header, garis, 'ONU Number', echo & prompt otomatis terlewat (tidak cocok pola index).
     """
-    if not block.endswith("\n"):
-        block += "\n"
 
-    shell.send(block)
-    time.sleep(delay)
+    def __init__(self):
+        self.records = []
+        self._tail = ""
+
+    def _parse(self, text):
+        new = [OnuState(int(m.group(1)), int(m.group(2)), int(m.group(3)), int(m.group(4)),
+                        m.group(5), m.group(6), m.group(7), m.group(8) or "")
+               for m in ONU_STATE_RE.finditer(text)]
+        self.records.extend(new)
+        return new
 
-    out = []
-    end_time = time.time() + read_window
+    def feed(self, text):
+        text = self._tail + ANSI_RE.sub("", text.replace("\r", ""))
+        cut = text.rfind("\n") + 1
+        self._tail = text[cut:]
+        return self._parse(text[:cut]) if cut else []
 
-    while time.time() < end_time:
-        time.sleep(0.2)
-        while shell.recv_ready():
-            chunk = shell.recv(65535).decode(errors="ignore")
-            out.append(chunk)
+    def close(self):
+        tail, self._tail = self._tail, ""
+        self._parse(tail)
+        return self.records
 
-            # ⬇️ Auto-scroll untuk ZTE yang punya '--More--'
-            if "--More--" in chunk or "-- More --" in chunk:
-                shell.send(" ")               # tekan spasi
-                time.sleep(0.3)
-                end_time = time.time() + read_window  # perpanjang waktu baca
 
-            # perpanjang sedikit waktu saat prompt akhir muncul
-            if "#" in chunk:
-                end_time = time.time() + 1.5
+def parse_onu_state(output: str) -> list:
+    """Output 'show gpon onu state' utuh → [OnuState]."""
+    parser = OnuStateParser()
+    parser.feed(output)
+    return parser.close()
 
-    return "".join(out)
+
+def parse_onu_ids_from_show(output: str) -> set:
+    """ID ONU (str) dari output 'show gpon onu state gpon-olt_x/x/x', mis. '1/2/6:128' → "128"."""
+    return {str(r.onu_id) for r in parse_onu_state(output)}
 
 
-def wait_until_committed(shell, interface, expected_ids: set, timeout=MAX_COMMIT_WAIT_SEC, poll=COMMIT_POLL_SEC):
+ONU_LINE_RE = re.compile(r"^\s*onu\s+(\d+)\s+type\s+(\S+)\s+sn\s+(\S+)", re.M)
+
+
+def parse_onu_table(output: str) -> dict:
     """
-    Menunggu hingga semua ONU di interface tertentu benar-benar muncul di daftar OLT.
-    Tambahan:
-    - terminal length 0 agar tidak terpotong oleh '--More--'
-    - retry re-check setelah timeout
-    """
-    send_block(shell, "enable")
-    send_block(shell, "terminal length 0")
-
-    start = time.time()
-    last_seen = set()
-
-    while time.time() - start < timeout:
-        out = send_block(shell, f"show gpon onu state {interface}", delay=1, read_window=20)
-        seen = parse_onu_ids_from_show(out)
-        if seen:
-            last_seen = seen
-        matched = expected_ids.intersection(seen)
-        print(f"⏳ Commit progress {len(matched)}/{len(expected_ids)} (seen total: {len(seen)})...")
-        if matched == expected_ids:
-            print(f"✅ Commit selesai: {len(matched)}/{len(expected_ids)} ONU muncul di {interface}")
-            return matched
-        time.sleep(poll)
-
-    # 🔁 Re-check tambahan setelah timeout
-    missing = expected_ids - last_seen
-    if missing:
-        print(f"⚠️ Timeout, {len(missing)} ONU belum muncul. Tunggu 30 lalu re-check...")
-        time.sleep(30)
-        send_block(shell, "enable")
-        send_block(shell, "terminal length 0")
-        out = send_block(shell, f"show gpon onu state {interface}", delay=1, read_window=20)
-        seen = parse_onu_ids_from_show(out)
-        matched = expected_ids.intersection(seen)
-        print(f"🔁 Re-check: {len(matched)}/{len(expected_ids)} sudah muncul setelah retry.")
-        return matched
-
-    return last_seen.intersection(expected_ids)
+    Parse hasil 'show running-config interface gpon-olt_x/x/x':
+        interface gpon-olt_1/2/6
+          onu 1 type ALL sn ZTEGC0000001
+    → {"1": {"type": "ALL", "sn": "ZTEGC0000001"}, ...}
+    """
+    clean = output.replace("\r", "")
+    return {m.group(1): {"type": m.group(2), "sn": m.group(3).upper()}
+            for m in ONU_LINE_RE.finditer(clean)}
+
+
+def plan_reconcile(rows, current, drop_extra=False):
+    """
+    Diff tabel ONU di OLT (parse_onu_table) terhadap baris CSV satu port.
+    Return (to_delete, to_register, present):
+    - to_delete  : ID yang SN-nya beda, SN-nya pindah ke ID lain,
+                   atau (drop_extra=True) tidak ada di CSV
+    - to_register: baris CSV yang belum terdaftar / harus didaftar ulang
+    - present    : baris CSV yang sudah terdaftar dengan SN sama (tidak disentuh)
+    """
+    wanted = {r["onu_id"].strip(): r["sn"].strip().upper() for r in rows}
+    wanted_sn = {sn: onu_id for onu_id, sn in wanted.items()}
+
+    to_delete = set()
+    for onu_id, onu in current.items():
+        if onu_id in wanted:
+            if wanted[onu_id] != onu["sn"]:
+                to_delete.add(onu_id)
+        elif drop_extra or onu["sn"] in wanted_sn:
+            to_delete.add(onu_id)
+
+    present, to_register = [], []
+    for r in rows:
+        onu_id = r["onu_id"].strip()
+        if onu_id in current and onu_id not in to_delete:
+            present.append(r)
+        else:
+            to_register.append(r)
+    return sorted(to_delete, key=int), to_register, present
 
 
+def build_unreg_block(interface, onu_ids):
+    return "\n".join([f"interface {interface}"] + [f"no onu {i}" for i in onu_ids] + ["exit"])
 
 
-# ----------------------- PROSES INTI -------------------------
-def process_register(interface, rows, log_lock, cfg):
+CommitEvent = namedtuple("CommitEvent", "interface onu_id sent_at committed_at")
+
+
+class OnuStateBoard:
     """
-    Optimized OLT-safe version (dengan conditional unregister):
-    - Unregister 1–128 hanya dijalankan jika interface belum ada di hasil CSV
-    - Register per batch (default 32)
-    - Auto flush tiap ±96 ONU
-    - Retry SSH jika drop
+    Snapshot 'show gpon onu state' bersama untuk semua port satu OLT (satu board per OLT per proses).
+    - command(interface): ≥ ONU_STATE_SHARED_PORTS port sedang polling → satu show OLT-wide tanpa filter,
+      satu port saja → show per interface (output kecil)
+    - records_for(interface, since): snapshot yang diambil setelah `since` & mencakup port ini
+      → dipakai port lain tanpa show baru (None kalau harus show sendiri)
+    - lock: dipegang selama show → port lain menunggu lalu memakai hasilnya (thread engine)
     """
-    # 🔍 Cek apakah interface ini sudah pernah tercatat di hasil_registrasi.csv
-    need_unreg = True
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline="", encoding="utf-8") as f:
-            for row in csv.DictReader(f):
-                if row.get("interface", "").strip() == interface:
-                    need_unreg = False
+
+    def __init__(self, olt):
+        self.olt = olt
+        self.lock = threading.Lock()
+        self._polling = {}   # interface → waktu poll terakhir
+        self._snap = None    # (started, scope interface / None = OLT-wide, {interface: [OnuState]})
+        self._phases = {}    # interface → phase yang pernah di-set di gauge (di-nol-kan kalau hilang)
+
+    def command(self, interface):
+        now = time.time()
+        self._polling[interface] = now
+        active = [i for i, t in self._polling.items() if now - t <= 2 * COMMIT_POLL_MAX_SEC]
+        if len(active) >= ONU_STATE_SHARED_PORTS:
+            return "show gpon onu state"
+        return f"show gpon onu state {interface}"
+
+    def records_for(self, interface, since):
+        if not self._snap:
+            return None
+        started, scope, by_port = self._snap
+        if started < since or scope not in (None, interface):
+            return None
+        self._polling[interface] = time.time()
+        return by_port.get(interface, [])
+
+    def publish(self, command, records, started, complete=True):
+        """Simpan hasil show (hanya kalau prompt kembali) & update metrics. Return {interface: [OnuState]}."""
+        scope = command.split()[-1] if command.split()[-1].startswith("gpon-olt_") else None
+        by_port = {}
+        for r in records:
+            by_port.setdefault(r.interface, []).append(r)
+        metrics.ONU_STATE_SHOWS.inc(olt=self.olt, scope="port" if scope else "olt")
+        if complete:
+            self._snap = (started, scope, by_port)
+            for interface, rows in by_port.items():
+                phases = Counter(r.phase for r in rows)
+                for phase in self._phases.get(interface, set()) | set(phases):
+                    metrics.ONU_PHASE.set(phases[phase], olt=self.olt, interface=interface, phase=phase)
+                self._phases[interface] = set(phases)
+        return by_port
+
+
+_state_boards = {}
+
+
+def onu_state_board(olt):
+    with _budget_lock:
+        if olt not in _state_boards:
+            _state_boards[olt] = OnuStateBoard(olt)
+        return _state_boards[olt]
+
+_commit_log_lock = threading.Lock()
+
+
+def log_commit_events(events):
+    """Simpan latency commit per ONU ke COMMIT_EVENTS_CSV (bahan tuning polling)."""
+    if not events:
+        return
+    with _commit_log_lock:
+        new_file = not os.path.exists(COMMIT_EVENTS_CSV)
+        with open(COMMIT_EVENTS_CSV, "a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if new_file:
+                w.writerow(["interface", "onu_id", "sent_at", "committed_at", "latency_sec"])
+            for ev in events:
+                w.writerow([ev.interface, ev.onu_id, f"{ev.sent_at:.3f}", f"{ev.committed_at:.3f}",
+                            f"{ev.committed_at - ev.sent_at:.3f}"])
+
+
+class CommitWatcher:
+    """
+    Verifikasi commit ONU di satu interface dengan polling adaptif.
+    - expect(ids): daftarkan ONU yang baru dikirim (waktu kirim dicatat)
+    - ingest(records): OnuState port ini → CommitEvent untuk ONU yang baru muncul (phase state dicatat)
+    - next_delay(): interval polling berikutnya — cepat selama ada progres, makin jarang sebanding
+      lamanya macet (sejak progres terakhir / ONU tertunda tertua dikirim), bukan jumlah poll kosong
+    - poll()/wait(): helper sync di atas session yang sudah terbuka (tidak masuk exec ulang),
+      show dibagi dengan port lain di OLT yang sama lewat OnuStateBoard
+    """
+
+    def __init__(self, interface, shell=None, on_commit=None, olt=""):
+        self.interface = interface
+        self.shell = shell
+        self.on_commit = on_commit
+        self.olt = olt
+        self.sent_at = {}       # onu_id → waktu kirim
+        self.events = {}        # onu_id → CommitEvent
+        self.states = {}        # onu_id → OnuState terakhir
+        self._progress_at = 0.0  # waktu ingest terakhir yang membawa ONU baru
+        self._polled_at = time.time()
+
+    def expect(self, ids, sent_at=None):
+        sent_at = sent_at or time.time()
+        for onu_id in ids:
+            self.sent_at.setdefault(onu_id, sent_at)
+
+    @property
+    def pending(self):
+        return set(self.sent_at) - set(self.events)
+
+    def committed(self, ids=None):
+        return set(self.events) if ids is None else set(ids) & set(self.events)
+
+    def since(self):
+        """Snapshot boleh dipakai tanpa show sendiri kalau diambil setelah poll terakhir port ini & masih segar."""
+        return max(self._polled_at, time.time() - COMMIT_POLL_MIN_SEC)
+
+    def ingest(self, records):
+        now = self._polled_at = time.time()
+        for r in records:
+            self.states[str(r.onu_id)] = r
+        seen = {str(r.onu_id) for r in records}
+        new = [CommitEvent(self.interface, onu_id, self.sent_at[onu_id], now)
+               for onu_id in sorted(seen & self.pending, key=int)]
+        for ev in new:
+            self.events[ev.onu_id] = ev
+            metrics.COMMIT_LATENCY_SECONDS.observe(ev.committed_at - ev.sent_at,
+                                                   olt=self.olt, interface=self.interface)
+        log_commit_events(new)
+        if new:
+            self._progress_at = now
+            if self.on_commit:
+                self.on_commit({ev.onu_id for ev in new})
+        return new
+
+    def next_delay(self):
+        """
+        Poll berikutnya dijadwalkan di stall × COMMIT_POLL_BACKOFF (geometris terhadap lamanya macet).
+        Poll tambahan (mis. feedback pacer tiap batch) tidak ikut memperlambat polling wait().
+        """
+        pending = self.pending
+        if not pending:
+            return COMMIT_POLL_MIN_SEC
+        stalled_since = max(self._progress_at, min(self.sent_at[i] for i in pending))
+        stall = time.time() - stalled_since
+        return min(max(COMMIT_POLL_MIN_SEC, stall * (COMMIT_POLL_BACKOFF - 1)), COMMIT_POLL_MAX_SEC)
+
+    def feedback_due(self, handoff=False):
+        """
+        Perlu show setelah batch register? (feedback RegisterPacer, terpisah dari jadwal polling wait())
+        - handoff (pipeline): ya, ONU ter-commit langsung diserahkan ke worker config
+        - selain itu hanya kalau lag() tanpa show (batas atas) sudah > REGISTER_COMMIT_LAG_SEC;
+          di bawah itu pacer tidak mungkin melambat karena commit → show dilewati
+        """
+        return handoff or self.lag() > REGISTER_COMMIT_LAG_SEC
+
+    def lag(self):
+        """Umur ONU terkirim tertua yang belum muncul (detik); 0 kalau tidak ada yang tertunda."""
+        pending = self.pending
+        return time.time() - min(self.sent_at[i] for i in pending) if pending else 0.0
+
+    def phases(self):
+        """Ringkasan phase state ONU yang sudah commit, mis. "60 working, 4 LOS"."""
+        c = Counter(self.states[i].phase for i in self.events if i in self.states)
+        return ", ".join(f"{n} {phase}" for phase, n in c.most_common())
+
+    def after_poll(self, deadline):
+        """Langkah wait() setelah satu poll (dipakai engine thread & async): jeda berikutnya, None = selesai/timeout."""
+        print(f"⏳ {self.interface}: commit progress {len(self.events)}/{len(self.sent_at)}...")
+        if not self.pending:
+            return None
+        if time.time() + self.next_delay() > deadline:
+            print(f"⚠️ {self.interface}: timeout, {len(self.pending)} ONU belum muncul.")
+            return None
+        return self.next_delay()
+
+    def report(self):
+        """Ringkasan latency commit port (hanya kalau semua ONU sudah muncul)."""
+        if self.events and not self.pending:
+            latencies = sorted(ev.committed_at - ev.sent_at for ev in self.events.values())
+            print(f"✅ Commit selesai: {len(self.events)} ONU muncul di {self.interface} "
+                  f"(latency median {latencies[len(latencies) // 2]:.1f}s, max {latencies[-1]:.1f}s; "
+                  f"{self.phases()})")
+
+    def poll(self):
+        board = onu_state_board(self.olt)
+        with board.lock:
+            records = board.records_for(self.interface, self.since())
+            if records is None:
+                started, command, parser = time.time(), board.command(self.interface), OnuStateParser()
+                send_block(self.shell, command, timeout=SHOW_TIMEOUT_SEC, sink=parser.feed)
+                records = board.publish(command, parser.close(), started,
+                                        complete=getattr(self.shell, "mode", None) is not None).get(self.interface, [])
+        return self.ingest(records)
+
+    def wait(self, timeout=MAX_COMMIT_WAIT_SEC):
+        """Polling sampai semua ONU yang di-expect muncul atau timeout. Return set ID yang commit."""
+        with metrics.COMMIT_WAIT_SECONDS.time(olt=self.olt, interface=self.interface):
+            deadline = time.time() + timeout
+            while self.pending:
+                self.poll()
+                delay = self.after_poll(deadline)
+                if delay is None:
                     break
+                time.sleep(delay)
+            self.report()
+            return self.committed()
 
-    cli, sh = ssh_connect(cfg)
-    try:
-        enter_config(sh)
 
-        # --- STEP 1: Conditional Unregister ---
-        if need_unreg:
-            print(f"🚮 Menghapus seluruh ONU di {interface} (1–128)...")
-            unreg_cmds = [f"interface {interface}"] + [f"no onu {i}" for i in range(1, 129)] + ["exit"]
-            unreg_block = "\n".join(unreg_cmds)
-            out = send_block(sh, unreg_block)
-            with open("olt_debug.log", "a", encoding="utf-8") as dbg:
-                dbg.write(f"\n--- UNREGISTER {interface} (1–128) ---\n{out}\n")
-            print("✅ Semua ONU dihapus dari konfigurasi OLT.")
-            time.sleep(2)  # beri waktu OLT proses
+MODEL_RE = re.compile(r"\b(C\d{3})\b")
+
+
+def known_olt_model(cfg):
+    """Model OLT dari cfg["olt_model"] atau probe OLT ('show version'); None kalau belum pernah dicek."""
+    return cfg.get("olt_model") or olt_probe(olt_label(cfg)).get("model")
+
+
+def parse_olt_model(cfg, output):
+    """Simpan model dari output 'show version' ke probe OLT (dipakai ulang session/job lain). "" kalau tidak dikenali."""
+    m = MODEL_RE.search(output)
+    model = m.group(1).upper() if m else ""
+    update_probe(olt_label(cfg), model=model)
+    return model
+
+
+class RegisterPacer:
+    """
+    Ukuran batch register & jeda antar batch dari feedback OLT (pengganti batch 32 + jeda 2s tetap):
+    - echo: waktu sampai prompt terakhir block kembali, per baris, dibanding baseline terbaik
+    - commit: lag() CommitWatcher — ONU terkirim tertua yang belum muncul
+    - sehat → batch +REGISTER_BATCH_STEP s/d batas model, jeda dibagi 2 (→ 0)
+    - echo lambat / %Error banyak / prompt hilang → batch /2, jeda ×2
+    - commit tertinggal > REGISTER_COMMIT_LAG_SEC → ukuran tetap, jeda ×2, flush diizinkan
+    """
+
+    def __init__(self, model, start=BATCH_SIZE, max_size=None):
+        self.model = model
+        self.max_size = max_size or REGISTER_BATCH_MAX.get(model, REGISTER_BATCH_MAX_DEFAULT)
+        self.size = max(1, min(start, self.max_size))
+        self.delay = 0.0
+        self.baseline = None
+        self.commit_lag = 0.0
+
+    def record(self, seconds, lines, errors=0, timeout=False, commit_lag=0.0):
+        """Feedback satu batch; return alasan melambat (None = sehat)."""
+        per_line = seconds / max(1, lines)
+        self.baseline = per_line if self.baseline is None else min(per_line, self.baseline * 1.005)
+        self.commit_lag = commit_lag
+        if timeout:
+            reason = "timeout"
+        elif errors / max(1, lines) > AIMD_ERROR_RATE:
+            reason = "error"
+        elif per_line > self.baseline * AIMD_LATENCY_FACTOR:
+            reason = "latency"
+        elif commit_lag > REGISTER_COMMIT_LAG_SEC:
+            reason = "commit"
         else:
-            print(f"⚙️ Lewati unreg — {interface} sudah pernah tercatat di hasil_registrasi.csv")
+            reason = None
+
+        if reason is None:
+            self.size = min(self.max_size, self.size + REGISTER_BATCH_STEP)
+            self.delay = self.delay / 2 if self.delay >= REGISTER_DELAY_STEP_SEC else 0.0
+        else:
+            if reason != "commit":
+                self.size = max(min(REGISTER_BATCH_MIN, self.size), self.size // 2)
+            self.delay = min(REGISTER_DELAY_MAX_SEC, max(self.delay * 2, REGISTER_DELAY_STEP_SEC))
+        return reason
+
+    @property
+    def lagging(self):
+        return self.commit_lag > REGISTER_COMMIT_LAG_SEC
+
+
+def wait_until_committed(shell, interface, expected_ids: set, timeout=MAX_COMMIT_WAIT_SEC, on_commit=None):
+    """
+    Menunggu hingga semua ONU di interface tertentu benar-benar muncul di daftar OLT.
+    Pembungkus CommitWatcher: polling adaptif, return begitu semua ID terlihat.
+    on_commit(ids) dipanggil dengan ONU yang baru muncul tiap polling (untuk pipeline).
+    """
+    watcher = CommitWatcher(interface, shell, on_commit=on_commit, olt=getattr(shell, "olt", ""))
+    watcher.expect(expected_ids)
+    return watcher.wait(timeout)
+
 
-        # --- STEP 2: Proses Registrasi (sama seperti sebelumnya) ---
+# ------------- LOGIKA PORT BERSAMA (engine thread & async) --------------
+CONFIG_IN_SYNC = ("success", "Config sudah sesuai (running-config)")
+
+
+class RegisterPort:
+    """
+    Bookkeeping register satu port, dipakai process_register engine thread & async_engine
+    (kirim ke OLT, poll commit & journal tetap di engine masing-masing):
+    - reconcile, progress, ONU ter-commit → log + on_commit, resume dari journal
+    - batch berikutnya (ukuran dari RegisterPacer), hasil kirim → ack journal, metrics, transcript, log
+    - log(rows): penulis hasil (thread: append_logs, async: writer engine)
+    """
+
+    def __init__(self, interface, rows, cfg, log, on_commit=None, progress_key=None):
+        self.interface = interface
+        self.rows = rows
+        self.cfg = cfg
+        self.log = log
+        self.on_commit = on_commit
+        self.pk = progress_key or interface
+        self.olt = olt_label(cfg)
+        self.jid = journal_id(cfg)
+        self.rows_by_id = {r["onu_id"].strip(): r for r in rows}
+        # mode pipeline: "done" milik fase config, register pakai counter "registered"
+        self.counter = "registered" if on_commit else "done"
+        # satu watcher untuk seluruh port: waktu kirim tiap batch → latency commit per ONU
+        self.watcher = CommitWatcher(interface, on_commit=self.mark_committed, olt=self.olt)
+        self.to_send, self.present = rows, []
+        self.pacer = None
+        self.pos = self.batch_no = self.batch_counter = 0
+
+    def reconcile(self, out, drop_extra):
+        """Output 'show running-config interface' → ONU yang harus dihapus (to_send & present diisi)."""
+        current = parse_onu_table(out)
+        to_delete, self.to_send, self.present = plan_reconcile(self.rows, current, drop_extra=drop_extra)
+        print(f"🔍 {self.interface}: {len(current)} ONU di OLT → hapus {len(to_delete)}, "
+              f"daftar {len(self.to_send)}, sudah sesuai {len(self.present)}")
+        return to_delete
+
+    def mark_committed(self, ids):
+        new = sorted(ids, key=int)
+        self.log(result_rows([self.rows_by_id[i] for i in new], "registered", "OLT commit confirmed"))
+        with progress_lock:
+            progress_dict[self.pk][self.counter] += len(new)
+        if self.on_commit and new:
+            self.on_commit([self.rows_by_id[i] for i in new])
+
+    def start(self, sent_before, lost):
+        """
+        Progress RUNNING; ONU yang sudah ada di OLT dengan SN sama langsung ter-commit;
+        ONU yang block register-nya sudah di-ack run sebelumnya (journal.acked) tidak dikirim ulang.
+        """
+        with progress_lock:
+            if self.on_commit:
+                progress_dict[self.pk]["status"] = "RUNNING"
+            else:
+                progress_dict[self.pk] = {"done": 0, "total": len(self.rows), "status": "RUNNING"}
+        self.mark_committed(r["onu_id"].strip() for r in self.present)
+
+        resumed = {onu_key(r) for r in self.to_send if sent_before.get(onu_key(r)) == "ok"}
+        if resumed:
+            self.watcher.expect(r["onu_id"].strip() for r in self.to_send if onu_key(r) in resumed)
+            self.to_send = [r for r in self.to_send if onu_key(r) not in resumed]
+            print(f"📒 {self.interface}: {len(resumed)} ONU sudah terkirim run sebelumnya (journal) "
+                  f"→ langsung cek commit")
+        if lost:
+            print(f"📒 {self.interface}: {lost} block terputus di tengah kiriman run sebelumnya → ONU-nya dikirim ulang")
+
+    def start_pacer(self, model):
+        self.pacer = RegisterPacer(model, max_size=int(self.cfg.get("register_batch_max") or 0) or None)
+
+    def batches(self):
+        """Yield (rows, block, jumlah baris) per batch; ukuran dibaca dari pacer tiap batch (setelah paced())."""
+        while self.pos < len(self.to_send):
+            check_cancel(self.cfg)
+            batch = self.to_send[self.pos:self.pos + self.pacer.size]
+            block = build_register_block(batch, onu_type=self.cfg.get("onu_type", "ALL"), plan=self.cfg.get("plan"))
+            self.pos += len(batch)
+            self.batch_no += 1
+            self.batch_counter += len(batch)
+            print(f"🛰️ {self.interface}: mengirim batch {self.batch_no}, {len(batch)} ONU "
+                  f"({self.pos}/{len(self.to_send)})...")
+            yield batch, block, len([l for l in block.splitlines() if l.strip()])
+
+    def sent(self, batch, block, out):
+        """Output satu batch → tunggu commit, metrics, transcript, log 'pending'. Return (ack journal, jumlah %Error)."""
+        acks = attribute_register_output(block, out)
+        mark_dirty(self.cfg)
+        self.watcher.expect(r["onu_id"].strip() for r in batch)
+        errors = len(ERROR_RE.findall(out))
+        metrics.CLI_ERRORS.inc(errors, olt=self.olt, interface=self.interface)
+        transcript.log(self.jid, self.interface, f"REGISTER {self.interface} BATCH {self.batch_no}", out,
+                       onus=[r["onu_id"].strip() for r in batch])
+        self.log(result_rows(batch, "pending", "Command sent, waiting for OLT commit"))
+        return {onu_key(r): acks.get(r["onu_id"].strip(), "error") for r in batch}, errors
+
+    def paced(self, elapsed, lines, errors, timed_out):
+        """
+        Feedback pacer setelah batch (watcher sudah di-poll kalau feedback_due()).
+        Return jeda sebelum batch berikutnya; None kalau ini batch terakhir.
+        """
+        slow = self.pacer.record(elapsed, lines, errors=errors, timeout=timed_out, commit_lag=self.watcher.lag())
+        metrics.REGISTER_BATCH_SIZE.set(self.pacer.size, olt=self.olt, interface=self.interface)
+        if self.pos >= len(self.to_send):
+            return None
+        if slow:
+            print(f"🐢 {self.interface}: OLT melambat ({slow}) → batch {self.pacer.size} ONU, "
+                  f"jeda {self.pacer.delay:.1f}s")
+        if self.batch_counter >= REGISTER_FLUSH_EVERY and self.pacer.lagging:
+            if self.cfg.get("auto_write", False):
+                print(f"💾 Commit tertinggal {self.pacer.commit_lag:.0f}s → minta write lebih awal (per OLT)")
+                write_coordinator(self.cfg).request("commit_lag")
+            self.batch_counter = 0
+        return self.pacer.delay
+
+    def finish(self, committed):
+        """Setelah commit wait: ONU yang belum muncul dicatat pending. Return key journal yang harus di-expire."""
+        committed = committed | {r["onu_id"].strip() for r in self.present}
+        missing = [r for r in self.rows if r["onu_id"].strip() not in committed]
+        self.log(result_rows(missing, "pending", "Still waiting for OLT commit (skipped in config)"))
+        return [onu_key(r) for r in missing]
+
+    def close(self):
+        if not self.on_commit:
+            with progress_lock:
+                progress_dict[self.pk]["status"] = "FINISHED"
+
+
+class ConfigPort:
+    """
+    Bookkeeping config satu port, dipakai process_config engine thread & async_engine
+    (antrian, session & kirim ke OLT tetap di engine):
+    - ONU yang dikonfigurasi, jumlah worker & AdaptiveConcurrency, progress
+    - baris config per batch (mode diff: hanya yang beda dari running-config), hasil kirim
+      → status per ONU, ack journal, feedback controller, metrics, transcript, log
+    """
+
+    def __init__(self, interface, cfg, log, config_before, progress_key=None):
+        self.interface = interface
+        self.cfg = cfg
+        self.log = log
+        self.config_before = config_before   # journal.acked(..., "config")
+        self.pk = progress_key or interface
+        self.olt = olt_label(cfg)
+        self.jid = journal_id(cfg)
+        self.batch_size = max(1, int(cfg.get("config_batch_size") or CONFIG_BATCH_SIZE))
+        self.diff_mode = (cfg.get("config_mode") or CONFIG_MODE) == "diff"
+        self.ctrl = None
+        self.total = 0
+
+    def select(self, rows, status_map):
+        """Mode non-pipeline: hanya ONU 'registered'; kosong → port langsung FINISHED."""
+        to_config = [r for r in rows if status_map.get(_key_of(r)) == "registered"]
+        if not to_config:
+            print("Tidak ada ONU berstatus 'registered' untuk dikonfigurasi.")
+            with progress_lock:
+                progress_dict[self.pk] = {"status": "FINISHED"}
+        return to_config
+
+    def plan_workers(self, total, parallel_workers=None, pipeline=False):
+        """Jumlah worker; tanpa angka tetap → AdaptiveConcurrency per OLT (worker secukupnya s/d ceiling)."""
+        self.total = total
+        if parallel_workers is None:
+            self.ctrl = concurrency_controller(self.cfg)
+            parallel_workers = max(1, min(self.ctrl.ceiling, -(-total // self.batch_size)))
+            print(f"⚙️ Total {total} ONU → {parallel_workers} worker, session config adaptif "
+                  f"{self.ctrl.current}/{self.ctrl.ceiling} per OLT, {self.batch_size} ONU per kiriman.")
+        else:
+            print(f"⚙️ Total {total} ONU → Jalankan dengan {parallel_workers} worker (stabil mode), "
+                  f"{self.batch_size} ONU per kiriman.")
+        if not pipeline:
+            with progress_lock:
+                progress_dict[self.pk] = {"done": 0, "total": total, "status": "RUNNING"}
+        if self.ctrl:
+            self.report_workers()
+        return parallel_workers
+
+    def report_workers(self):
+        """Batas session config saat ini → progress port (hanya kalau berubah)."""
+        with progress_lock:
+            if progress_dict[self.pk].get("workers") != self.ctrl.current:
+                progress_dict[self.pk]["workers"] = self.ctrl.current
+
+    def skip_journaled(self, batch):
+        """ONU yang sukses di journal (proses mati sebelum hasil tercatat) → catat saja, tanpa kirim ulang."""
+        done = [r for r in batch if self.config_before.get(onu_key(r)) == "success"]
+        self.log(result_rows(done, "success", "Configured OK (journal)"))
+        if done:
+            with progress_lock:
+                progress_dict[self.pk]["done"] += len(done)
+        return [r for r in batch if self.config_before.get(onu_key(r)) != "success"]
+
+    def batch_lines(self, batch, running=None):
+        """Baris config batch + pemilik tiap baris; running (mode diff) → hanya baris yang kurang/beda."""
+        lines, owners = build_config_batch(batch, self.cfg["vlan_prefix"], plan=self.cfg.get("plan"), running=running,
+                                           resend_secrets=self.cfg.get("config_resend_secrets", CONFIG_RESEND_SECRETS))
+        if running is not None:
+            full = len(build_config_batch(batch, self.cfg["vlan_prefix"], plan=self.cfg.get("plan"))[0])
+            metrics.CONFIG_LINES.inc(full - len(lines), olt=self.olt, interface=self.interface, result="skipped")
+        metrics.CONFIG_LINES.inc(len(lines), olt=self.olt, interface=self.interface, result="sent")
+        return lines, owners
+
+    def batch_sent(self, batch, lines, owners, out, elapsed, title, worker_id):
+        """
+        Output satu kiriman config → (outcome per ONU, index ONU yang perlu dicek ulang, ack journal, missing).
+        missing = prompt tidak kembali semua → posisi mode CLI tidak jelas, session harus dibuka ulang.
+        """
+        for _ in batch:
+            metrics.ONU_CONFIG_SECONDS.observe(elapsed / len(batch), olt=self.olt, interface=self.interface)
+        errors = len(ERROR_RE.findall(out))
+        metrics.CLI_ERRORS.inc(errors, olt=self.olt, interface=self.interface)
+        missing = len(split_by_prompt(out)) < len(lines)
+        if self.ctrl:
+            self.ctrl.record(elapsed, len(lines), errors=errors, timeout=missing)
+            self.report_workers()
+        ids = [r["onu_id"].strip() for r in batch]
+        transcript.log(self.jid, self.interface, f"{title} {self.interface} ONU {','.join(ids)} (Worker-{worker_id})",
+                       out, onus=ids)
+
+        results, suspects = attribute_config_output(lines, owners, out)
+        for i in range(len(batch)):
+            results.setdefault(i, CONFIG_IN_SYNC)
+        mark_dirty(self.cfg)
+        outcome = [results[i] for i in range(len(batch))]
+        return outcome, suspects, {onu_key(r): outcome[i][0] for i, r in enumerate(batch)}, missing
+
+    def failed(self, batch, worker_id, e):
+        """Exception saat kirim batch → transcript."""
+        ids = [r["onu_id"].strip() for r in batch]
+        transcript.log(self.jid, self.interface, f"❌ Worker-{worker_id} Exception ONU {','.join(ids)}", str(e),
+                       onus=ids)
+
+    def record(self, batch, outcome):
+        for status, _ in outcome:
+            metrics.ONU_CONFIG.inc(olt=self.olt, interface=self.interface, status=status)
+        self.log([dict(row, status=status, message=msg)
+                  for row, (status, msg) in zip(result_rows(batch, "", ""), outcome)])
         with progress_lock:
-            progress_dict[interface] = {"done": 0, "total": len(rows), "status": "RUNNING"}
+            progress_dict[self.pk]["done"] += len(batch)
 
-        total_batches = (len(rows) + BATCH_SIZE - 1) // BATCH_SIZE
-        batch_counter = 0
+    def finish(self):
+        check_cancel(self.cfg)  # worker berhenti karena cancel → port jangan ditandai FINISHED
+        with progress_lock:
+            progress_dict[self.pk]["status"] = "FINISHED"
 
-        for i in range(0, len(rows), BATCH_SIZE):
-            batch = rows[i:i+BATCH_SIZE]
-            block = build_register_block(batch, onu_type=cfg.get("onu_type", "ALL"))
-            batch_no = i // BATCH_SIZE + 1
-            batch_counter += len(batch)
 
-            print(f"🛰️ Mengirim batch {batch_no}/{total_batches}, {len(batch)} ONU...")
+def pipeline_split(interface, rows, status_map, progress_key=None):
+    """Mode pipeline: (ONU yang harus register, ONU 'registered' yang langsung siap config) + progress port."""
+    pk = progress_key or interface
+    to_register = [r for r in rows if status_map.get(_key_of(r)) not in {"registered", "success"}]
+    ready = [r for r in rows if status_map.get(_key_of(r)) == "registered"]
+    total = len(to_register) + len(ready)
+    if not total:
+        print(f"✅ {interface}: semua ONU sudah success. Tidak ada yang diproses.")
+        with progress_lock:
+            progress_dict[pk] = {"status": "FINISHED"}
+        return [], []
+    print(f"🔀 PIPELINE di {interface}: register {len(to_register)} ONU, config {total} ONU begitu commit")
+    with progress_lock:
+        progress_dict[pk] = {"done": 0, "registered": len(ready), "total": total, "status": "RUNNING"}
+    return to_register, ready
+
 
+# ----------------------- PROSES INTI -------------------------
+def process_register(interface, rows, cfg, on_commit=None):
+    """
+    Optimized OLT-safe version (dengan conditional unregister):
+    - Unregister 1–128 hanya dijalankan jika interface belum ada di hasil CSV
+    - Register per batch, ukuran & jeda diatur RegisterPacer (batas atas per model OLT)
+    - Write ke flash lewat WriteCoordinator per OLT (tanpa reconnect); commit tertinggal →
+      write dipercepat, maks tiap REGISTER_FLUSH_EVERY ONU
+    - Retry SSH jika drop
+    - on_commit(rows) (mode pipeline): dipanggil begitu ONU terlihat ter-commit,
+      dicek juga setelah tiap batch supaya config bisa mulai lebih awal
+    - Command journal: wipe & block register yang sudah di-ack run sebelumnya tidak dikirim ulang
+    - Bookkeeping (progress, batch, log hasil) di RegisterPort, sama dengan async_engine
+    """
+    # 🔍 Cek apakah interface ini sudah pernah tercatat di hasil registrasi
+    need_unreg = not result_store().has_interface(interface)
+    journal, jid = get_journal(), journal_id(cfg)
+    port = RegisterPort(interface, rows, cfg, append_logs, on_commit=on_commit)
+
+    cli, sh = ssh_connect(cfg)
+    try:
+        enter_config(sh)
+        port.watcher.shell = sh
+
+        # --- STEP 1: Unregister ---
+        if cfg.get("unreg_mode", UNREG_MODE) == "wipe":
+            wipe = build_unreg_block(interface, range(1, 129))
+            if need_unreg and journal.done(jid, interface, "unreg", wipe):
+                print(f"📒 {interface}: wipe 1–128 sudah dijalankan run sebelumnya (journal), lewati")
+            elif need_unreg:
+                print(f"🚮 Menghapus seluruh ONU di {interface} (1–128)...")
+                entry = journal.begin(jid, interface, "unreg", wipe)
+                out = send_block(sh, wipe)
+                journal.ack(entry)
+                mark_dirty(cfg)
+                transcript.log(jid, interface, f"UNREGISTER {interface} (1–128)", out, onus=range(1, 129))
+                print("✅ Semua ONU dihapus dari konfigurasi OLT.")
+            else:
+                print(f"⚙️ Lewati unreg — {interface} sudah pernah tercatat di hasil_registrasi.csv")
+        else:
+            # reconcile: baca tabel ONU sekali, hapus/daftar hanya yang berbeda.
+            # ONU di luar CSV hanya dihapus kalau port belum pernah tercatat (sama seperti wipe).
+            out = send_block(sh, f"show running-config interface {interface}", timeout=SHOW_TIMEOUT_SEC)
+            to_delete = port.reconcile(out, drop_extra=need_unreg)
+            if to_delete:
+                block = build_unreg_block(interface, to_delete)
+                entry = journal.begin(jid, interface, "unreg", block)
+                out = send_block(sh, block)
+                journal.ack(entry)
+                mark_dirty(cfg)
+                transcript.log(jid, interface, f"UNREGISTER {interface} ({', '.join(to_delete)})", out,
+                               onus=to_delete)
+
+        # --- STEP 2: Proses Registrasi ---
+        # 📒 ONU yang block register-nya sudah di-ack run sebelumnya → tidak dikirim ulang, langsung cek commit
+        port.start(journal.acked(jid, interface, "register"), journal.unacked(jid, interface, "register"))
+
+        model = known_olt_model(cfg)
+        if port.to_send and model is None:
+            model = parse_olt_model(cfg, send_block(sh, "show version", timeout=SHOW_TIMEOUT_SEC))
+        port.start_pacer(model)
+
+        for batch, block, lines in port.batches():
+            entry = journal.begin(jid, interface, "register", block, [onu_key(r) for r in batch])
+            t0 = time.perf_counter()
+            timed_out = False
             try:
                 out = send_block(sh, block)
+                timed_out = len(split_by_prompt(out)) < lines
                 if not out.strip():
                     raise Exception("Output kosong setelah kirim batch")
             except Exception as e:
-                print(f"⚠️ SSH drop/batch gagal di batch {batch_no}: {e}")
+                timed_out = True
+                print(f"⚠️ SSH drop/batch gagal di batch {port.batch_no}: {e}")
                 try: cli.close()
                 except Exception: pass
                 cli, sh = ssh_connect(cfg)
                 enter_config(sh)
-                print(f"🔁 Reconnect & ulang batch {batch_no}...")
+                port.watcher.shell = sh
+                metrics.SSH_RECONNECTS.inc(olt=port.olt, interface=interface)
+                print(f"🔁 Reconnect & ulang batch {port.batch_no}...")
                 out = send_block(sh, block)
+            elapsed = time.perf_counter() - t0
+            acks, errors = port.sent(batch, block, out)
+            journal.ack(entry, acks)
 
-            # Log CLI output
-            with open("olt_debug.log", "a", encoding="utf-8") as dbg:
-                dbg.write(f"\n--- REGISTER {interface} BATCH {batch_no} ---\n{out}\n")
-
-            # Update CSV status
-            for r in batch:
-                append_log(log_lock, LOG_CSV, {
-                    "interface": r["interface"],
-                    "onu_id": r["onu_id"],
-                    "sn": r["sn"],
-                    "name": r.get("name", ""),
-                    "status": "pending",
-                    "message": "Command sent, waiting for OLT commit"
-                })
-
-            print(f"✅ Batch {batch_no}/{total_batches} selesai dikirim, jeda {BATCH_DELAY_SEC}s...\n")
-            time.sleep(BATCH_DELAY_SEC)
-
-            if batch_counter >= 96:
-                print("💾 Flush buffer OLT (write + reconnect agar commit sempurna)...")
-                if cfg.get("auto_write", False):
-                    out = send_block(sh, "write", delay=1, read_window=10)
-                    with open("olt_debug.log", "a", encoding="utf-8") as dbg:
-                        dbg.write(f"\n--- WRITE {interface} ---\n{out}\n")
-                    print("✅ Konfigurasi berhasil disimpan ke flash.")
-                else:
-                    print("⚠️ 'write' dilewati (manual mode). Jalankan 'write' di CLI OLT setelah verifikasi.")
-                cli.close()
-                time.sleep(0.5)
-                cli, sh = ssh_connect(cfg)
-                enter_config(sh)
-                batch_counter = 0
+            # cek ONU yang sudah commit: feedback pacer + (pipeline) langsung diserahkan ke worker config
+            if port.watcher.feedback_due(handoff=bool(on_commit)):
+                port.watcher.poll()
+            delay = port.paced(elapsed, lines, errors, timed_out)
+            if delay:
+                time.sleep(delay)
 
-        expected_ids = {r["onu_id"].strip() for r in rows}
         print(f"🕒 Semua batch terkirim. Tunggu OLT commit port {interface}...\n")
-        time.sleep(0.5)
-        committed = wait_until_committed(sh, interface, expected_ids)
-
-        for r in rows:
-            onu_id = r["onu_id"].strip()
-            if onu_id in committed:
-                append_log(log_lock, LOG_CSV, {
-                    "interface": r["interface"],
-                    "onu_id": onu_id,
-                    "sn": r["sn"],
-                    "name": r.get("name", ""),
-                    "status": "registered",
-                    "message": "OLT commit confirmed"
-                })
-                with progress_lock:
-                    progress_dict[interface]["done"] += 1
-            else:
-                append_log(log_lock, LOG_CSV, {
-                    "interface": r["interface"],
-                    "onu_id": onu_id,
-                    "sn": r["sn"],
-                    "name": r.get("name", ""),
-                    "status": "pending",
-                    "message": "Still waiting for OLT commit (skipped in config)"
-                })
+        # tidak commit → keluarkan dari journal supaya run berikutnya mengirim ulang
+        journal.expire(jid, interface, "register", port.finish(port.watcher.wait()))
 
     finally:
         cli.close()
-        with progress_lock:
-            progress_dict[interface]["status"] = "FINISHED"
-
-def wait_prompt(shell, timeout=2):
-    start = time.time()
-    while time.time() - start < timeout:
-        if shell.recv_ready():
-            data = shell.recv(65535).decode(errors="ignore")
-            if "(config)" in data:
-                return True
-        time.sleep(0.1)
-    return False
-
+        port.close()
 
-def process_config(interface, rows, log_lock, cfg, parallel_workers=None):
+def process_config(interface, rows, cfg, parallel_workers=None, source=None):
     """
     Versi stabil:
-    - ≤36 ONU → 1 worker
-    - >36 ONU → 2 worker
+    - Jumlah session config per OLT diatur AdaptiveConcurrency (AIMD dari latency, %Error, reconnect)
+      s/d ceiling; parallel_workers / cfg["config_workers"] = jumlah tetap (adaptif mati)
     - Auto-reconnect kalau SSH drop
-    - Delay antar koneksi agar OLT tidak menolak session
-    - Tambahan: simpan log CLI dan error ke olt_debug.log
+    - Tambahan: simpan log CLI dan error ke transcript job/port (transcript.py)
+    - Config dikirim per batch (CONFIG_BATCH_SIZE ONU), error dipetakan ke ONU & perintahnya
+    - source (mode pipeline): queue.Queue berisi row yang baru ter-commit, diakhiri None;
+      `rows` = semua ONU yang diharapkan masuk queue
+    - Command journal: ONU yang config-nya sudah di-ack sukses run sebelumnya tidak dikirim ulang
+    - cfg["config_mode"] = "diff": running-config ONU dibaca dulu (satu kiriman per batch),
+      hanya baris yang kurang/beda yang dikirim; ONU yang sudah sesuai tidak dikirim apa-apa
+    - Bookkeeping (pilih ONU, worker, hasil per ONU) di ConfigPort, sama dengan async_engine
     """
-    status_map = load_status_map(LOG_CSV)
-    to_config = [r for r in rows if status_map.get(_key_of(r)) == "registered"]
-
-    if not to_config:
-        print("Tidak ada ONU berstatus 'registered' untuk dikonfigurasi.")
-        with progress_lock:
-            progress_dict[interface] = {"status": "FINISHED"}
-        return
-
-    total = len(to_config)
-
-    # 🧠 Tentukan jumlah worker otomatis
-    if parallel_workers is None:
-        parallel_workers = 1 if total <= 36 else 2
-
-    print(f"⚙️ Total {total} ONU → Jalankan dengan {parallel_workers} worker (stabil mode).")
-
-    with progress_lock:
-        progress_dict[interface] = {"done": 0, "total": total, "status": "RUNNING"}
-
-    # 🔹 Bagi ONU merata per worker
-    chunks = [to_config[i::parallel_workers] for i in range(parallel_workers)]
-
-    # 🔒 Lock global untuk menulis log CLI
-    global debug_lock
-    if "debug_lock" not in globals():
-        debug_lock = threading.Lock()
-
-    def worker_thread(worker_id, subset):
-        print(f"🧩 Worker-{worker_id} mulai, {len(subset)} ONU")
+    journal, jid = get_journal(), journal_id(cfg)
+    port = ConfigPort(interface, cfg, append_logs, journal.acked(jid, interface, "config"))
+
+    if source is None:
+        to_config = port.select(rows, load_status_map())
+        if not to_config:
+            return
+        work = queue.Queue()
+        for r in to_config:
+            work.put(r)
+        work.put(None)
+        total = len(to_config)
+    else:
+        work = source
+        total = len(rows)
+
+    # 🧠 Worker adaptif: thread secukupnya s/d ceiling, yang aktif dibatasi controller per OLT
+    parallel_workers = port.plan_workers(total, parallel_workers, pipeline=source is not None)
+    ctrl = port.ctrl
+
+    def worker_thread(worker_id):
+        print(f"🧩 Worker-{worker_id} mulai")
         cli, sh = None, None
+        handled = 0
 
         def safe_connect():
             nonlocal cli, sh
             try:
                 if cli:
                     cli.close()
+                    metrics.SSH_RECONNECTS.inc(olt=port.olt, interface=interface)
                 cli, sh = ssh_connect(cfg)
                 enter_config(sh)
-                time.sleep(1)  # 🛠️ beri waktu 1 detik agar prompt stabil
                 print(f"🔁 Worker-{worker_id}: SSH reconnected.")
             except Exception as e:
                 print(f"❌ Worker-{worker_id}: Gagal reconnect SSH ({e}), retry 5s...")
+                if ctrl:
+                    ctrl.congestion("reconnect")
                 time.sleep(5)
                 safe_connect()
 
+        def open_session():
+            """Slot controller dulu, baru session. False kalau job dibatalkan selama antri slot."""
+            if ctrl and not ctrl.acquire(cfg):
+                return False
+            safe_connect()
+            return True
 
-        # koneksi awal
-        safe_connect()
-
-        for r in subset:
-            try:
-                block = build_config_block(r, cfg["vlan_prefix"])
-                out = send_block(sh, block)
-                wait_prompt(sh)
-                time.sleep(0.3)
-
-                # 🪵 Simpan hasil CLI ke log
-                with debug_lock:
-                    with open("olt_debug.log", "a", encoding="utf-8") as dbg:
-                        dbg.write(f"\n--- CONFIG {interface} ONU {r['onu_id']} (Worker-{worker_id}) ---\n{out}\n")
-
-                if "%Error" in out or "Invalid" in out:
-                    status, msg = "error", "Error during config"
-                else:
-                    status, msg = "success", "Configured OK"
-
-            except Exception as e:
-                # 🪵 Simpan error ke log
-                with debug_lock:
-                    with open("olt_debug.log", "a", encoding="utf-8") as dbg:
-                        dbg.write(f"\n❌ Worker-{worker_id} Exception ONU {r['onu_id']}:\n{str(e)}\n")
-
-                # jika koneksi drop, reconnect dan ulang perintah
-                print(f"⚠️ Worker-{worker_id}: Exception saat ONU {r['onu_id']} → {e}")
-                if "WinError 10054" in str(e) or "closed" in str(e).lower():
-                    safe_connect()
-                    try:
-                        block = build_config_block(r, cfg["vlan_prefix"])
-                        out = send_block(sh, block)
-                        wait_prompt(sh)
-                        time.sleep(0.3)
-
-                        # 🪵 Simpan hasil CLI retry
-                        with debug_lock:
-                            with open("olt_debug.log", "a", encoding="utf-8") as dbg:
-                                dbg.write(f"\n--- RETRY CONFIG {interface} ONU {r['onu_id']} (Worker-{worker_id}) ---\n{out}\n")
-
-                        status, msg = "success", "Configured after reconnect"
-                    except Exception as e2:
-                        status, msg = "error", f"Retry failed: {e2}"
-                else:
-                    status, msg = "error", f"Exception: {e}"
-
-            # update hasil ke CSV
-            append_log(log_lock, LOG_CSV, {
-                "interface": r["interface"],
-                "onu_id": r["onu_id"],
-                "sn": r["sn"],
-                "name": r.get("name", ""),
-                "status": status,
-                "message": msg
-            })
-
-            with progress_lock:
-                progress_dict[interface]["done"] += 1
-
-        print(f"✅ Worker-{worker_id} selesai ({len(subset)} ONU).")
-        if cli:
+        def close_session():
+            nonlocal cli, sh
             cli.close()
+            cli, sh = None, None
+            if ctrl:
+                ctrl.release()
+
+        def send_batch(batch, title="CONFIG"):
+            """Kirim config beberapa ONU sekaligus, hasil dipetakan balik per ONU."""
+            running = None
+            if port.diff_mode:
+                # 🔎 running-config semua ONU batch dalam satu kiriman → hanya baris yang kurang/beda
+                running = parse_running_config(send_block(sh, running_config_query(batch)))
+            lines, owners = port.batch_lines(batch, running)
+            if not lines:
+                return [CONFIG_IN_SYNC] * len(batch), []
+            block = "\n".join(lines)
+            entry = journal.begin(jid, interface, "config", block, [onu_key(r) for r in batch])
+            t0 = time.perf_counter()
+            out = send_block(sh, block)
+            outcome, suspects, acks, missing = port.batch_sent(batch, lines, owners, out,
+                                                               time.perf_counter() - t0, title, worker_id)
+            journal.ack(entry, acks)
+            if missing:
+                safe_connect()  # prompt tidak kembali → posisi mode CLI tidak jelas
+            elif any(status == "error" for status, _ in outcome):
+                enter_config(sh)  # kembalikan mode untuk kiriman berikutnya (hanya kalau bergeser)
+            return outcome, suspects
+
+        # 🔹 Ambil ONU dari queue bersama; None = tidak ada ONU lagi
+        stop = False
+        try:
+            while not stop:
+                if cancelled(cfg):
+                    work.put(None)  # worker lain ikut berhenti; ONU sisa tetap 'registered' untuk resume
+                    break
+                try:
+                    r = work.get_nowait()
+                except queue.Empty:
+                    # queue kosong (pipeline masih menunggu commit) → lepas session dulu
+                    # supaya slot budget bisa dipakai register; dibuka lagi saat ada ONU
+                    if cli:
+                        close_session()
+                    r = work.get()
+
+                # ambil ONU lain yang sudah siap (tanpa menunggu) sampai batch_size
+                batch = []
+                while r is not None:
+                    batch.append(r)
+                    if len(batch) >= port.batch_size:
+                        break
+                    try:
+                        r = work.get_nowait()
+                    except queue.Empty:
+                        break
+                if r is None:
+                    work.put(None)  # supaya worker lain ikut berhenti
+                    stop = True
+                if not batch:
+                    break
+                batch = port.skip_journaled(batch)
+                if not batch:
+                    continue
 
-    # 🔹 Jalankan worker dengan jeda antar koneksi
+                if sh is None and not open_session():  # koneksi baru dibuka saat ada ONU
+                    work.put(None)  # dibatalkan saat antri slot; batch ini tetap 'registered'
+                    break
+                handled += len(batch)
+                try:
+                    outcome, suspects = send_batch(batch)
+                    if suspects:
+                        # error berantai setelah ONU gagal → ulang sekali dengan mode yang sudah bersih
+                        again, _ = send_batch([batch[i] for i in suspects], "RECHECK CONFIG")
+                        for i, res in zip(suspects, again):
+                            outcome[i] = res
+
+                except Exception as e:
+                    port.failed(batch, worker_id, e)
+
+                    # jika koneksi drop, reconnect dan ulang perintah
+                    ids = ",".join(r["onu_id"].strip() for r in batch)
+                    print(f"⚠️ Worker-{worker_id}: Exception saat ONU {ids} → {e}")
+                    if "WinError 10054" in str(e) or "closed" in str(e).lower():
+                        safe_connect()
+                        try:
+                            outcome, _ = send_batch(batch, "RETRY CONFIG")
+                            outcome = [(status, "Configured after reconnect" if status == "success" else msg)
+                                       for status, msg in outcome]
+                        except Exception as e2:
+                            outcome = [("error", f"Retry failed: {e2}")] * len(batch)
+                    else:
+                        outcome = [("error", f"Exception: {e}")] * len(batch)
+
+                # update hasil ke CSV
+                port.record(batch, outcome)
+
+                if ctrl and ctrl.over_limit():
+                    close_session()  # batas session turun → lepas slot, antri lagi di kiriman berikutnya
+
+        finally:
+            # exception tak terduga (mis. tulis hasil gagal) → session & slot controller tetap dilepas
+            if cli:
+                close_session()
+        print(f"✅ Worker-{worker_id} selesai ({handled} ONU).")
+
+    # 🔹 Jalankan worker; tanpa controller pakai jeda antar koneksi seperti dulu
     threads = []
-    for i, subset in enumerate(chunks, start=1):
-        t = threading.Thread(target=worker_thread, args=(i, subset))
+    for i in range(1, parallel_workers + 1):
+        t = threading.Thread(target=worker_thread, args=(i,))
         t.start()
         threads.append(t)
-        time.sleep(0.5)  # jeda antar koneksi agar OLT tidak overload
+        if not ctrl:
+            time.sleep(0.5)  # jeda antar koneksi agar OLT tidak overload
 
     for t in threads:
         t.join()
-
-    with progress_lock:
-        progress_dict[interface]["status"] = "FINISHED"
+    port.finish()
 
     print(f"🎯 Semua {total} ONU di {interface} selesai dikonfigurasi (mode stabil).")
 
 
+def process_pipeline(interface, rows, cfg, parallel_workers=None):
+    """
+    Register → config tanpa menunggu seluruh port commit:
+    - ONU yang sudah 'registered' dari run sebelumnya langsung masuk queue config
+    - ONU baru masuk queue begitu terlihat di 'show gpon onu state'
+      (setelah tiap batch & selama commit wait)
+    - worker config jalan paralel dengan batch register berikutnya
+    """
+    to_register, ready = pipeline_split(interface, rows, load_status_map())
+    if not to_register and not ready:
+        return
 
+    work = queue.Queue()
+    for r in ready:
+        work.put(r)
 
+    config_error = []
 
-# --------------------------- MAIN ----------------------------
-def main(csv_path, cfg, mode="full"):
-    print(f"🟢 MAIN DIPANGGIL: mode={mode}, file={csv_path}")
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = list(csv.DictReader(f))
+    def run_config():
+        try:
+            process_config(interface, to_register + ready, cfg, parallel_workers, work)
+        except Exception as e:  # termasuk JobCancelled → diteruskan ke run_port
+            config_error.append(e)
+
+    config_thread = threading.Thread(target=run_config)
+    config_thread.start()
+    try:
+        if to_register:
+            process_register(interface, to_register, cfg, on_commit=lambda new: [work.put(r) for r in new])
+    finally:
+        work.put(None)
+        config_thread.join()
+    if config_error:
+        raise config_error[0]
 
-    if not reader:
-        print("❌ CSV kosong.")
-        return
 
-    ports = {r["interface"].strip() for r in reader if r.get("interface")}
-    if len(ports) != 1:
-        raise ValueError(f"❌ File harus berisi 1 port saja, ditemukan {len(ports)} port: {', '.join(ports)}")
 
-    interface = list(ports)[0]
-    log_lock = threading.Lock()
 
-    status_map = load_status_map(LOG_CSV)
-    to_register = [r for r in reader if status_map.get(_key_of(r)) not in {"registered", "success"}]
-    to_config = [r for r in reader if status_map.get(_key_of(r)) != "success"]
+
+# --------------------------- MAIN ----------------------------
+def run_port(interface, rows, cfg, mode, status_map):
+    """Register lalu config untuk satu port (dipanggil paralel oleh main)."""
+    check_cancel(cfg)
+    to_register = [r for r in rows if status_map.get(_key_of(r)) not in {"registered", "success"}]
+    to_config = [r for r in rows if status_map.get(_key_of(r)) != "success"]
+
+    workers = None
+    if "config_workers" in cfg and str(cfg["config_workers"]).isdigit():
+        workers = int(cfg["config_workers"])
+
+    if mode == "pipeline":
+        process_pipeline(interface, rows, cfg, parallel_workers=workers)
+        return
 
     if mode in ["register", "full"]:
         if to_register:
-            print(f"🚀 REGISTER di {interface}: {len(to_register)} ONU (batch {BATCH_SIZE})")
+            print(f"🚀 REGISTER di {interface}: {len(to_register)} ONU (batch adaptif)")
             with progress_lock:
                 progress_dict[interface] = {"done": 0, "total": len(to_register), "status": "WAITING"}
-            process_register(interface, to_register, log_lock, cfg)
+            process_register(interface, to_register, cfg)
         else:
-            print("✅ Semua ONU sudah registered/success. Lewati tahap register.")
+            print(f"✅ {interface}: semua ONU sudah registered/success. Lewati tahap register.")
 
     if mode in ["config", "full"]:
         print(f"⚙️ CONFIG di {interface}: eksekusi hanya untuk 'registered' (skip pending/success).")
-        workers = None
-        if "config_workers" in cfg and str(cfg["config_workers"]).isdigit():
-            workers = int(cfg["config_workers"])
+        process_config(interface, to_config, cfg, parallel_workers=workers)
 
-        process_config(interface, to_config, log_lock, cfg, parallel_workers=workers)
 
+def main(csv_path, cfg, mode="full"):
+    """
+    Bisa multi-port: baris CSV dikelompokkan per interface lalu tiap port
+    dijalankan paralel. Total session SSH ke OLT tetap dibatasi session_budget().
+    mode: "register" | "config" | "full" | "pipeline" (config mulai begitu ONU commit)
+    cfg["engine"] = "async" → dijalankan oleh async_engine (asyncio, tanpa thread per session)
+    """
+    if cfg.get("engine") == "async":
+        import async_engine
+        return async_engine.main(csv_path, cfg, mode)
 
+    cfg = with_plan(with_journal(cfg, csv_path), csv_path)
+    print(f"🟢 MAIN DIPANGGIL: mode={mode}, file={csv_path}")
+    ports = group_by_port(read_onu_csv(csv_path, config=mode != "register"))  # CsvError kalau tidak valid
+    if not ports:
+        print("❌ CSV kosong.")
+        return
+
+    status_map = load_status_map()
+    with progress_lock:
+        for interface, rows in ports.items():
+            progress_dict[interface] = {"done": 0, "total": len(rows), "status": "WAITING"}
+
+    max_sessions = int(cfg.get("max_sessions") or MAX_SESSIONS_PER_OLT)
+    print(f"🗂️ {len(ports)} port, max {max_sessions} session SSH bersamaan ke OLT {cfg['host']}")
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=min(len(ports), max_sessions)) as pool:
+        futures = {pool.submit(run_port, interface, rows, cfg, mode, status_map): interface
+                   for interface, rows in ports.items()}
+        for fut in as_completed(futures):
+            interface = futures[fut]
+            try:
+                fut.result()
+            except Exception as e:
+                errors[interface] = e
+                print(f"❌ {interface} gagal: {e}")
+                with progress_lock:
+                    progress_dict.setdefault(interface, {})["status"] = \
+                        "CANCELLED" if isinstance(e, JobCancelled) else "ERROR"
+
+    finish_writes(cfg)  # satu write untuk semua port (juga kalau ada port gagal / dibatalkan)
+    transcript.flush()
+    result_store().compact()
+    stopped = [i for i, e in errors.items() if isinstance(e, JobCancelled)]
+    if stopped:
+        raise JobCancelled(f"Job dibatalkan ({len(stopped)}/{len(ports)} port berhenti di tengah)")
+    if errors:
+        raise RuntimeError(f"{len(errors)}/{len(ports)} port gagal: " +
+                           "; ".join(f"{i}: {e}" for i, e in errors.items()))
     print("🎉 Semua proses selesai.")
     return "done"
@@ -0,0 +1,223 @@
+"""
+Result store untuk hasil registrasi ONU.
+
+Pengganti pola lama "baca seluruh CSV → cari baris → tulis ulang seluruh CSV"
+di setiap update:
+- Backend SQLite mode WAL (append-only journal, aman dibaca banyak thread/proses)
+- Index in-memory (interface, onu_id, sn) → row, di-refresh incremental via kolom version
+- Compaction periodik di thread background (checkpoint WAL + export hasil_registrasi.csv,
+  format lama tetap sama) → upsert tidak pernah menunggu export CSV
+"""
+import atexit, csv, os, sqlite3, threading
+
+FIELDNAMES = ["interface", "onu_id", "sn", "name", "status", "message"]
+
+EXPORT_EVERY        = 200    # compact/export CSV setiap N update
+EXPORT_INTERVAL_SEC = 10     # ... atau tiap N detik selama masih ada update yang belum di-export
+
+
+def key_of(row):
+    return (row.get("interface", "").strip(),
+            row.get("onu_id", "").strip(),
+            row.get("sn", "").strip())
+
+
+class ResultStore:
+    def __init__(self, csv_path):
+        # absolut: export dari thread result-export / atexit tetap ke folder asal walau cwd sudah pindah
+        self.csv_path = os.path.abspath(csv_path)
+        self.db_path = os.path.splitext(self.csv_path)[0] + ".db"
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._rows = {}          # key → dict(row)
+        self._versions = {}      # key → version terakhir row tsb (untuk delta since=version)
+        self._version = 0        # version terbesar yang sudah masuk index
+        self._dirty = 0          # update sejak export terakhir
+        self._export_due = threading.Event()
+        self._exporter = None    # thread compaction, baru dijalankan saat upsert pertama
+
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                interface TEXT NOT NULL,
+                onu_id    TEXT NOT NULL,
+                sn        TEXT NOT NULL,
+                name      TEXT,
+                status    TEXT,
+                message   TEXT,
+                version   INTEGER NOT NULL,
+                PRIMARY KEY (interface, onu_id, sn)
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_version ON results(version)")
+
+        with self._lock:
+            self._import_legacy_csv()
+            self._refresh()
+
+    # ---------------- internal ----------------
+    def _import_legacy_csv(self):
+        """Sekali saja: DB masih kosong tapi hasil_registrasi.csv lama sudah ada."""
+        if not os.path.exists(self.csv_path):
+            return
+        if self._db.execute("SELECT 1 FROM results LIMIT 1").fetchone():
+            return
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            rows = [r for r in csv.DictReader(f) if r]
+        self._db.execute("BEGIN IMMEDIATE")
+        for v, r in enumerate(rows, start=1):
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?)",
+                (*key_of(r), r.get("name", ""), r.get("status", ""), r.get("message", ""), v))
+        self._db.execute("COMMIT")
+
+    def _refresh(self):
+        """Ambil baris yang berubah sejak version terakhir (termasuk tulisan proses lain)."""
+        cur = self._db.execute(
+            "SELECT interface, onu_id, sn, name, status, message, version FROM results "
+            "WHERE version > ? ORDER BY rowid", (self._version,))
+        for *vals, version in cur:
+            row = dict(zip(FIELDNAMES, vals))
+            self._rows[key_of(row)] = row
+            self._versions[key_of(row)] = version
+            self._version = max(self._version, version)
+
+    # ---------------- API ----------------
+    def upsert(self, row_dict):
+        row = {k: str(row_dict.get(k, "") or "") for k in FIELDNAMES}
+        key = key_of(row)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._db.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM results").fetchone()[0]
+                self._db.execute("""
+                    INSERT INTO results VALUES (?,?,?,?,?,?,?)
+                    ON CONFLICT(interface, onu_id, sn) DO UPDATE SET
+                        name=excluded.name, status=excluded.status,
+                        message=excluded.message, version=excluded.version""",
+                    (*key, row["name"], row["status"], row["message"], version))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._refresh()
+            self._dirty += 1
+            if self._exporter is None:
+                self._exporter = threading.Thread(target=self._export_loop, daemon=True, name="result-export")
+                self._exporter.start()
+                atexit.register(self._export_at_exit)
+            due = self._dirty >= EXPORT_EVERY
+        if due:
+            self._export_due.set()   # cukup sinyal; export dikerjakan thread result-export
+
+    def rows(self):
+        with self._lock:
+            self._refresh()
+            return [dict(r) for r in self._rows.values()]
+
+    def status_map(self):
+        with self._lock:
+            self._refresh()
+            return {k: (r.get("status") or "").lower() for k, r in self._rows.items()}
+
+    def version(self):
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def query(self, status=None, interface=None, since=None, offset=0, limit=None):
+        """
+        Baca hasil dengan filter & paging. Return dict:
+        - rows   : dict row + "version", urut port/ONU (atau urut version kalau since dipakai)
+        - total  : jumlah row yang cocok filter saat ini (sebelum paging / delta)
+        - since  : rows hanya berisi row yang berubah setelah version tsb (delta untuk client);
+                   "more" = masih ada delta, lanjutkan dengan since=version balasan
+        """
+        status = status.lower() if status else None
+        with self._lock:
+            self._refresh()
+            items = [(k, r) for k, r in self._rows.items()
+                     if (not status or (r.get("status") or "").lower() == status)
+                     and (not interface or k[0] == interface)]
+            total = len(items)
+            if since is None:
+                items.sort(key=lambda kr: (kr[0][0], int(kr[0][1]) if kr[0][1].isdigit() else 0, kr[0][2]))
+            else:
+                items = sorted((kr for kr in items if self._versions[kr[0]] > since),
+                               key=lambda kr: self._versions[kr[0]])
+            end = None if limit is None else offset + limit
+            rows = [dict(r, version=self._versions[k]) for k, r in items[offset:end]]
+            more = since is not None and len(items) > len(rows)
+            return {
+                "rows": rows,
+                "total": total,
+                "version": rows[-1]["version"] if more else self._version,
+                "more": more,
+            }
+
+    def has_interface(self, interface):
+        with self._lock:
+            self._refresh()
+            return any(k[0] == interface for k in self._rows)
+
+    def _pending(self):
+        with self._lock:
+            return self._dirty
+
+    def _export_loop(self):
+        """Thread result-export: compact tiap EXPORT_EVERY update, atau tiap EXPORT_INTERVAL_SEC kalau ada update."""
+        while True:
+            self._export_due.wait(EXPORT_INTERVAL_SEC)
+            self._export_due.clear()
+            if self._pending():
+                self.compact()
+
+    def _export_at_exit(self):
+        if self._pending():
+            self.compact()
+
+    def compact(self):
+        """
+        Checkpoint WAL lalu export CSV (atomic replace) — format sama dengan file lama.
+        - File temp unik per proses/thread → beberapa proses bisa export bersamaan
+        - Gagal export hanya warning (return False): SQLite tetap sumber data, CSV cuma salinan
+        """
+        with self._export_lock:
+            with self._lock:
+                self._refresh()
+                rows = list(self._rows.values())
+                self._dirty = 0
+                try:
+                    self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    print(f"⚠️ Checkpoint WAL {self.db_path} gagal: {e}")
+
+            tmp = f"{self.csv_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "w", newline="", encoding="utf-8") as f:
+                    w = csv.DictWriter(f, fieldnames=FIELDNAMES)
+                    w.writeheader()
+                    w.writerows(rows)
+                os.replace(tmp, self.csv_path)
+                return True
+            except OSError as e:
+                print(f"⚠️ Export {self.csv_path} gagal (hasil tetap tersimpan di {self.db_path}): {e}")
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                return False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(csv_path):
+    """Satu ResultStore per file per proses."""
+    path = os.path.abspath(csv_path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ResultStore(csv_path)
+        return _stores[path]
@@ -0,0 +1,70 @@
+"""
+AdaptiveConcurrency (AIMD session config per OLT): naik +1/limit saat sehat, turun × AIMD_DECREASE saat overload.
+
+Jalankan: python -m pytest tests/
+"""
+import os, sys, threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import regis_onu_zte as core
+from regis_onu_zte import AdaptiveConcurrency
+
+
+@pytest.fixture
+def no_cooldown(monkeypatch):
+    monkeypatch.setattr(core, "AIMD_COOLDOWN_SEC", 0)
+
+
+def healthy(ctrl, n=1):
+    for _ in range(n):
+        ctrl.record(0.1, 10)
+
+
+def test_additive_increase_up_to_ceiling():
+    ctrl = AdaptiveConcurrency("olt-test", ceiling=4, start=2)
+    seen = []
+    for _ in range(12):
+        healthy(ctrl)
+        seen.append(ctrl.current)
+    assert seen[:3] == [2, 2, 3]          # 2 → 2.5 → 2.9 → 3.24: ≈ +1 setelah tiap session aktif mengirim sekali
+    assert seen[-1] == 4 and ctrl.limit == 4.0
+
+
+def test_multiplicative_decrease_with_cooldown():
+    ctrl = AdaptiveConcurrency("olt-test", ceiling=8, start=8)
+    ctrl.record(1.0, 10, timeout=True)
+    assert ctrl.current == 4
+    ctrl.congestion("reconnect")          # masih di jendela cooldown: satu kejadian → satu kali turun
+    assert ctrl.current == 4
+
+
+def test_decrease_never_below_one(no_cooldown):
+    ctrl = AdaptiveConcurrency("olt-test", ceiling=4, start=4)
+    for _ in range(5):
+        ctrl.congestion("rejected")
+    assert ctrl.current == 1 and ctrl.limit == 1.0
+
+
+@pytest.mark.parametrize("seconds, errors", [(0.5, 0), (0.1, 2)], ids=["latency", "error"])
+def test_overload_signals(no_cooldown, seconds, errors):
+    ctrl = AdaptiveConcurrency("olt-test", ceiling=4, start=4)
+    healthy(ctrl)                          # baseline 0.01 s/perintah
+    ctrl.record(seconds, 10, errors=errors)
+    assert ctrl.current == 2
+
+
+def test_slots_follow_limit():
+    ctrl = AdaptiveConcurrency("olt-test", ceiling=4, start=2)
+    assert ctrl.try_acquire() and ctrl.try_acquire()
+    assert not ctrl.try_acquire()
+    ctrl.congestion("timeout")
+    assert ctrl.over_limit()               # worker di atas batas harus melepas session
+    ctrl.release()
+    assert not ctrl.over_limit()
+
+    cancel = threading.Event()
+    cancel.set()
+    assert ctrl.acquire({"cancel": cancel}) is False
@@ -0,0 +1,109 @@
+"""
+config_delta / parse_running_config terhadap output running-config ZTE asli (bukan simulator).
+
+Jalankan: python -m pytest tests/
+"""
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from onu_csv import FIELDS, OnuRow
+from regis_onu_zte import config_delta, config_lines, parse_running_config
+
+VLAN_PREFIX = "vlan"
+
+# Output send_block(running_config_query([ONU 1/2/1:1])) dari C320 V2.1: echo perintah + prompt,
+# indent 2 spasi, nama tcont/gemport otomatis, gemport format lama, password tersamar
+RUNNING_OK = """\
+ZXAN(config)#show running-config interface gpon-onu_1/2/1:1
+Building configuration...
+interface gpon-onu_1/2/1:1
+  name Cust_1
+  description G1
+  tcont 1 name T1 profile 10M
+  gemport 1 name G1 unicast tcont 1 dir both
+  service-port 1 vport 1 user-vlan 130 vlan 130
+  service-port 2 vport 1 user-vlan 131 vlan 131
+!
+end
+ZXAN(config)#show onu running config gpon-onu_1/2/1:1
+pon-onu-mng gpon-onu_1/2/1:1
+  service pppoe gemport 1 vlan 130
+  wan-ip 1 mode pppoe username user1 password ******** vlan-profile vlan130 host 1
+  service hotspot gemport 1 vlan 131
+  vlan port wifi_0/4 mode tag vlan 131
+  ssid auth wep wifi_0/4 open-system
+  ssid ctrl wifi_0/4 name ssid1
+  interface wifi wifi_0/4 state unlock
+  security-mgmt 1 state enable mode forward protocol web
+!
+ZXAN(config)#"""
+
+RUNNING_MISSING = """\
+ZXAN(config)#show running-config interface gpon-onu_1/2/1:1
+%Error 20206: The ONU does not exist.
+ZXAN(config)#show onu running config gpon-onu_1/2/1:1
+%Error 20206: The ONU does not exist.
+ZXAN(config)#"""
+
+
+def onu(**overrides):
+    values = dict(interface="gpon-olt_1/2/1", onu_id="1", sn="ZTEG00000001", name="Cust 1", description="G1",
+                  profile="10M", username="user1", password="rahasia", vlan_inet="130", vlan_hotspot="131",
+                  wifi_ssid="ssid1")
+    values.update(overrides)
+    return OnuRow([values[f] for f in FIELDS], 2)
+
+
+def test_parse_sections_from_real_output():
+    model = parse_running_config(RUNNING_OK)
+    assert set(model) == {("interface", "gpon-onu_1/2/1:1"), ("pon-onu-mng", "gpon-onu_1/2/1:1")}
+    iface = model[("interface", "gpon-onu_1/2/1:1")]
+    assert "tcont 1 profile 10M" in iface
+    assert "gemport 1 tcont 1" in iface
+    assert not any(l.startswith(("Building", "end", "ZXAN")) for l in iface)
+
+
+def test_configured_onu_is_in_sync():
+    assert config_delta(config_lines(onu(), VLAN_PREFIX), parse_running_config(RUNNING_OK)) == []
+
+
+def test_password_is_not_kept_in_parsed_model():
+    mng = parse_running_config(RUNNING_OK)[("pon-onu-mng", "gpon-onu_1/2/1:1")]
+    assert "wan-ip 1 mode pppoe username user1 password * vlan-profile vlan130 host 1" in mng
+
+
+def test_changed_username_resends_wan_line():
+    delta = config_delta(config_lines(onu(username="user9"), VLAN_PREFIX), parse_running_config(RUNNING_OK))
+    assert delta == [
+        "pon-onu-mng gpon-onu_1/2/1:1",
+        "wan-ip 1 mode pppoe username user9 password rahasia vlan-profile vlan130 host 1",
+        "exit",
+    ]
+
+
+def test_resend_secrets_opt_in():
+    delta = config_delta(config_lines(onu(), VLAN_PREFIX), parse_running_config(RUNNING_OK), resend_secrets=True)
+    assert delta == [
+        "pon-onu-mng gpon-onu_1/2/1:1",
+        "wan-ip 1 mode pppoe username user1 password rahasia vlan-profile vlan130 host 1",
+        "exit",
+    ]
+
+
+def test_changed_service_port_is_removed_first():
+    delta = config_delta(config_lines(onu(vlan_hotspot="140"), VLAN_PREFIX), parse_running_config(RUNNING_OK))
+    head = delta[:delta.index("exit") + 1]
+    assert head == [
+        "interface gpon-onu_1/2/1:1",
+        "no service-port 2",
+        "service-port 2 vport 1 user-vlan 140 vlan 140",
+        "exit",
+    ]
+    assert "vlan port wifi_0/4 mode tag vlan 140" in delta
+    assert "service pppoe gemport 1 vlan 130" not in delta
+
+
+def test_missing_onu_gets_full_block():
+    lines = config_lines(onu(), VLAN_PREFIX)
+    assert config_delta(lines, parse_running_config(RUNNING_MISSING)) == lines
@@ -0,0 +1,84 @@
+"""
+Command journal: run ulang dengan journal_id yang sama tidak mengirim ulang block yang sudah di-ack.
+
+Jalankan: python -m pytest tests/
+"""
+import os, sys, threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import regis_onu_zte as core
+from benchmark import make_csv
+from journal import CommandJournal, get_journal, onu_key
+from onu_csv import group_by_port, read_onu_csv
+from zte_simulator import ZteSimulator
+
+JID = "test-job"
+INTERFACE = "gpon-olt_1/2/1"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # journal.db, hasil_registrasi.*, olt_probe.json per test
+    return tmp_path
+
+
+def test_acked_skips_sent_and_expired(workdir):
+    j = CommandJournal("journal.db")
+    a, b = {"onu_id": "1", "sn": "SN1"}, {"onu_id": "2", "sn": "SN2"}
+    entry = j.begin(JID, INTERFACE, "register", "onu 1\nonu 2", [onu_key(a), onu_key(b)])
+    assert j.acked(JID, INTERFACE, "register") == {}
+    assert j.unacked(JID, INTERFACE, "register") == 1
+    j.ack(entry, {onu_key(a): "ok", onu_key(b): "error"})
+    assert j.acked(JID, INTERFACE, "register") == {"1|SN1": "ok", "2|SN2": "error"}
+    assert j.done(JID, INTERFACE, "register", "  onu 1\n\nonu 2")  # hash tanpa spasi/baris kosong
+    j.expire(JID, INTERFACE, "register", [onu_key(a)])
+    assert j.acked(JID, INTERFACE, "register") == {"2|SN2": "error"}
+    assert j.acked("job-lain", INTERFACE, "register") == {}
+
+
+def test_register_resume_skips_acked_blocks(workdir, monkeypatch):
+    make_csv("onu.csv", 40)
+    rows = group_by_port(read_onu_csv("onu.csv", config=False))[INTERFACE]
+    begun = []   # ONU per block register yang dikirim
+    acks = 0
+    cancel = threading.Event()
+
+    real_begin, real_ack = CommandJournal.begin, CommandJournal.ack
+
+    def begin(self, journal, interface, kind, block, onus=()):
+        if kind == "register":
+            begun.append(list(onus))
+        return real_begin(self, journal, interface, kind, block, onus)
+
+    def ack(self, entry_id, results=None):
+        nonlocal acks
+        real_ack(self, entry_id, results)
+        if results:
+            acks += 1
+            if acks == 2:
+                cancel.set()  # "proses mati" setelah batch ke-2 di-ack
+
+    monkeypatch.setattr(CommandJournal, "begin", begin)
+    monkeypatch.setattr(CommandJournal, "ack", ack)
+
+    with ZteSimulator() as sim:
+        cfg = sim.cfg(journal_id=JID, unreg_mode="wipe", register_batch_max=8, cancel=cancel)
+        with pytest.raises(core.JobCancelled):
+            core.process_register(INTERFACE, rows, cfg)
+        first = [k for block in begun for k in block]
+        assert len(first) == 16
+        assert len(get_journal().acked(JID, INTERFACE, "register")) == 16
+
+        begun.clear()
+        cancel.clear()
+        core.process_register(INTERFACE, rows, cfg)
+        resent = [k for block in begun for k in block]
+        assert not set(first) & set(resent)                       # block yang sudah di-ack tidak dikirim ulang
+        assert sorted(resent + first) == sorted(onu_key(r) for r in rows)
+        assert len(sim.state.onus["1/2/1"]) == 40
+
+    status = core.load_status_map()
+    assert {status[core._key_of(r)] for r in rows} == {"registered"}
@@ -0,0 +1,80 @@
+"""
+Validasi CSV ONU (onu_csv): semua error dilaporkan sekaligus dengan nomor baris file.
+
+Jalankan: python -m pytest tests/
+"""
+import io, os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import onu_csv
+from onu_csv import CsvError, iter_onu_rows, read_onu_csv
+
+HEADER = "interface,onu_id,sn,name,description,profile,username,password,vlan_inet,vlan_hotspot,wifi_ssid\n"
+
+
+def row(interface="gpon-olt_1/2/1", onu_id="1", sn="ZTEG00000001", vlan_inet="130", username="user1"):
+    return f"{interface},{onu_id},{sn},Cust,G1,10M,{username},pw,{vlan_inet},131,ssid\n"
+
+
+def parse(text, config=True):
+    return list(iter_onu_rows(io.StringIO(text), config=config))
+
+
+def errors_of(text, config=True):
+    with pytest.raises(CsvError) as exc:
+        parse(text, config)
+    return exc.value
+
+
+def test_valid_rows_are_stripped_and_keep_line_numbers(tmp_path):
+    path = tmp_path / "onu.csv"
+    path.write_text("\ufeff" + HEADER.upper() + row(onu_id=" 007 ", sn=" ZTEG00000001 ") + ",,,,,,,,,,\n"
+                    + row(onu_id="8", sn="ZTEG00000002"), encoding="utf-8")
+    rows = read_onu_csv(str(path))
+    assert [(r.line, r["onu_id"], r["sn"]) for r in rows] == [(2, "7", "ZTEG00000001"), (4, "8", "ZTEG00000002")]
+    assert rows[0].get("name") == "Cust" and rows[0].get("tidak_ada", "-") == "-"
+    with pytest.raises(KeyError):
+        rows[0]["line"]  # hanya kolom CSV yang bisa dibaca seperti dict
+
+
+def test_all_errors_reported_with_row_numbers():
+    e = errors_of(HEADER
+                  + row()                                                   # 2: valid
+                  + row(interface="gpon-onu_1/2/1", sn="ZTEG00000002")      # 3
+                  + row(onu_id="129", sn="ZTEG00000003")                    # 4
+                  + row(onu_id="2", sn="zteg00000001")                      # 5: SN ganda (beda huruf)
+                  + row(onu_id="1", sn="ZTEG00000004")                      # 6: ID ganda
+                  + row(onu_id="3", sn="ZTEG00000005", vlan_inet="4095")    # 7
+                  + row(onu_id="4", sn="", username=""))                    # 8
+    assert e.errors == [
+        (3, "interface 'gpon-onu_1/2/1' bukan format gpon-olt_x/y/z"),
+        (4, "onu_id '129' harus angka 1–128"),
+        (5, "SN zteg00000001 ganda (sudah di baris 2)"),
+        (6, "onu_id 1 di gpon-olt_1/2/1 ganda (sudah di baris 2)"),
+        (7, "vlan_inet '4095' bukan VLAN 1–4094"),
+        (8, "sn kosong"),
+        (8, "username kosong"),
+    ]
+    assert "baris 6: onu_id 1" in str(e)
+
+
+def test_missing_columns_reported_on_header_line():
+    e = errors_of("interface,sn,profile\n" + "gpon-olt_1/2/1,ZTEG00000001,10M\n")
+    assert e.errors == [(1, "kolom wajib tidak ada: onu_id, username, password, vlan_inet, vlan_hotspot, wifi_ssid")]
+
+
+def test_register_only_does_not_require_config_columns():
+    rows = parse("interface,onu_id,sn\ngpon-olt_1/2/1,5,ZTEG00000001\n", config=False)
+    assert [(r.onu_id, r.username, r.line) for r in rows] == [("5", "", 2)]
+    assert errors_of("interface,onu_id,sn\ngpon-olt_1/2/1,5,ZTEG00000001\n").errors[0][0] == 1
+
+
+def test_error_list_is_capped_but_total_counted(monkeypatch):
+    monkeypatch.setattr(onu_csv, "MAX_REPORTED_ERRORS", 3)
+    e = errors_of(HEADER + "".join(row(onu_id="x", sn=f"SN{i}") for i in range(5)))
+    assert [line for line, _ in e.errors] == [2, 3, 4]
+    assert e.total == 5
+    assert str(e).endswith("... dan 2 error lain")
@@ -0,0 +1,76 @@
+"""
+Plan: password tidak pernah tersimpan di plans/*.json maupun dry-run, tapi tetap terisi saat block dibangun.
+
+Jalankan: python -m pytest tests/
+"""
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plan as plan_mod
+import regis_onu_zte as core
+from onu_csv import read_onu_csv
+
+CFG = {"vlan_prefix": "vlan", "onu_type": "ALL"}
+HEADER = "interface,onu_id,sn,name,description,profile,username,password,vlan_inet,vlan_hotspot,wifi_ssid\n"
+
+
+def secret(i):
+    return f"S3cr3t-{i}x"
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # plans/ per test
+    lines = [f"gpon-olt_1/2/1,{i},ZTEG{i:08X},Cust {i},G{i},10M,user{i},{secret(i)},130,131,ssid{i}\n"
+             for i in range(1, 4)]
+    (tmp_path / "onu.csv").write_text(HEADER + "".join(lines), encoding="utf-8")
+    return "onu.csv"
+
+
+def plan_files():
+    return [os.path.join(plan_mod.PLAN_DIR, fn) for fn in os.listdir(plan_mod.PLAN_DIR)]
+
+
+def test_plan_file_and_dry_run_have_no_password(csv_path):
+    plan, cached = plan_mod.load_or_compile(csv_path, CFG)
+    assert not cached
+    [path] = plan_files()
+    with open(path, encoding="utf-8") as f:
+        stored = f.read()
+    dry_run = "\n".join(plan_mod.render(plan))
+    for text in (stored, dry_run):
+        assert "S3cr3t" not in text
+        assert "<secret:password>" in text
+
+
+def test_secret_filled_from_row_when_block_is_built(csv_path):
+    plan_mod.load_or_compile(csv_path, CFG)
+    plan, cached = plan_mod.load_or_compile(csv_path, CFG)  # dari cache (JSON), bukan objek compile
+    assert cached
+    for row in read_onu_csv(csv_path):
+        lines = plan.config_lines(row)
+        assert lines == core.config_lines(row, CFG["vlan_prefix"])
+        assert any(secret(int(row.onu_id)) in l for l in lines)
+        assert not any("<secret:" in l for l in lines)
+
+    lines, _ = core.build_config_batch(read_onu_csv(csv_path), CFG["vlan_prefix"], plan=plan)
+    assert sum(secret(1) in l for l in lines) == 1
+
+
+def test_plan_key_ignores_credentials(csv_path):
+    a, _ = plan_mod.load_or_compile(csv_path, dict(CFG, host="10.0.0.1", password="olt-admin"))
+    b, cached = plan_mod.load_or_compile(csv_path, dict(CFG, host="10.0.0.2", password="lain"))
+    assert cached and a.key == b.key
+
+
+def test_old_format_plans_are_purged(csv_path):
+    os.makedirs(plan_mod.PLAN_DIR)
+    old = os.path.join(plan_mod.PLAN_DIR, "lama.json")
+    with open(old, "w", encoding="utf-8") as f:
+        f.write('{"format": 1, "ports": {"gpon-olt_1/2/1": [{"config": {"lines": ["password polos"]}}]}}')
+    plan_mod.load_or_compile(csv_path, CFG)
+    assert not os.path.exists(old)
+    assert len(plan_files()) == 1
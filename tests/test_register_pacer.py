@@ -0,0 +1,70 @@
+"""
+RegisterPacer (batch register adaptif) & feedback commit CommitWatcher.feedback_due().
+
+Jalankan: python -m pytest tests/
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import regis_onu_zte as core
+from regis_onu_zte import CommitWatcher, RegisterPacer
+
+
+def healthy(pacer, n=1, commit_lag=0.0):
+    reasons = [pacer.record(0.2, 20, commit_lag=commit_lag) for _ in range(n)]
+    return reasons[-1]
+
+
+def test_grows_to_model_ceiling():
+    for model, ceiling in [("C300", 32), ("C600", 64), ("", core.REGISTER_BATCH_MAX_DEFAULT)]:
+        pacer = RegisterPacer(model, start=8)
+        sizes = []
+        for _ in range(10):
+            assert healthy(pacer) is None
+            sizes.append(pacer.size)
+        assert sizes[:3] == [8 + core.REGISTER_BATCH_STEP * i for i in (1, 2, 3)]
+        assert pacer.size == ceiling and pacer.delay == 0.0
+
+
+def test_slow_echo_halves_batch_and_backs_off_delay():
+    pacer = RegisterPacer("C600", start=64)
+    healthy(pacer)
+    assert pacer.record(2.0, 20) == "latency"
+    assert (pacer.size, pacer.delay) == (32, core.REGISTER_DELAY_STEP_SEC)
+    assert pacer.record(0.2, 20, errors=5) == "error"
+    assert pacer.record(0.2, 20, timeout=True) == "timeout"
+    assert (pacer.size, pacer.delay) == (core.REGISTER_BATCH_MIN, 4 * core.REGISTER_DELAY_STEP_SEC)
+    for _ in range(10):
+        pacer.record(0.2, 20, timeout=True)
+    assert pacer.size == core.REGISTER_BATCH_MIN and pacer.delay == core.REGISTER_DELAY_MAX_SEC
+
+    healthy(pacer)                         # pulih: jeda dibagi 2, batch +step
+    assert pacer.delay == core.REGISTER_DELAY_MAX_SEC / 2
+    assert pacer.size == core.REGISTER_BATCH_MIN + core.REGISTER_BATCH_STEP
+
+
+def test_commit_lag_keeps_size_but_slows_down():
+    pacer = RegisterPacer("C300", start=32)
+    lag = core.REGISTER_COMMIT_LAG_SEC + 1
+    assert healthy(pacer, commit_lag=lag) == "commit"
+    assert pacer.size == 32 and pacer.delay == core.REGISTER_DELAY_STEP_SEC
+    assert pacer.lagging
+    healthy(pacer)
+    assert not pacer.lagging
+
+
+def test_max_size_override():
+    pacer = RegisterPacer("C600", max_size=16)
+    healthy(pacer, 5)
+    assert pacer.size == 16
+
+
+def test_feedback_read_only_when_it_can_change_the_pacer():
+    w = CommitWatcher("gpon-olt_1/2/1")
+    assert not w.feedback_due()
+    assert w.feedback_due(handoff=True)    # pipeline: ONU ter-commit langsung ke worker config
+    w.expect(["1"])
+    assert not w.feedback_due()            # lag() tanpa show (batas atas) masih di bawah ambang
+    w.expect(["2"], sent_at=time.time() - core.REGISTER_COMMIT_LAG_SEC - 1)
+    assert w.feedback_due()
@@ -0,0 +1,93 @@
+"""
+ResultStore.query: paging urut port/ONU, filter, delta since=version; ETag /results per query.
+
+Jalankan: python -m pytest tests/
+"""
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_store import ResultStore
+
+
+def onu(port, onu_id, status="registered"):
+    return {"interface": f"gpon-olt_1/2/{port}", "onu_id": str(onu_id), "sn": f"SN{port}{onu_id:03d}",
+            "status": status, "message": ""}
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ResultStore(str(tmp_path / "hasil_registrasi.csv"))
+    for port in (2, 1):
+        for onu_id in (10, 9, 1):   # urutan tulis ≠ urutan port/ONU
+            s.upsert(onu(port, onu_id))
+    return s
+
+
+def ids(result):
+    return [(r["interface"][-1], r["onu_id"]) for r in result["rows"]]
+
+
+def test_pages_sorted_by_port_then_numeric_onu_id(store):
+    first = store.query(offset=0, limit=4)
+    second = store.query(offset=4, limit=4)
+    assert ids(first) == [("1", "1"), ("1", "9"), ("1", "10"), ("2", "1")]
+    assert ids(second) == [("2", "9"), ("2", "10")]
+    assert first["total"] == second["total"] == 6
+    assert first["version"] == store.version() and not first["more"]
+
+
+def test_filter_by_status_and_interface(store):
+    store.upsert(onu(1, 9, status="SUCCESS"))
+    assert ids(store.query(status="success")) == [("1", "9")]
+    result = store.query(status="registered", interface="gpon-olt_1/2/1")
+    assert ids(result) == [("1", "1"), ("1", "10")]
+    assert result["total"] == 2
+
+
+def test_since_returns_changes_in_version_order_with_continuation(store):
+    v = store.version()
+    assert store.query(since=v) == {"rows": [], "total": 6, "version": v, "more": False}
+
+    for port, onu_id in [(2, 1), (1, 10), (1, 1)]:
+        store.upsert(onu(port, onu_id, status="success"))
+    page = store.query(since=v, limit=2)
+    assert ids(page) == [("2", "1"), ("1", "10")]   # urut version, bukan urut port
+    assert page["more"] and page["version"] == page["rows"][-1]["version"] < store.version()
+
+    rest = store.query(since=page["version"], limit=2)
+    assert ids(rest) == [("1", "1")]
+    assert not rest["more"] and rest["version"] == store.version()
+    assert store.query(status="success", since=v)["total"] == 3
+
+
+def test_rewrite_of_same_row_is_one_delta(store):
+    v = store.version()
+    store.upsert(onu(1, 9, status="error"))
+    store.upsert(onu(1, 9, status="success"))
+    delta = store.query(since=v)
+    assert [(r["onu_id"], r["status"]) for r in delta["rows"]] == [("9", "success")]
+
+
+def test_results_etag_depends_on_query(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    monkeypatch.chdir(tmp_path)  # jobs.db & hasil_registrasi.* milik test
+    import olt_web_ui
+    import regis_onu_zte as core
+    for onu_id in (1, 2, 3):
+        core.result_store().upsert(onu(1, onu_id))
+    client = olt_web_ui.app.test_client()
+
+    page1 = client.get("/results?page=1&per_page=2")
+    etag = page1.headers["ETag"]
+    assert page1.status_code == 200 and len(page1.get_json()["rows"]) == 2
+    assert client.get("/results?per_page=2&page=1", headers={"If-None-Match": etag}).status_code == 304
+    for other in ("/results?page=2&per_page=2", "/results?page=1&per_page=3", "/results?page=1&per_page=2&since=0",
+                  "/results?page=1&per_page=2&status=registered"):
+        assert client.get(other, headers={"If-None-Match": etag}).status_code == 200, other
+    assert client.get("/results?page=1&per_page=2", headers={"If-None-Match": etag[:-2] + '"'}).status_code == 200
+
+    core.result_store().upsert(onu(1, 4))
+    assert client.get("/results?page=1&per_page=2", headers={"If-None-Match": etag}).status_code == 200
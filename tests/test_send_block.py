@@ -0,0 +1,78 @@
+"""
+PromptTracker / send_block: prompt dihitung per baris block (echo ikut), '--More--' dijawab otomatis.
+
+Jalankan: python -m pytest tests/
+"""
+import os, sys, time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regis_onu_zte import (OnuStateParser, PromptTracker, enter_exec, parse_onu_state, send_block,
+                           split_by_prompt, ssh_connect)
+from zte_simulator import ZteSimulator
+
+PORT = "1/2/1"
+ONUS = 60   # > PAGE_LINES simulator (24) → output 'show gpon onu state' terpotong '--More--' dua kali
+
+
+@pytest.fixture(scope="module")
+def sim():
+    with ZteSimulator() as s:
+        s.state.onus[PORT] = {i: {"sn": f"ZTEG{i:08X}", "type": "ALL", "name": "", "created": 0}
+                              for i in range(1, ONUS + 1)}
+        yield s
+
+
+@pytest.fixture
+def shell(sim, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # olt_probe.json per test
+    cli, sh = ssh_connect(sim.cfg())
+    yield sh
+    cli.close()
+
+
+def test_tracker_waits_for_prompt_of_last_line_across_chunks():
+    t = PromptTracker(prompts=2)
+    chunks = [b"ena", b"ble\r\nZXAN#conf", b"igure terminal\r\n", b"ZXAN(con"]
+    assert [t.feed(c) for c in chunks] == [None] * len(chunks)
+    assert t.feed(b"fig)#") == "done"
+    assert t.prompt == "ZXAN(config)#"
+
+
+def test_tracker_echoed_prompt_without_newline_is_not_done():
+    t = PromptTracker(prompts=1)
+    assert t.feed(b"ZXAN#show version") is None  # echo perintah berikutnya di belakang prompt
+    assert t.feed(b"\r\nZXA10 C300\r\nZXAN#") == "done"
+
+
+def test_tracker_strips_more_marker():
+    t = PromptTracker(prompts=1)
+    assert t.feed(b"line1\r\nline2\r\n --More-- ") == "more"
+    assert t.feed(b"\x08" * 10 + b" " * 10 + b"\x08" * 10 + b"line3\r\nZXAN#") == "done"
+    assert "More" not in t.out
+    assert [l.strip() for l in t.out.splitlines()] == ["line1", "line2", "line3", "ZXAN#"]
+
+
+def test_send_block_answers_more_on_paged_output(shell):
+    parser = OnuStateParser()
+    out = send_block(shell, f"show gpon onu state gpon-olt_{PORT}", timeout=5, sink=parser.feed)
+    assert "More" not in out
+    assert [r.onu_id for r in parse_onu_state(out)] == list(range(1, ONUS + 1))
+    assert len(parser.close()) == ONUS  # sink menerima baris lengkap selama output mengalir
+    assert shell.paging_off is False     # paging ternyata aktif → dimatikan di enter_* berikutnya
+    assert shell.mode == "exec"
+
+
+def test_send_block_waits_for_every_echoed_line(shell):
+    enter_exec(shell)
+    assert shell.paging_off is True
+    block = "\n".join(["configure terminal", f"interface gpon-olt_{PORT}", "",
+                       f"show gpon onu state gpon-olt_{PORT}"])
+    t0 = time.perf_counter()
+    out = send_block(shell, block, timeout=5)
+    assert time.perf_counter() - t0 < 5  # selesai karena prompt, bukan timeout
+    assert len(split_by_prompt(out)) == 3  # baris kosong dibuang
+    assert len(parse_onu_state(out)) == ONUS
+    assert shell.mode == "sub"
@@ -0,0 +1,215 @@
+"""
+Transcript CLI per job & per port (pengganti olt_debug.log).
+
+- Worker hanya log() → queue; satu thread background yang menulis ke disk
+  (semua record yang sudah antre ditulis sekaligus, lalu flush) → worker tidak pernah menunggu disk
+- File: transcripts/<job>/<port>.<segmen>.log, rotasi tiap TRANSCRIPT_SEGMENT_BYTES,
+  segmen lama di-gzip kalau TRANSCRIPT_GZIP (offset tetap offset teks asli)
+- Index: transcripts/<job>/<port>.idx, satu baris JSON per block {"seg","off","len","at","title","onus"}
+  → read() mengambil transcript satu ONU langsung dari offset, tanpa scan file log
+- Folder job lebih tua dari TRANSCRIPT_KEEP_DAYS dihapus saat writer mulai
+"""
+import atexit, gzip, json, os, queue, re, shutil, threading, time
+from collections import OrderedDict
+
+TRANSCRIPT_DIR           = "transcripts"
+TRANSCRIPT_SEGMENT_BYTES = 8 << 20   # ukuran maksimal satu segmen per port
+TRANSCRIPT_GZIP          = True
+TRANSCRIPT_KEEP_DAYS     = 14
+TRANSCRIPT_MAX_OPEN      = 64        # file (job × port) terbuka bersamaan; yang lama ditutup dulu
+TRANSCRIPT_READ_LIMIT    = 50        # entry maksimal per read()
+
+SEGMENT_RE = re.compile(r"\.(\d+)\.log(\.gz)?$")
+
+
+def safe_name(name):
+    """Nama job/port → nama file ('gpon-olt_1/2/6' → 'gpon-olt_1_2_6')."""
+    return re.sub(r"[^\w.-]", "_", str(name))
+
+
+def _segments(base):
+    """Nomor segmen yang ada untuk satu transcript → [(no, gz)] urut."""
+    folder, prefix = os.path.split(base)
+    found = []
+    for fn in os.listdir(folder) if os.path.isdir(folder) else []:
+        m = SEGMENT_RE.search(fn)
+        if m and fn[:m.start()] == prefix:
+            found.append((int(m.group(1)), bool(m.group(2))))
+    return sorted(found)
+
+
+class _Stream:
+    """Segmen aktif + file index satu (job, port). Hanya dipakai thread writer."""
+
+    def __init__(self, base, segment_bytes, gzip_old):
+        self.base = base
+        self.segment_bytes = segment_bytes
+        self.gzip_old = gzip_old
+        segs = _segments(base)
+        # segmen terakhir sudah di-gzip (proses sebelumnya rotasi lalu mati) → mulai segmen baru
+        self.seg = (segs[-1][0] + (1 if segs[-1][1] else 0)) if segs else 0
+        self._open()
+        self.idx = open(base + ".idx", "a", encoding="utf-8")
+
+    def _path(self, seg):
+        return f"{self.base}.{seg}.log"
+
+    def _open(self):
+        self.f = open(self._path(self.seg), "ab")
+        self.size = self.f.tell()
+
+    def _rotate(self):
+        self.f.close()
+        old = self._path(self.seg)
+        if self.gzip_old:
+            with open(old, "rb") as src, gzip.open(old + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(old)
+        self.seg += 1
+        self._open()
+
+    def write(self, at, title, text, onus):
+        data = f"\n--- {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(at))} {title} ---\n{text}\n".encode()
+        if self.size and self.size + len(data) > self.segment_bytes:
+            self._rotate()
+        self.f.write(data)
+        self.idx.write(json.dumps({"seg": self.seg, "off": self.size, "len": len(data), "at": round(at, 3),
+                                   "title": title, "onus": onus}) + "\n")
+        self.size += len(data)
+
+    def flush(self):
+        self.f.flush()
+        self.idx.flush()
+
+    def close(self):
+        self.f.close()
+        self.idx.close()
+
+
+class TranscriptWriter:
+    def __init__(self, root=TRANSCRIPT_DIR, segment_bytes=TRANSCRIPT_SEGMENT_BYTES, gzip_old=TRANSCRIPT_GZIP):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.gzip_old = gzip_old
+        self._q = queue.SimpleQueue()
+        self._streams = OrderedDict()   # (job, port) → _Stream, urut terakhir dipakai
+        threading.Thread(target=self._run, daemon=True, name="transcript").start()
+        atexit.register(self.flush)
+
+    def log(self, job, interface, title, text, onus=()):
+        """Antrekan satu block output CLI (tidak menyentuh disk)."""
+        self._q.put((time.time(), safe_name(job), safe_name(interface), title, text, [str(o) for o in onus]))
+
+    def flush(self, timeout=10):
+        """Tunggu semua record yang sudah antre tertulis. Return False kalau timeout."""
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout)
+
+    def _stream(self, job, port):
+        key = (job, port)
+        if key in self._streams:
+            self._streams.move_to_end(key)
+            return self._streams[key]
+        if len(self._streams) >= TRANSCRIPT_MAX_OPEN:
+            self._streams.popitem(last=False)[1].close()
+        folder = os.path.join(self.root, job)
+        os.makedirs(folder, exist_ok=True)
+        self._streams[key] = _Stream(os.path.join(folder, port), self.segment_bytes, self.gzip_old)
+        return self._streams[key]
+
+    def _purge(self):
+        cutoff = time.time() - TRANSCRIPT_KEEP_DAYS * 86400
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _run(self):
+        self._purge()
+        while True:
+            batch = [self._q.get()]
+            while True:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            touched, waiters = set(), []
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    continue
+                at, job, port, title, text, onus = item
+                try:
+                    stream = self._stream(job, port)
+                    stream.write(at, title, text, onus)
+                    touched.add(stream)
+                except OSError as e:
+                    print(f"⚠️ Gagal tulis transcript {job}/{port}: {e}")
+            for stream in touched:
+                try:
+                    stream.flush()
+                except (OSError, ValueError):
+                    pass  # stream sudah ditutup (melewati TRANSCRIPT_MAX_OPEN) → sudah di-flush saat close
+            for done in waiters:
+                done.set()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Satu TranscriptWriter (thread) per proses."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = TranscriptWriter()
+        return _writer
+
+
+def log(job, interface, title, text, onus=()):
+    get_writer().log(job, interface, title, text, onus)
+
+
+def flush(timeout=10):
+    return _writer.flush(timeout) if _writer else True
+
+
+def _read_entry(base, entry):
+    path = f"{base}.{entry['seg']}.log"
+    opener = (lambda: open(path, "rb")) if os.path.exists(path) else (lambda: gzip.open(path + ".gz", "rb"))
+    with opener() as f:
+        f.seek(entry["off"])
+        return f.read(entry["len"]).decode(errors="replace")
+
+
+def read(interface, onu_id=None, job=None, root=TRANSCRIPT_DIR, limit=TRANSCRIPT_READ_LIMIT):
+    """
+    Transcript satu port (atau satu ONU) dari index, entry terbaru di akhir:
+    [{"job", "at", "title", "text"}]. Tanpa job → dicari di semua job (index kecil, log tidak di-scan).
+    """
+    port = safe_name(interface)
+    jobs = [safe_name(job)] if job else (sorted(os.listdir(root)) if os.path.isdir(root) else [])
+    hits = []
+    for name in jobs:
+        try:
+            with open(os.path.join(root, name, port + ".idx"), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # baris terakhir belum lengkap (writer sedang menulis)
+                    if onu_id is None or str(onu_id) in entry["onus"]:
+                        hits.append((entry["at"], name, entry))
+        except OSError:
+            continue
+    hits.sort(key=lambda h: h[0])
+    out = []
+    for at, name, entry in hits[-limit:]:
+        try:
+            text = _read_entry(os.path.join(root, name, port), entry)
+        except OSError:
+            continue  # segmen sudah dibuang
+        out.append({"job": name, "at": at, "title": entry["title"], "text": text})
+    return out
@@ -0,0 +1,433 @@
+"""
+Simulator CLI OLT ZTE (C300/C600) via SSH untuk test lokal & benchmark.
+
+Hanya meniru perintah yang dipakai regis_onu_zte:
+enable, terminal length, configure terminal, interface gpon-olt_*/gpon-onu_*,
+onu N type .. sn .., no onu, pon-onu-mng, show gpon onu state,
+show running-config, show onu running config, show version, write, '--More--'.
+
+Jalankan:
+    python zte_simulator.py --port 2222 --latency 0.02 --commit-delay 3
+"""
+import argparse, random, re, socket, threading, time
+import paramiko
+
+PAGE_LINES = 24
+
+
+class OltState:
+    """State OLT bersama untuk semua session (ONU, config per ONU, statistik)."""
+
+    def __init__(self, hostname="ZXAN", model="C300", cmd_latency=0.0, commit_delay=0.0,
+                 write_delay=1.0, error_rate=0.0, max_sessions=0, cpu=0, seed=None):
+        self.hostname = hostname
+        self.model = model
+        self.cmd_latency = cmd_latency
+        self.commit_delay = commit_delay
+        self.write_delay = write_delay
+        self.error_rate = error_rate
+        self.max_sessions = max_sessions
+        # cpu > 0: hanya N perintah diproses bersamaan (semua session) → latency naik kalau session terlalu banyak
+        self.cpu = threading.Semaphore(cpu) if cpu else None
+        self.rand = random.Random(seed)
+        self.lock = threading.Lock()
+        self.onus = {}        # "1/2/6" -> {onu_id: {"sn","type","name","created"}}
+        self.onu_cfg = {}     # "1/2/6:1" -> {"if": {key: line}, "mng": {key: line}}
+        self.stats = {"logins": 0, "sessions": 0, "rejected": 0, "commands": 0, "writes": 0, "errors": 0}
+        self.active_sessions = 0
+
+    def committed_onus(self, port=None):
+        now = time.time()
+        with self.lock:
+            out = []
+            for p in sorted(self.onus, key=_port_key):
+                if port and p != port:
+                    continue
+                for onu_id in sorted(self.onus[p]):
+                    if now - self.onus[p][onu_id]["created"] >= self.commit_delay:
+                        out.append((p, onu_id))
+            return out
+
+
+def _port_key(p):
+    return tuple(int(x) for x in p.split("/"))
+
+
+def _cfg_key(line):
+    parts = line.split()
+    if parts[:2] in (["vlan", "port"], ["interface", "wifi"]):
+        return " ".join(parts[:3])
+    return " ".join(parts[:2])
+
+
+class _Server(paramiko.ServerInterface):
+    def __init__(self, sim):
+        self.sim = sim
+        self.shell_ready = {}
+
+    def check_auth_password(self, username, password):
+        if username == self.sim.user and password == self.sim.password:
+            with self.sim.state.lock:
+                self.sim.state.stats["logins"] += 1
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        st = self.sim.state
+        if kind != "session":
+            return paramiko.OPEN_FAILED_UNKNOWN_CHANNEL_TYPE
+        with st.lock:
+            if st.max_sessions and st.active_sessions >= st.max_sessions:
+                st.stats["rejected"] += 1
+                return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+            st.active_sessions += 1
+            st.stats["sessions"] += 1
+        self.shell_ready[chanid] = threading.Event()
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell_ready.setdefault(channel.get_id(), threading.Event()).set()
+        return True
+
+
+class CliSession:
+    """Satu shell interaktif (mode CLI + paging per session)."""
+
+    def __init__(self, state, chan):
+        self.st = state
+        self.chan = chan
+        self.mode = ("exec", None)
+        self.paging = PAGE_LINES
+        self.buf = ""
+
+    # ---- I/O ----
+    def _readline(self):
+        while True:
+            m = re.search(r"\r\n|\r|\n", self.buf)
+            if m:
+                line, self.buf = self.buf[:m.start()], self.buf[m.end():]
+                return line
+            data = self.chan.recv(65535)
+            if not data:
+                return None
+            self.buf += data.decode(errors="ignore")
+
+    def _readchar(self):
+        while not self.buf:
+            data = self.chan.recv(65535)
+            if not data:
+                return None
+            self.buf += data.decode(errors="ignore")
+        ch, self.buf = self.buf[0], self.buf[1:]
+        return ch
+
+    def _send(self, text):
+        self.chan.sendall(text.encode())
+
+    def prompt(self):
+        kind, _ = self.mode
+        suffix = {"exec": "", "config": "(config)", "if-olt": "(config-if)",
+                  "if-onu": "(config-if)", "mng": "(gpon-onu-mng)"}[kind]
+        return f"{self.st.hostname}{suffix}#"
+
+    def _output(self, lines):
+        if self.paging and len(lines) > self.paging:
+            for i in range(0, len(lines), self.paging):
+                self._send("".join(l + "\r\n" for l in lines[i:i + self.paging]))
+                if i + self.paging >= len(lines):
+                    return
+                self._send(" --More-- ")
+                ch = self._readchar()
+                self._send("\x08" * 10 + " " * 10 + "\x08" * 10)
+                if ch != " ":
+                    return
+        else:
+            self._send("".join(l + "\r\n" for l in lines))
+
+    def run(self):
+        self._send(f"\r\nWelcome to ZXA10 {self.st.model}\r\n{self.prompt()}")
+        while True:
+            line = self._readline()
+            if line is None:
+                return
+            self._send(line + "\r\n")
+            if self.st.cmd_latency:
+                if self.st.cpu:
+                    with self.st.cpu:
+                        time.sleep(self.st.cmd_latency)
+                else:
+                    time.sleep(self.st.cmd_latency)
+            out = self.execute(line.strip())
+            if out == "__logout__":
+                return
+            if out:
+                self._output(out)
+            self._send(self.prompt())
+
+    # ---- Perintah ----
+    def execute(self, cmd):
+        st = self.st
+        with st.lock:
+            st.stats["commands"] += 1
+        if not cmd:
+            return []
+        kind, ctx = self.mode
+        words = cmd.split()
+
+        if cmd == "enable":
+            return []
+        if words[:2] == ["terminal", "length"] and len(words) == 3:
+            self.paging = int(words[2])
+            return []
+        if cmd == "end":
+            self.mode = ("exec", None)
+            return []
+        if cmd == "exit":
+            if kind == "exec":
+                return "__logout__"
+            self.mode = ("exec", None) if kind == "config" else ("config", None)
+            return []
+        if words[0] == "show":
+            return self.show(words[1:])
+        if cmd == "write":
+            time.sleep(st.write_delay)
+            with st.lock:
+                st.stats["writes"] += 1
+            return ["Building configuration...", "..[OK]"]
+        if cmd in ("configure terminal", "conf t") and kind == "exec":
+            self.mode = ("config", None)
+            return []
+
+        if kind in ("config", "if-olt", "if-onu", "mng"):
+            m = re.fullmatch(r"interface gpon-olt_(\d+/\d+/\d+)", cmd)
+            if m:
+                self.mode = ("if-olt", m.group(1))
+                return []
+            m = re.fullmatch(r"(interface|pon-onu-mng) gpon-onu_(\d+/\d+/\d+):(\d+)", cmd)
+            if m:
+                port, onu_id = m.group(2), int(m.group(3))
+                with st.lock:
+                    if onu_id not in st.onus.get(port, {}):
+                        return ["%Error 20206: The ONU does not exist."]
+                    st.onu_cfg.setdefault(f"{port}:{onu_id}", {"if": {}, "mng": {}})
+                self.mode = ("if-onu" if m.group(1) == "interface" else "mng", f"{port}:{onu_id}")
+                return []
+
+        if kind == "if-olt":
+            return self.olt_if_cmd(ctx, cmd, words)
+        if kind in ("if-onu", "mng"):
+            if st.error_rate and st.rand.random() < st.error_rate:
+                with st.lock:
+                    st.stats["errors"] += 1
+                return ["%Error 20203: Invalid parameter."]
+            with st.lock:
+                part = st.onu_cfg[ctx]["if" if kind == "if-onu" else "mng"]
+                if words[0] == "no":
+                    if part.pop(_cfg_key(cmd[3:]), None) is None:
+                        return ["%Error 20210: The entry does not exist."]
+                elif words[0] in ("service-port",) and part.get(_cfg_key(cmd), cmd) != cmd:
+                    return ["%Error 20209: The service-port already exists."]
+                else:
+                    part[_cfg_key(cmd)] = cmd
+            return []
+        return ["%Error 140001: Unknown command."]
+
+    def olt_if_cmd(self, port, cmd, words):
+        st = self.st
+        m = re.fullmatch(r"onu (\d+) type (\S+) sn (\S+)", cmd)
+        if m:
+            onu_id, sn = int(m.group(1)), m.group(3)
+            with st.lock:
+                onus = st.onus.setdefault(port, {})
+                if not 1 <= onu_id <= 128:
+                    return ["%Error 20201: Invalid ONU ID."]
+                if onu_id in onus:
+                    return ["%Error 20207: The ONU ID has been used."]
+                if any(o["sn"] == sn for p in st.onus.values() for o in p.values()):
+                    return ["%Error 20208: The SN has been registered."]
+                onus[onu_id] = {"sn": sn, "type": m.group(2), "name": "", "created": time.time()}
+            return []
+        m = re.fullmatch(r"no onu (\d+)", cmd)
+        if m:
+            onu_id = int(m.group(1))
+            with st.lock:
+                if st.onus.get(port, {}).pop(onu_id, None) is None:
+                    return ["%Error 20206: The ONU does not exist."]
+                st.onu_cfg.pop(f"{port}:{onu_id}", None)
+            return []
+        m = re.fullmatch(r"name (\d+) (.+)", cmd)
+        if m:
+            with st.lock:
+                onu = st.onus.get(port, {}).get(int(m.group(1)))
+                if onu is None:
+                    return ["%Error 20206: The ONU does not exist."]
+                onu["name"] = m.group(2)
+            return []
+        return ["%Error 140001: Unknown command."]
+
+    def show(self, args):
+        st = self.st
+        text = " ".join(args)
+        if text == "version":
+            return [f"ZXA10 {st.model} Software, Version: V2.1.0", f"System Name: {st.hostname}"]
+        m = re.fullmatch(r"gpon onu state(?: gpon-olt_(\d+/\d+/\d+))?", text)
+        if m:
+            lines = ["OnuIndex   Admin State  OMCC State  Phase State  Channel",
+                     "-" * 60]
+            rows = st.committed_onus(m.group(1))
+            for port, onu_id in rows:
+                lines.append(f"{port}:{onu_id:<6}enable       enable      working      1(GPON)")
+            lines.append(f"ONU Number: {len(rows)}/{len(rows)}")
+            return lines
+        m = re.fullmatch(r"running-config interface gpon-olt_(\d+/\d+/\d+)", text)
+        if m:
+            return ["Building configuration..."] + self._olt_section(m.group(1)) + ["end"]
+        m = re.fullmatch(r"running-config interface gpon-onu_(\d+/\d+/\d+):(\d+)", text)
+        if m:
+            with st.lock:
+                if int(m.group(2)) not in st.onus.get(m.group(1), {}):
+                    return ["%Error 20206: The ONU does not exist."]
+            return ["Building configuration..."] + self._onu_section("if", f"{m.group(1)}:{m.group(2)}") + ["end"]
+        m = re.fullmatch(r"onu running config gpon-onu_(\d+/\d+/\d+:\d+)", text)
+        if m:
+            return self._onu_section("mng", m.group(1))
+        if text == "running-config":
+            with st.lock:
+                ports = sorted(st.onus, key=_port_key)
+                onus = sorted(st.onu_cfg, key=lambda k: (_port_key(k.split(":")[0]), int(k.split(":")[1])))
+            lines = ["Building configuration...", f"hostname {st.hostname}", "!"]
+            for p in ports:
+                lines += self._olt_section(p)
+            for k in onus:
+                lines += self._onu_section("if", k)
+            for k in onus:
+                lines += self._onu_section("mng", k)
+            return lines + ["end"]
+        return ["%Error 140001: Unknown command."]
+
+    def _olt_section(self, port):
+        with self.st.lock:
+            onus = dict(self.st.onus.get(port, {}))
+        lines = [f"interface gpon-olt_{port}"]
+        for onu_id in sorted(onus):
+            lines.append(f"  onu {onu_id} type {onus[onu_id]['type']} sn {onus[onu_id]['sn']}")
+        return lines + ["!"]
+
+    def _onu_section(self, part, key):
+        with self.st.lock:
+            cfg = dict(self.st.onu_cfg.get(key, {}).get(part, {}))
+        head = "interface" if part == "if" else "pon-onu-mng"
+        return [f"{head} gpon-onu_{key}"] + [f"  {l}" for l in cfg.values()] + ["!"]
+
+
+class ZteSimulator:
+    """Server SSH lokal. Pakai sebagai context manager atau start()/stop()."""
+
+    def __init__(self, host="127.0.0.1", port=0, user="zte", password="zte", **state_kwargs):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.state = OltState(**state_kwargs)
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._sock = None
+        self._stop = threading.Event()
+
+    def cfg(self, **extra):
+        """cfg siap pakai untuk regis_onu_zte.main()."""
+        base = {"host": self.host, "port": self.port, "user": self.user, "pass": self.password,
+                "vlan_prefix": "vlan"}
+        base.update(extra)
+        return base
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen(100)
+        self._sock.settimeout(0.5)
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._sock:
+            self._sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except (socket.timeout, OSError):
+                continue
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        t = paramiko.Transport(client)
+        t.add_server_key(self.host_key)
+        server = _Server(self)
+        try:
+            t.start_server(server=server)
+        except Exception:
+            return
+        while t.is_active() and not self._stop.is_set():
+            chan = t.accept(1)
+            if chan is None:
+                continue
+            threading.Thread(target=self._run_shell, args=(server, chan), daemon=True).start()
+
+    def _run_shell(self, server, chan):
+        try:
+            ev = server.shell_ready.setdefault(chan.get_id(), threading.Event())
+            if ev.wait(10):
+                CliSession(self.state, chan).run()
+        except Exception:
+            pass
+        finally:
+            with self.state.lock:
+                self.state.active_sessions -= 1
+            chan.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulator CLI OLT ZTE via SSH")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=2222)
+    ap.add_argument("--user", default="zte")
+    ap.add_argument("--password", default="zte")
+    ap.add_argument("--hostname", default="ZXAN")
+    ap.add_argument("--model", default="C300")
+    ap.add_argument("--latency", type=float, default=0.0, help="latency per perintah (detik)")
+    ap.add_argument("--commit-delay", type=float, default=0.0, help="delay ONU muncul di 'show gpon onu state'")
+    ap.add_argument("--write-delay", type=float, default=1.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="probabilitas %%Error di perintah config ONU")
+    ap.add_argument("--max-sessions", type=int, default=0, help="0 = tanpa batas")
+    ap.add_argument("--cpu", type=int, default=0, help="perintah yang diproses bersamaan (0 = tanpa batas)")
+    a = ap.parse_args()
+
+    sim = ZteSimulator(a.host, a.port, a.user, a.password, hostname=a.hostname, model=a.model,
+                       cmd_latency=a.latency, commit_delay=a.commit_delay, write_delay=a.write_delay,
+                       error_rate=a.error_rate, max_sessions=a.max_sessions, cpu=a.cpu).start()
+    print(f"📡 Simulator ZTE {a.model} listen di {a.host}:{sim.port} (user={a.user})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()